@@ -0,0 +1,153 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+TAIFEX Report Archiver
+----------------------
+1. Repacks the daily Daily_/OptionsDaily_ report ZIPs of a month into one archive
+2. Verifies that every archived report reproduces its original text byte for byte
+3. Reads one product of one day, or restores the original report text, from an archive
+
+Usage:
+    python archive_rpt.py pack # Archive every month found in fut_rpt/ and opt_rpt/
+    python archive_rpt.py pack -m 2023_01 -t fut_rpt # Archive one month of futures reports
+    python archive_rpt.py verify -m 2023_01 # Check the archives of a month against their checksums
+    python archive_rpt.py read -t fut_rpt -D 2023_01_10 -p TX # Print the TX lines of one day
+    python archive_rpt.py extract -t fut_rpt -D 2023_01_10 -o /tmp # Restore the original .rpt files
+"""
+
+# === Standard Library ===
+import sys
+import os
+import argparse
+import json
+from pathlib import Path
+
+# Import Local Module: log_util and report archive
+from lib.log_util import LoggerUtil
+from lib.report_archive import ArchiveCompactor, ReportArchive
+from lib.job_queue import DEFAULT_TIMEOUT, JobQueue
+
+# Report directories and the name prefix of their daily ZIPs
+REPORT_PREFIXES = {"fut_rpt": "Daily_", "opt_rpt": "OptionsDaily_"}
+
+
+def parse_arguments():
+    """
+    Parse command line arguments
+
+    Returns:
+        Parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="TAIFEX Report Archiver")
+    parser.add_argument("command", choices=["pack", "verify", "read", "extract"], help="Archive operation")
+    parser.add_argument(
+        "-t",
+        "--type",
+        choices=sorted(REPORT_PREFIXES),
+        default=None,
+        help="Limit the operation to one report type (default: all)",
+    )
+    parser.add_argument("-m", "--month", default=None, help="Month to pack or verify, YYYY_MM (default: all)")
+    parser.add_argument("-D", "--day", default=None, help="Trading day to read or extract, YYYY_MM_DD")
+    parser.add_argument("-p", "--product", default="TX", help="Product code to read (default: TX)")
+    parser.add_argument("-o", "--output", default=".", help="Directory for extracted reports (default: .)")
+    parser.add_argument(
+        "--log-level",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        default="INFO",
+        help="Set logging level",
+    )
+    return parser.parse_args()
+
+
+def main():
+    """Main entry point for the report archiver"""
+    args = parse_arguments()
+
+    global LOGGER
+    LOGGER = LoggerUtil(name="archive_rpt", level=args.log_level).get_logger()
+
+    base_path = Path(os.path.dirname(os.path.abspath(__file__)))
+    with open(base_path / "config.json", "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    items = [args.type] if args.type else sorted(REPORT_PREFIXES)
+    failed = False
+
+    # Packing reads the report directories, which ingest downloads into and fex_daily.sh prunes
+    lock_config = config.get("locks", {})
+    queue = JobQueue(base_path / lock_config.get("dir", "locks"), lock_config.get("timeout", DEFAULT_TIMEOUT))
+    archive_dirs = [base_path / config[item].get("archive", f"{item}_archive") for item in items]
+    if args.command == "pack":
+        exclusive, shared = archive_dirs, [base_path / item for item in items]
+    else:
+        exclusive, shared = [], archive_dirs
+    try:
+        job = queue.acquire(" ".join(["archive_rpt"] + sys.argv[1:]), exclusive=exclusive, shared=shared)
+    except TimeoutError as e:
+        LOGGER.error(e)
+        sys.exit(1)
+    if job is None:
+        return
+
+    for item in items:
+        prefix = REPORT_PREFIXES[item]
+        # Kept outside the report directories, which fex_daily.sh prunes after 15 days
+        archive_dir = base_path / config[item].get("archive", f"{item}_archive")
+        compactor = ArchiveCompactor(base_path / item, archive_dir)
+
+        if args.command == "pack":
+            months = [args.month] if args.month else sorted(compactor.months(prefix))
+            for month in months:
+                archive_path = compactor.compact(prefix, month)
+                if archive_path is None:
+                    continue
+                broken = compactor.verify(archive_path)
+                if broken:
+                    LOGGER.error(f"{archive_path.name}: reports do not reproduce: {broken}")
+                    failed = True
+            continue
+
+        if args.command == "verify":
+            pattern = f"{prefix}{args.month}.zip" if args.month else f"{prefix}*.zip"
+            for archive_path in sorted(archive_dir.glob(pattern)):
+                broken = compactor.verify(archive_path)
+                if broken:
+                    LOGGER.error(f"{archive_path.name}: reports do not reproduce: {broken}")
+                    failed = True
+                else:
+                    LOGGER.info(f"{archive_path.name}: OK")
+            continue
+
+        # read / extract work on one day
+        if not args.day:
+            LOGGER.error("--day is required")
+            sys.exit(1)
+        archive_path = compactor.archive_path(prefix, args.day[:7])
+        if not archive_path.exists():
+            LOGGER.warning(f"Archive not found: {archive_path}")
+            continue
+
+        with ReportArchive(archive_path) as archive:
+            if args.command == "read":
+                for line in archive.read_lines(args.day, args.product):
+                    print(line)
+                continue
+
+            report_name = f"{prefix}{args.day}.zip"
+            if report_name not in archive.index["reports"]:
+                LOGGER.warning(f"{report_name} not in {archive_path.name}")
+                continue
+            output = Path(args.output)
+            output.mkdir(parents=True, exist_ok=True)
+            for name, content in archive.reproduce(report_name).items():
+                (output / Path(name).name).write_bytes(content)
+                LOGGER.info(f"Extracted {name} ({len(content)} bytes) to {output}")
+
+    job.release("failed" if failed else "done")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+TAIFEX Database Tool
+--------------------
+1. Creates FCT_DB.db and II_DB.db with all tables and indexes
+2. Applies versioned schema migrations to existing databases
+3. Reports query plans of the hot queries to confirm index usage
+4. Converts candle tables to the compact integer-keyed schema
+5. Splits candle tables into per-year partitions, freezes past years and unfreezes them for backfills
+6. Rebuilds the rollup tables read by the exports from the stored candles
+7. Rebuilds the coverage table of candles and II rows per date, symbol and session
+8. Backs up the live databases incrementally to Google Drive or a local directory, and restores them
+9. Lists the latest cron jobs with how long they waited for their locks
+10. Publishes the read-only snapshot database of the web frontend
+
+Usage:
+    python db_tool.py init # Create missing databases and apply all migrations
+    python db_tool.py migrate # Apply pending migrations to existing databases
+    python db_tool.py explain # Show query plans of the hot queries
+    python db_tool.py compact # Convert twTX/twMTX to epoch-minute WITHOUT ROWID tables
+    python db_tool.py partition # Move candles into FCT_<year>.db and freeze closed years
+    python db_tool.py unfreeze 2024 # Make FCT_2024.db writable for a backfill; the next partition freezes it again
+    python db_tool.py rollup # Rebuild 5/15/30/60/300-minute, daily, weekly and monthly bars
+    python db_tool.py coverage # Recount candles and II rows of every date into the coverage table
+    python db_tool.py backup # Upload the chunks of FCT_DB.db, II_DB.db and the partitions that changed
+    python db_tool.py backup --target /mnt/backup # Back up to a local directory instead of Google Drive
+    python db_tool.py restore --db II_DB.db --output /tmp # Rebuild the latest backup of II_DB.db in /tmp
+    python db_tool.py jobs # Show the latest jobs of the lock queue, their wait and run times
+    python db_tool.py publish # Rebuild FCT_WEB.db from FCT_DB.db and swap it into place
+"""
+
+# === Standard Library ===
+import sys
+import os
+import argparse
+import json
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+# Import Local Module: log_util and schema manager
+from lib.log_util import LoggerUtil
+from lib.db_schema import HOT_QUERIES, MIGRATIONS, SchemaManager
+from lib.candle_store import CandleCompactor
+from lib.candle_partitions import PARTITION_FILE, CandlePartitions
+from lib.rollups import RollupBuilder
+from lib.coverage import CoverageIndex
+from lib.db_backup import DEFAULT_CHUNK_SIZE, DatabaseBackup, GDriveBackend, LocalBackend
+from lib.job_queue import DEFAULT_TIMEOUT, JobQueue
+from lib.snapshot import DEFAULT_SNAPSHOT_NAME, SnapshotPublisher
+
+COMMANDS = [
+    "init",
+    "migrate",
+    "explain",
+    "compact",
+    "partition",
+    "unfreeze",
+    "rollup",
+    "coverage",
+    "backup",
+    "restore",
+    "jobs",
+    "publish",
+]
+
+
+def parse_arguments():
+    """
+    Parse command line arguments
+
+    Returns:
+        Parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="TAIFEX Database Tool")
+    parser.add_argument(
+        "command",
+        choices=COMMANDS,
+        help="Database operation",
+    )
+    parser.add_argument(
+        "year",
+        nargs="?",
+        type=int,
+        default=None,
+        help="Partition year of the unfreeze command",
+    )
+    parser.add_argument(
+        "--db",
+        choices=sorted(MIGRATIONS),
+        default=None,
+        help="Limit the operation to one database (default: all)",
+    )
+    parser.add_argument(
+        "--target",
+        default=None,
+        help="Local directory for backup/restore instead of Google Drive",
+    )
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="Directory the restored databases are written to (default: a restored/ subdirectory)",
+    )
+    parser.add_argument(
+        "--log-level",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        default="INFO",
+        help="Set logging level",
+    )
+    return parser.parse_args()
+
+
+def main():
+    """Main entry point for the database tool"""
+    args = parse_arguments()
+
+    global LOGGER
+    LOGGER = LoggerUtil(name="db_tool", level=args.log_level).get_logger()
+
+    base_path = Path(os.path.dirname(os.path.abspath(__file__)))
+    with open(base_path / "config.json", "r", encoding="utf-8") as f:
+        config = json.load(f)
+    db_names = [args.db] if args.db else sorted(MIGRATIONS)
+
+    lock_config = config.get("locks", {})
+    queue = JobQueue(base_path / lock_config.get("dir", "locks"), lock_config.get("timeout", DEFAULT_TIMEOUT))
+    if args.command == "jobs":
+        for entry in queue.history():
+            waits = f"waited {entry['waited']:>7}s held {entry['held']:>7}s"
+            LOGGER.info(f"{entry['queued']} {entry['status']:8} {waits}  {entry['job']}")
+        return
+
+    # Backups and query plans only read the databases; restores write to their own directory
+    db_paths = [base_path / db_name for db_name in db_names]
+    if args.command in ("backup", "explain"):
+        exclusive, shared = [], db_paths
+    elif args.command == "restore":
+        exclusive, shared = [], []
+    elif args.command in ("init", "migrate"):
+        exclusive, shared = db_paths, []
+    elif args.command == "publish":
+        exclusive, shared = [base_path / config.get("snapshot", {}).get("name", DEFAULT_SNAPSHOT_NAME)], []
+        shared.append(base_path / "FCT_DB.db")
+    else:
+        exclusive, shared = [base_path / "FCT_DB.db"], [base_path / "II_DB.db"]
+    try:
+        job = queue.acquire(" ".join(["db_tool"] + sys.argv[1:]), exclusive=exclusive, shared=shared)
+    except TimeoutError as e:
+        LOGGER.error(e)
+        sys.exit(1)
+    if job is None:
+        return
+
+    with job:
+        run_command(args, base_path, config, db_names)
+
+
+def run_command(args, base_path: Path, config: dict, db_names: list):
+    """
+    Run one database operation while its locks are held
+
+    Args:
+        args: Parsed arguments
+        base_path: Directory of the databases
+        config: Parsed config.json
+        db_names: Databases the operation applies to
+    """
+    manager = SchemaManager(base_path, config)
+
+    if args.command in ("init", "migrate"):
+        for db_name in db_names:
+            try:
+                applied = manager.migrate(db_name, create=args.command == "init")
+                LOGGER.info(
+                    f"{db_name}: {applied} migrations applied, now at version {manager.current_version(db_name)}"
+                )
+            except Exception as e:
+                LOGGER.error(f"{db_name}: migration failed: {e}")
+                sys.exit(1)
+        return
+
+    if args.command == "compact":
+        db_path = base_path / "FCT_DB.db"
+        if not db_path.exists():
+            LOGGER.error(f"Database not found: {db_path}")
+            sys.exit(1)
+
+        size_before = db_path.stat().st_size
+        conn = sqlite3.connect(str(db_path), isolation_level=None)
+        try:
+            compactor = CandleCompactor(conn)
+            converted = sum(compactor.convert(symbol) for symbol in config["fut_rpt"].get("symbol", ["TX"]))
+            if converted:
+                compactor.vacuum()
+        finally:
+            conn.close()
+        LOGGER.info(f"FCT_DB.db: {size_before} -> {db_path.stat().st_size} bytes after converting {converted} candles")
+        return
+
+    if args.command == "unfreeze":
+        partitions = CandlePartitions(base_path)
+        if args.year not in partitions.years():
+            LOGGER.error(f"No partition of year {args.year}, expected one of {partitions.years()}")
+            sys.exit(1)
+        if not partitions.is_frozen(args.year):
+            LOGGER.info(f"{partitions.path(args.year).name} is not frozen")
+            return
+        partitions.unfreeze(args.year)
+        LOGGER.info(f"Backfill {args.year} now, then run 'db_tool.py partition' to freeze it again")
+        return
+
+    if args.command == "partition":
+        db_path = base_path / "FCT_DB.db"
+        if not db_path.exists():
+            LOGGER.error(f"Database not found: {db_path}")
+            sys.exit(1)
+
+        partitions = CandlePartitions(base_path)
+        conn = sqlite3.connect(str(db_path), isolation_level=None)
+        try:
+            moved = partitions.split(conn, config["fut_rpt"].get("symbol", ["TX"]))
+            if moved:
+                conn.execute("VACUUM;")
+        except PermissionError as e:
+            LOGGER.error(f"Partitioning failed: {e}")
+            sys.exit(1)
+        finally:
+            conn.close()
+        for year, count in sorted(moved.items()):
+            LOGGER.info(f"{partitions.path(year).name}: {count} candles moved")
+        LOGGER.info(f"Frozen partitions: {partitions.freeze_closed_years() or 'none'}")
+        return
+
+    if args.command == "rollup":
+        db_path = base_path / "FCT_DB.db"
+        if not db_path.exists():
+            LOGGER.error(f"Database not found: {db_path}")
+            sys.exit(1)
+
+        # Partitions are attached one year at a time, read-only, through TEMP views
+        partitions = CandlePartitions(base_path)
+        builder = RollupBuilder()
+        conn = sqlite3.connect(db_path.as_uri(), uri=True, isolation_level=None)
+        try:
+            cursor = conn.cursor()
+            for year in partitions.years() or [None]:
+                if year is not None:
+                    partitions.attach(conn, datetime(year, 1, 1), datetime(year, 12, 31))
+                for symbol in config["fut_rpt"].get("symbol", ["TX"]):
+                    cursor.execute(
+                        "SELECT 1 FROM sqlite_master WHERE name=? UNION ALL SELECT 1 FROM temp.sqlite_master WHERE name=?;",
+                        (f"tw{symbol}", f"tw{symbol}"),
+                    )
+                    if cursor.fetchone() is None:
+                        continue
+                    dates = [row[0] for row in cursor.execute(f"SELECT DISTINCT Date FROM tw{symbol};").fetchall()]
+                    cursor.execute("BEGIN;")
+                    bars = builder.update(cursor, symbol, dates)
+                    cursor.execute("COMMIT;")
+                    LOGGER.info(
+                        f"tw{symbol}: {bars} intraday bars rebuilt for {len(dates)} dates of {year or 'all years'}"
+                    )
+        finally:
+            conn.close()
+        return
+
+    if args.command == "coverage":
+        db_path = base_path / "FCT_DB.db"
+        if not db_path.exists():
+            LOGGER.error(f"Database not found: {db_path}")
+            sys.exit(1)
+
+        # Candles are read through the TEMP views over the partitions, a batch of years at a time, and the
+        # coverage table is written in FCT_DB.db by a second connection, since ATTACH is refused in a transaction
+        partitions = CandlePartitions(base_path)
+        coverage = CoverageIndex(config["fut_rpt"].get("symbol", ["TX"]))
+        conn = sqlite3.connect(db_path.as_uri(), uri=True, isolation_level=None)
+        write_conn = sqlite3.connect(db_path, isolation_level=None)
+        ii_path = base_path / "II_DB.db"
+        ii_conn = sqlite3.connect(f"{ii_path.as_uri()}?mode=ro", uri=True) if ii_path.exists() else None
+        try:
+            cursor = write_conn.cursor()
+            cursor.execute("BEGIN;")
+            rows = coverage.rebuild(conn, ii_conn, cursor, partitions.attach_batches(conn))
+            cursor.execute("COMMIT;")
+        finally:
+            conn.close()
+            write_conn.close()
+            if ii_conn is not None:
+                ii_conn.close()
+        LOGGER.info(f"coverage: {rows} candle rows rebuilt{'' if ii_conn else ', II_DB.db not found'}")
+        return
+
+    if args.command == "publish":
+        publisher = SnapshotPublisher(
+            base_path,
+            config["fut_rpt"].get("symbol", ["TX"]),
+            config.get("snapshot", {}).get("name", DEFAULT_SNAPSHOT_NAME),
+        )
+        try:
+            publisher.publish()
+        except (FileNotFoundError, ValueError) as e:
+            LOGGER.error(f"Publish failed: {e}")
+            sys.exit(1)
+        return
+
+    if args.command in ("backup", "restore"):
+        backup_config = config.get("backup", {})
+        if args.target:
+            backend = LocalBackend(Path(args.target))
+        else:
+            # Imported here so local backups work without PyDrive installed
+            from devices.gdrive2 import gdrive
+
+            backend = GDriveBackend(gdrive(), backup_config.get("folder", "db_backup"))
+        backup = DatabaseBackup(
+            backend,
+            chunk_size=backup_config.get("chunk_size", DEFAULT_CHUNK_SIZE),
+            keep=backup_config.get("keep", 7),
+        )
+
+        # Year partitions belong to FCT_DB.db; frozen years never upload a chunk again
+        partitions = CandlePartitions(base_path)
+        if args.command == "restore":
+            partition_names = [name for name in backup.databases() if PARTITION_FILE.match(name)]
+        else:
+            partition_names = [partitions.path(year).name for year in partitions.years()]
+        names = []
+        for db_name in db_names:
+            names.append(db_name)
+            if db_name == "FCT_DB.db":
+                names.extend(partition_names)
+
+        if args.command == "restore":
+            output = Path(args.output) if args.output else base_path / "restored"
+            output.mkdir(parents=True, exist_ok=True)
+            for db_name in names:
+                try:
+                    backup.restore(db_name, output / db_name)
+                except FileNotFoundError as e:
+                    LOGGER.warning(f"{db_name}: {e}")
+                except ValueError as e:
+                    LOGGER.error(f"{db_name}: restore failed: {e}")
+                    sys.exit(1)
+            return
+
+        for db_name in names:
+            db_path = base_path / db_name
+            if not db_path.exists():
+                LOGGER.warning(f"Database not found: {db_path}")
+                continue
+            backup.backup(db_path)
+        backup.prune(sorted(MIGRATIONS) + partition_names)
+        return
+
+    # Report query plans of the hot queries
+    queries = [query for query in HOT_QUERIES if query.db_name in db_names]
+    for name, plan, uses_index in manager.explain(queries):
+        status = "OK" if uses_index else "FULL SCAN"
+        LOGGER.info(f"[{status}] {name}")
+        for line in plan:
+            LOGGER.info(f"    {line}")
+
+
+if __name__ == "__main__":
+    main()
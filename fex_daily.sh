@@ -20,7 +20,11 @@ cd ~/git/taifex_web/web_json
 ~/git/taifex_daily/mining_rpt.py -e TX 1 -d $date_age
 ~/git/taifex_daily/mining_rpt.py -e MTX 1 -d $date_age
 sleep 3
-find ~/git/taifex_daily/fut_rpt/ -mtime +15 -type f -name '*' -exec rm -rf {} \;
-find ~/git/taifex_daily/opt_rpt/ -mtime +15 -type f -name '*' -exec rm -rf {} \;
+# Archive the reports before old ones are pruned
+~/git/taifex_daily/archive_rpt.py pack
+# Prune under the report directory locks so a running ingest keeps its files
+mkdir -p ~/git/taifex_daily/locks
+flock ~/git/taifex_daily/locks/fut_rpt.lock find ~/git/taifex_daily/fut_rpt/ -mtime +15 -type f -name '*' -exec rm -rf {} \;
+flock ~/git/taifex_daily/locks/opt_rpt.lock find ~/git/taifex_daily/opt_rpt/ -mtime +15 -type f -name '*' -exec rm -rf {} \;
 find ~/git/taifex_web/web_json -mtime +0 -type f -name "*TX_*" -exec rm -rf {} \;
 
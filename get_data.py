@@ -40,6 +40,11 @@ from selenium.webdriver.chrome.service import Service
 
 # === Import Local Module: log_util ===
 from lib.log_util import LoggerUtil
+from lib.db_manager import get_connection_manager
+from lib.candle_partitions import CandlePartitions
+from lib.coverage import CoverageIndex
+from lib.trading_calendar import TradingCalendar
+from lib.job_queue import DEFAULT_TIMEOUT, JobQueue
 
 # Constants
 DB_NAME = "II_DB.db"
@@ -80,19 +85,43 @@ class TaifexDataParser:
         self.date = date.today().strftime("%Y/%m/%d")
         self.item = None
         self.base_path = Path(os.path.dirname(__file__))
+        config = self._load_config()
+        self.db = get_connection_manager(config.get("db"))
+        self.partitions = CandlePartitions(self.base_path)
+        self.coverage = CoverageIndex(config.get("fut_rpt", {}).get("symbol", ["TX"]))
+        self.calendar = TradingCalendar(
+            self.base_path / config.get("calendar", {}).get("holidays", "db/taifex_holidays.csv")
+        )
+        lock_config = config.get("locks", {})
+        self.jobs = JobQueue(
+            self.base_path / lock_config.get("dir", "locks"), lock_config.get("timeout", DEFAULT_TIMEOUT)
+        )
+
+    def _load_config(self) -> Dict[str, Any]:
+        """
+        Load the settings shared with mining_rpt.py (SQLite pragmas, futures symbols) from config.json
+
+        Returns:
+            Parsed config.json, or an empty dict to use the defaults
+        """
+        config_path = self.base_path / "config.json"
+        if not config_path.exists():
+            return {}
+        with open(config_path, "r", encoding="utf-8") as f:
+            return json.load(f)
 
     def get_db_connection(self, db_name: str = DB_NAME) -> sqlite3.Connection:
         """
-        Create a database connection to the specified SQLite database
+        Get the shared connection to the specified SQLite database
 
         Args:
             db_name: Name of the database file
 
         Returns:
-            SQLite connection object
+            SQLite connection object, owned by the connection manager
         """
         db_path = self.base_path / db_name
-        return sqlite3.connect(db_path)
+        return self.db.connect(db_path)
 
     def import_data_from_csv(self, item: str) -> None:
         """
@@ -444,11 +473,10 @@ class TaifexDataParser:
             date_str: Date of the data
             values_sql: SQL values string for insertion
         """
-        db_path = self.base_path / DB_NAME
         table_name = f"II_{self.item}"
 
         try:
-            with sqlite3.connect(db_path) as conn:
+            with self.get_db_connection() as conn:
                 cursor = conn.cursor()
 
                 # Delete existing data for this date first
@@ -462,11 +490,52 @@ class TaifexDataParser:
 
                 LOGGER.info(f"Successfully stored data for {date_str} in table {table_name}")
 
+            self._record_coverage(date_str)
+
         except sqlite3.Error as e:
             LOGGER.error(f"Database error: {e}")
         except Exception as e:
             LOGGER.error(f"Error storing data: {e}")
 
+    def _record_coverage(self, date_str: str) -> None:
+        """
+        Record the rows just stored for the current item in the coverage table of FCT_DB
+
+        Args:
+            date_str: Date of the stored rows as written to the II table
+        """
+        source = f"II_{self.item}"
+        counts = CoverageIndex.count_ii(self.get_db_connection(), source, [date_str], self.coverage.symbols)
+        with self.get_db_connection(MARKET_DATA_DB) as conn:
+            self.coverage.record_ii(conn.cursor(), self.date, source, counts.get(date_str, {}))
+
+    def fill_gaps(self, start_date: str, end_date: str) -> int:
+        """
+        Fetch only the II tables missing from the coverage table in a date range
+
+        Args:
+            start_date: First date in format 'YYYY/MM/DD'
+            end_date: Last date in format 'YYYY/MM/DD'
+
+        Returns:
+            int: Number of dates with gaps
+        """
+        with self.get_db_connection(MARKET_DATA_DB) as conn:
+            gaps = self.coverage.missing(
+                conn.cursor(),
+                datetime.strptime(start_date, "%Y/%m/%d"),
+                datetime.strptime(end_date, "%Y/%m/%d"),
+                ["II_Fut", "II_OP", "II_SPOT"],
+                self.calendar,
+            )
+
+        for date_str, sources in gaps.items():
+            LOGGER.info(f"Filling {sorted(sources)} for {date_str}")
+            for item in ("Fut", "OP", "SPOT"):
+                if f"II_{item}" in sources:
+                    self.fetch_data_from_web(item=item, target_date=date_str)
+        return len(gaps)
+
     def _validate_and_convert_date(self, date_str: str) -> str:
         """
         Validate and convert date string from YYYYMMDD to YYYY/MM/DD format
@@ -488,22 +557,33 @@ class TaifexDataParser:
         except ValueError as e:
             raise ValueError(f"Invalid date format. Please use YYYYMMDD format (e.g., 20240328). Error: {str(e)}")
 
-    def execute_query(self, db_path: str, query: str) -> List[Tuple]:
+    def execute_query(
+        self, db_path: str, query: str, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None
+    ) -> List[Tuple]:
         """
         Execute a database query and return results
 
         Args:
             db_path: Path to the database file
             query: SQL query string
+            start_date: First date the query reads candles of (default: first partition)
+            end_date: Last date the query reads candles of (default: last partition)
 
         Returns:
             List of result tuples
         """
         try:
-            with sqlite3.connect(db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute(query)
-                return cursor.fetchall()
+            with self.db.connect(Path(db_path), readonly=True) as conn:
+                if Path(db_path).name != MARKET_DATA_DB:
+                    return conn.execute(query).fetchall()
+
+                # Partitioned candles are read through the TEMP views of mining_rpt.py, a batch of years at a time;
+                # the shared connection keeps them for the next query of the same range. Queries over them must
+                # return rows in date order, not aggregates
+                rows = []
+                for _ in self.partitions.attach_batches(conn, start_date, end_date):
+                    rows.extend(conn.execute(query).fetchall())
+                return rows
         except sqlite3.Error as e:
             LOGGER.error(f"Database query error: {e}")
             return []
@@ -532,7 +612,12 @@ class TaifexDataParser:
                 WHERE Date>="{start_date_str}" AND (Time="13:30:00" OR Time="13:45:00")
                 ORDER BY Date, Time;
             """
-            price_data = self.execute_query(str(market_db_path), query)
+            price_data = self.execute_query(
+                str(market_db_path),
+                query,
+                datetime.strptime(start_date_str, "%Y/%m/%d"),
+                datetime.strptime(date_str, "%Y/%m/%d"),
+            )
 
             # Create a dictionary to hold all strategy data
             data_table = {}
@@ -580,7 +665,7 @@ class TaifexDataParser:
                     data_table[date_val].append(amount_bn)
 
             # Get options data
-            with sqlite3.connect(ii_db_path) as conn:
+            with self.db.connect(ii_db_path, readonly=True) as conn:
                 cursor = conn.cursor()
                 query = f"""
                     SELECT Date, OI_B_Contract, OI_S_Contract, OI_B_Amount, OI_S_Amount
@@ -612,8 +697,10 @@ class TaifexDataParser:
                     output_data.append([timestamp] + values[3:6] + [values[1]])
 
             # Write to JSON file
-            with open("data.json", "w") as f:
+            # Replace the file in one step so the web frontend never reads a partial JSON
+            with open("data.json.tmp", "w") as f:
                 json.dump(output_data, f, indent=4)
+            os.replace("data.json.tmp", "data.json")
 
             LOGGER.info(f"Strategy data exported to data.json with {len(output_data)} entries")
 
@@ -632,7 +719,7 @@ class TaifexDataParser:
             start_date_str: Start date for analysis
         """
         # try:
-        with sqlite3.connect(db_path) as conn:
+        with self.db.connect(Path(db_path), readonly=True) as conn:
             cursor = conn.cursor()
 
             query = f"""
@@ -708,8 +795,10 @@ class TaifexDataParser:
 
             # assert False, output_data
             # Write to JSON file
-            with open("data_MTX.json", "w") as f:
+            # Replace the file in one step so the web frontend never reads a partial JSON
+            with open("data_MTX.json.tmp", "w") as f:
                 json.dump(output_data, f, indent=4)
+            os.replace("data_MTX.json.tmp", "data_MTX.json")
 
             LOGGER.info(f"MTX strategy data exported to data_MTX.json with {len(output_data)} entries")
 
@@ -722,6 +811,12 @@ def parse_args():
     parser = argparse.ArgumentParser(description="TAIFEX Data Parser Tool")
     parser.add_argument("-d", "--date", help="Target date in YYYYMMDD format (default: today)", type=str)
     parser.add_argument("-i", "--item", help="Data type to fetch (Fut, OP, or SPOT)", type=str, required=False)
+    parser.add_argument(
+        "--fill-gaps",
+        help="Fetch only the II data missing from the coverage table, from -d (default: 20200101) to today",
+        default=False,
+        action="store_true",
+    )
     parser.add_argument(
         "--log-level",
         choices=["DEBUG", "INFO", "WARNING", "ERROR"],
@@ -751,6 +846,32 @@ def main():
         LOGGER.error(f"Error: {str(e)}")
         sys.exit(1)
 
+    # Queue behind the other cron jobs; coverage rows go to FCT_DB.db and the strategy JSON to the working directory
+    try:
+        job = parser.jobs.acquire(
+            " ".join(["get_data"] + sys.argv[1:]),
+            exclusive=[
+                parser.base_path / DB_NAME,
+                parser.base_path / MARKET_DATA_DB,
+                Path.cwd() / "data.json",
+                Path.cwd() / "data_MTX.json",
+            ],
+        )
+    except TimeoutError as e:
+        LOGGER.error(e)
+        sys.exit(1)
+    if job is None:
+        sys.exit(0)
+
+    # Fetch only the dates whose II rows are missing, then stop
+    if args.fill_gaps:
+        start_date = parser._validate_and_convert_date(args.date) if args.date else DEFAULT_START_DATE
+        gaps = parser.fill_gaps(start_date, date.today().strftime("%Y/%m/%d"))
+        get_connection_manager().close_all()
+        job.release()
+        LOGGER.info(f"Filled gaps of {gaps} dates")
+        sys.exit(0)
+
     # Uncomment these sections as needed
 
     # # Import data from CSV file
@@ -772,14 +893,18 @@ def main():
     # Use specific date for testing if needed
     # today_str = date(2025, 5, 2).strftime('%Y/%m/%d')
 
-    # Fetch futures data
-    parser.fetch_data_from_web(item="Fut", target_date=target_date)
+    # Closed days publish nothing, so do not start a browser for them
+    if parser.calendar.is_trading_day(target_date):
+        # Fetch futures data
+        parser.fetch_data_from_web(item="Fut", target_date=target_date)
 
-    # Fetch options data
-    parser.fetch_data_from_web(item="OP", target_date=target_date)
+        # Fetch options data
+        parser.fetch_data_from_web(item="OP", target_date=target_date)
 
-    # Fetch spot market data
-    parser.fetch_data_from_web(item="SPOT", target_date=target_date)
+        # Fetch spot market data
+        parser.fetch_data_from_web(item="SPOT", target_date=target_date)
+    else:
+        LOGGER.info(f"{target_date} is not a trading day, skipping the fetch")
 
     # Run trading strategy calculations
     parser.run_trading_strategy()
@@ -788,9 +913,10 @@ def main():
     # if args.item in ('Fut', 'OP'):
     #    parser.run_trading_strategy(target_date)
 
+    get_connection_manager().close_all()
+    job.release()
     LOGGER.info("Data processing completed successfully")
 
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,196 @@
+#!/usr/bin/python3
+from abc import ABC, abstractmethod
+from typing import Dict, List, Tuple, Type
+
+import numpy as np
+from lib.candle_builder import CandleBuilder, SESSION_CLOSE_TIMES
+from lib.log_util import LoggerUtil
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+class BarBuilder(ABC):
+    """
+    Base class of bar builders running on parsed tick arrays.
+
+    Subclasses assign every tick of a chronologically ordered session to a bar
+    id; OHLCV values are then computed for all bars in one vectorized pass.
+    Bars are stored in tw{symbol}_{kind}{size} with the candle table layout.
+    """
+
+    kind = ""
+
+    def __init__(self, size: int, volume_divisor: int = 2):
+        """
+        Initialize the bar builder
+
+        Args:
+            size (int): Bar size in the unit of the builder (ticks, contracts or seconds).
+            volume_divisor (int, optional): Divisor applied to tick volumes. Defaults to 2 (B+S records).
+        """
+        if size <= 0:
+            raise ValueError(f"Bar size must be positive: {size}")
+        self.logger = LoggerUtil(name=__name__).get_logger()
+        self.size = size
+        self.volume_divisor = volume_divisor
+
+    @property
+    def name(self) -> str:
+        """Bar type name used as table suffix and on the command line (e.g., 'tick500')"""
+        return f"{self.kind}{self.size}"
+
+    def tick_seconds(self, dates: np.ndarray, times: np.ndarray) -> np.ndarray:
+        """
+        Convert tick dates and times to seconds since 1970-01-01 of the exchange wall clock.
+
+        Args:
+            dates (np.ndarray): Integer dates in YYYYMMDD format.
+            times (np.ndarray): Integer times in HHMMSS format.
+
+        Returns:
+            np.ndarray: Epoch seconds as int64.
+        """
+        times = np.asarray(times, dtype=np.int64)
+        seconds = (times // 10000) * 3600 + (times // 100) % 100 * 60 + times % 100
+        return CandleBuilder.date_to_days(dates) * SECONDS_PER_DAY + seconds
+
+    @staticmethod
+    def format_seconds(seconds: np.ndarray) -> Tuple[List[str], List[str]]:
+        """
+        Format epoch seconds as the 'YYYY/MM/DD' and 'HH:MM:SS' strings stored in the database.
+
+        Args:
+            seconds (np.ndarray): Epoch seconds.
+
+        Returns:
+            Tuple of (date strings, time strings).
+        """
+        stamps = np.datetime_as_string(np.asarray(seconds, dtype=np.int64).astype("datetime64[s]"))
+        return [stamp[:10].replace("-", "/") for stamp in stamps], [stamp[11:19] for stamp in stamps]
+
+    @abstractmethod
+    def bar_ids(self, seconds: np.ndarray, volumes: np.ndarray) -> np.ndarray:
+        """
+        Assign a non-decreasing bar id to each tick.
+
+        Args:
+            seconds (np.ndarray): Epoch seconds of chronologically ordered ticks.
+            volumes (np.ndarray): Tick volumes in contracts.
+
+        Returns:
+            np.ndarray: Bar id of each tick.
+        """
+
+    def bar_labels(self, ids: np.ndarray, last_seconds: np.ndarray) -> np.ndarray:
+        """
+        Label each bar with the time of its last tick.
+
+        Args:
+            ids (np.ndarray): Bar ids.
+            last_seconds (np.ndarray): Epoch seconds of the last tick of each bar.
+
+        Returns:
+            np.ndarray: Label of each bar as epoch seconds.
+        """
+        return last_seconds
+
+    def build(self, dates: np.ndarray, times: np.ndarray, prices: np.ndarray, volumes: np.ndarray) -> List[Tuple]:
+        """
+        Build bars from the ticks of one session.
+
+        Args:
+            dates (np.ndarray): Integer dates in YYYYMMDD format.
+            times (np.ndarray): Integer times in HHMMSS format.
+            prices (np.ndarray): Tick prices.
+            volumes (np.ndarray): Tick volumes.
+
+        Returns:
+            List[Tuple]: Bar tuples (Date, Time, Open, High, Low, Close, Volume).
+        """
+        if len(dates) == 0:
+            return []
+
+        seconds = self.tick_seconds(dates, times)
+        order = np.argsort(seconds, kind="stable")
+        seconds = seconds[order]
+        prices = np.asarray(prices)[order]
+        volumes = np.asarray(volumes)[order] / self.volume_divisor
+
+        ids = self.bar_ids(seconds, volumes)
+        starts = np.flatnonzero(np.concatenate(([True], ids[1:] != ids[:-1])))
+        ends = np.append(starts[1:], len(ids))
+
+        date_strs, time_strs = self.format_seconds(self.bar_labels(ids[starts], seconds[ends - 1]))
+        bars = list(
+            zip(
+                date_strs,
+                time_strs,
+                prices[starts].tolist(),
+                np.maximum.reduceat(prices, starts).tolist(),
+                np.minimum.reduceat(prices, starts).tolist(),
+                prices[ends - 1].tolist(),
+                np.floor(np.add.reduceat(volumes, starts)).astype(np.int64).tolist(),
+            )
+        )
+        self.logger.debug(f"Generated {len(bars)} {self.name} bars from {len(dates)} ticks")
+        return bars
+
+
+class TickBarBuilder(BarBuilder):
+    """Bars of a fixed number of ticks"""
+
+    kind = "tick"
+
+    def bar_ids(self, seconds: np.ndarray, volumes: np.ndarray) -> np.ndarray:
+        return np.arange(len(seconds)) // self.size
+
+
+class VolumeBarBuilder(BarBuilder):
+    """Bars closing once a fixed number of contracts has traded"""
+
+    kind = "volume"
+
+    def bar_ids(self, seconds: np.ndarray, volumes: np.ndarray) -> np.ndarray:
+        # A tick belongs to the bar in which its first contract trades
+        traded_before = np.cumsum(volumes) - volumes
+        return (traded_before // self.size).astype(np.int64)
+
+
+class SecondBarBuilder(BarBuilder):
+    """Time bars of N seconds, labelled with the end of the interval like minute candles"""
+
+    kind = "second"
+
+    def tick_seconds(self, dates: np.ndarray, times: np.ndarray) -> np.ndarray:
+        # Session closing ticks belong to the bar ending at that exact time
+        seconds = super().tick_seconds(dates, times)
+        return seconds - np.isin(np.asarray(times, dtype=np.int64), SESSION_CLOSE_TIMES)
+
+    def bar_ids(self, seconds: np.ndarray, volumes: np.ndarray) -> np.ndarray:
+        return seconds // self.size
+
+    def bar_labels(self, ids: np.ndarray, last_seconds: np.ndarray) -> np.ndarray:
+        return (ids + 1) * self.size
+
+
+# Registry of bar builders by kind
+BAR_BUILDERS: Dict[str, Type[BarBuilder]] = {
+    builder.kind: builder for builder in (TickBarBuilder, VolumeBarBuilder, SecondBarBuilder)
+}
+
+
+def parse_bar_spec(spec: str, volume_divisor: int = 2) -> BarBuilder:
+    """
+    Create a bar builder from a 'kind:size' specification (e.g., 'tick:500', 'second:30').
+
+    Args:
+        spec (str): Bar specification.
+        volume_divisor (int, optional): Divisor applied to tick volumes. Defaults to 2.
+
+    Returns:
+        BarBuilder: Configured bar builder.
+    """
+    kind, _, size = spec.partition(":")
+    if kind not in BAR_BUILDERS or not size.isdigit():
+        raise ValueError(f"Invalid bar specification '{spec}', expected one of {sorted(BAR_BUILDERS)} as KIND:SIZE")
+    return BAR_BUILDERS[kind](int(size), volume_divisor=volume_divisor)
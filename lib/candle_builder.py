@@ -0,0 +1,307 @@
+#!/usr/bin/python3
+from typing import List, Optional, Tuple
+
+import numpy as np
+from lib.log_util import LoggerUtil
+
+# Session boundaries expressed as minutes of the day
+NIGHT_CLOSE_MINUTE = 5 * 60  # 05:00
+DAY_OPEN_MINUTE = 8 * 60 + 45  # 08:45
+DAY_CLOSE_MINUTE = 13 * 60 + 45  # 13:45
+NIGHT_OPEN_MINUTE = 15 * 60  # 15:00
+MINUTES_PER_DAY = 24 * 60
+
+# Multiplier separating the series id from the epoch minute in combined group keys
+SERIES_KEY_STRIDE = 1 << 32
+
+# Closing ticks (HHMMSS) which belong to the candle ending at that exact time
+SESSION_CLOSE_TIMES = (50000, 134500)
+
+
+class CandleBuilder:
+    """
+    Vectorized builder that turns tick arrays into one-minute OHLCV candles.
+
+    Every tick is mapped to an integer minute bucket (minutes since 1970-01-01
+    of the exchange wall clock) in one pass, and OHLCV values are computed with
+    grouped reductions over the sorted buckets. Session rules follow the
+    original per-tick loop:
+        - a candle is labelled with the end of its minute (08:45:xx -> 08:46:00)
+        - the 05:00:00 and 13:45:00 closing ticks fold into the last candle
+        - ticks before the 08:45 / 15:00 anchors fold into the first candle
+        - volume is halved because reports count both buy and sell sides
+    """
+
+    def __init__(self, volume_divisor: int = 2):
+        """
+        Initialize the candle builder
+
+        Args:
+            volume_divisor (int, optional): Divisor applied to summed volume. Defaults to 2 (B+S records).
+        """
+        self.logger = LoggerUtil(name=__name__).get_logger()
+        self.volume_divisor = volume_divisor
+
+    @staticmethod
+    def date_to_days(dates: np.ndarray) -> np.ndarray:
+        """
+        Convert YYYYMMDD integers to days since 1970-01-01.
+
+        Args:
+            dates (np.ndarray): Integer dates in YYYYMMDD format.
+
+        Returns:
+            np.ndarray: Day numbers as int64.
+        """
+        dates = np.asarray(dates, dtype=np.int64)
+        months = (dates // 10000 - 1970) * 12 + (dates // 100) % 100 - 1
+        days = months.astype("datetime64[M]").astype("datetime64[D]") + (dates % 100 - 1)
+        return days.astype(np.int64)
+
+    def minute_keys(self, dates: np.ndarray, times: np.ndarray) -> np.ndarray:
+        """
+        Map ticks to the epoch minute of the candle they belong to.
+
+        Args:
+            dates (np.ndarray): Integer dates in YYYYMMDD format.
+            times (np.ndarray): Integer times in HHMMSS format.
+
+        Returns:
+            np.ndarray: Candle keys as minutes since 1970-01-01 (candle end time).
+        """
+        times = np.asarray(times, dtype=np.int64)
+        minutes = (times // 10000) * 60 + (times // 100) % 100
+
+        # A candle is labelled with the end of its minute, except for closing ticks
+        labels = minutes + 1
+        closing = np.isin(times, SESSION_CLOSE_TIMES)
+        labels[closing] = minutes[closing]
+
+        # Ticks before a session anchor belong to the first candle of that session
+        pre_day = (minutes >= NIGHT_CLOSE_MINUTE) & (minutes < DAY_OPEN_MINUTE) & ~closing
+        pre_night = (minutes >= DAY_CLOSE_MINUTE) & (minutes < NIGHT_OPEN_MINUTE) & ~closing
+        labels[pre_day] = DAY_OPEN_MINUTE + 1
+        labels[pre_night] = NIGHT_OPEN_MINUTE + 1
+
+        return self.date_to_days(dates) * MINUTES_PER_DAY + labels
+
+    @staticmethod
+    def is_day_candle(time_str: str) -> bool:
+        """
+        Check whether a candle labelled 'HH:MM:SS' belongs to the day session (08:46-13:45).
+
+        Args:
+            time_str (str): Candle time label.
+
+        Returns:
+            bool: True for day session candles.
+        """
+        return "05:00:00" < time_str < "15:00:00"
+
+    @staticmethod
+    def day_session_mask(times: np.ndarray) -> np.ndarray:
+        """
+        Flag ticks of the day session, using the same boundaries as is_day_candle().
+
+        Args:
+            times (np.ndarray): Integer times in HHMMSS format.
+
+        Returns:
+            np.ndarray: Boolean mask, True for day session ticks.
+        """
+        times = np.asarray(times, dtype=np.int64)
+        return (times > 50000) & (times < 150000)
+
+    @staticmethod
+    def format_keys(keys: np.ndarray) -> Tuple[List[str], List[str]]:
+        """
+        Format candle keys as the 'YYYY/MM/DD' and 'HH:MM:SS' strings stored in the database.
+
+        Args:
+            keys (np.ndarray): Candle keys as epoch minutes.
+
+        Returns:
+            Tuple of (date strings, time strings).
+        """
+        stamps = np.datetime_as_string(np.asarray(keys, dtype=np.int64).astype("datetime64[m]"))
+        dates = [stamp[:10].replace("-", "/") for stamp in stamps]
+        times = [f"{stamp[11:16]}:00" for stamp in stamps]
+        return dates, times
+
+    def reduce(
+        self, keys: np.ndarray, prices: np.ndarray, volumes: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Compute OHLCV per key with grouped reductions, keeping tick order within each key.
+
+        Args:
+            keys (np.ndarray): Group key of each tick.
+            prices (np.ndarray): Tick prices.
+            volumes (np.ndarray): Tick volumes.
+
+        Returns:
+            Tuple of (keys, open, high, low, close, volume) arrays, one entry per group.
+        """
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        prices = prices[order]
+        volumes = volumes[order]
+
+        starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+        ends = np.append(starts[1:], len(keys))
+
+        return (
+            keys[starts],
+            prices[starts],
+            np.maximum.reduceat(prices, starts),
+            np.minimum.reduceat(prices, starts),
+            prices[ends - 1],
+            np.add.reduceat(volumes, starts) // self.volume_divisor,
+        )
+
+    def to_candles(self, keys: np.ndarray, prices: np.ndarray, volumes: np.ndarray) -> List[Tuple]:
+        """
+        Reduce keyed ticks into candle tuples.
+
+        Args:
+            keys (np.ndarray): Candle key of each tick as returned by minute_keys().
+            prices (np.ndarray): Tick prices.
+            volumes (np.ndarray): Tick volumes (B+S).
+
+        Returns:
+            List[Tuple]: Candle tuples (Date, Time, Open, High, Low, Close, Volume).
+        """
+        keys, opens, highs, lows, closes, vols = self.reduce(keys, np.asarray(prices), np.asarray(volumes))
+        date_strs, time_strs = self.format_keys(keys)
+        return list(
+            zip(date_strs, time_strs, opens.tolist(), highs.tolist(), lows.tolist(), closes.tolist(), vols.tolist())
+        )
+
+    def build(self, dates: np.ndarray, times: np.ndarray, prices: np.ndarray, volumes: np.ndarray) -> List[Tuple]:
+        """
+        Build one-minute candles from tick columns.
+
+        Args:
+            dates (np.ndarray): Integer dates in YYYYMMDD format.
+            times (np.ndarray): Integer times in HHMMSS format.
+            prices (np.ndarray): Tick prices.
+            volumes (np.ndarray): Tick volumes (B+S).
+
+        Returns:
+            List[Tuple]: Candle tuples (Date, Time, Open, High, Low, Close, Volume).
+        """
+        if len(dates) == 0:
+            self.logger.warning("Tick array is empty. No candles to process.")
+            return []
+
+        candles = self.to_candles(self.minute_keys(dates, times), prices, volumes)
+        self.logger.info(f"Generated {len(candles)} candles from {len(dates)} ticks.")
+        return candles
+
+    def build_series(
+        self,
+        series_ids: np.ndarray,
+        dates: np.ndarray,
+        times: np.ndarray,
+        prices: np.ndarray,
+        volumes: np.ndarray,
+    ) -> List[Tuple]:
+        """
+        Build one-minute candles for many series at once with a single integer group key.
+
+        Args:
+            series_ids (np.ndarray): Non-negative integer series id of each tick.
+            dates (np.ndarray): Integer dates in YYYYMMDD format.
+            times (np.ndarray): Integer times in HHMMSS format.
+            prices (np.ndarray): Tick prices.
+            volumes (np.ndarray): Tick volumes.
+
+        Returns:
+            List[Tuple]: Candle tuples (SeriesId, Date, Time, Open, High, Low, Close, Volume).
+        """
+        if len(dates) == 0:
+            self.logger.warning("Tick array is empty. No candles to process.")
+            return []
+
+        keys = np.asarray(series_ids, dtype=np.int64) * SERIES_KEY_STRIDE + self.minute_keys(dates, times)
+        keys, opens, highs, lows, closes, vols = self.reduce(keys, np.asarray(prices), np.asarray(volumes))
+        date_strs, time_strs = self.format_keys(keys % SERIES_KEY_STRIDE)
+
+        candles = list(
+            zip(
+                (keys // SERIES_KEY_STRIDE).tolist(),
+                date_strs,
+                time_strs,
+                opens.tolist(),
+                highs.tolist(),
+                lows.tolist(),
+                closes.tolist(),
+                vols.tolist(),
+            )
+        )
+        self.logger.info(f"Generated {len(candles)} candles from {len(dates)} ticks.")
+        return candles
+
+
+class CandleAccumulator:
+    """
+    Incremental candle builder fed with consecutive tick blocks of one series.
+
+    Ticks of the last (still open) minute bucket are carried over to the next
+    block, so a candle is only emitted once all of its ticks have been seen and
+    memory stays bounded by the block size.
+    """
+
+    def __init__(self, builder: CandleBuilder):
+        """
+        Initialize the accumulator
+
+        Args:
+            builder (CandleBuilder): Builder providing the bucketing and reduction rules.
+        """
+        self.builder = builder
+        self.candles: List[Tuple] = []
+        self.tick_count = 0
+        self._pending: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+
+    def feed(self, dates: np.ndarray, times: np.ndarray, prices: np.ndarray, volumes: np.ndarray):
+        """
+        Add a block of chronologically ordered ticks.
+
+        Args:
+            dates (np.ndarray): Integer dates in YYYYMMDD format.
+            times (np.ndarray): Integer times in HHMMSS format.
+            prices (np.ndarray): Tick prices.
+            volumes (np.ndarray): Tick volumes (B+S).
+        """
+        if len(dates) == 0:
+            return
+        self.tick_count += len(dates)
+
+        keys = self.builder.minute_keys(dates, times)
+        prices = np.asarray(prices)
+        volumes = np.asarray(volumes)
+        if self._pending is not None:
+            keys = np.concatenate((self._pending[0], keys))
+            prices = np.concatenate((self._pending[1], prices))
+            volumes = np.concatenate((self._pending[2], volumes))
+
+        # The last bucket may continue in the next block
+        is_open = keys == keys.max()
+        self._pending = (keys[is_open], prices[is_open], volumes[is_open])
+
+        closed = ~is_open
+        if closed.any():
+            self.candles.extend(self.builder.to_candles(keys[closed], prices[closed], volumes[closed]))
+
+    def finish(self) -> List[Tuple]:
+        """
+        Close the open bucket and return all candles.
+
+        Returns:
+            List[Tuple]: Candle tuples (Date, Time, Open, High, Low, Close, Volume).
+        """
+        if self._pending is not None:
+            self.candles.extend(self.builder.to_candles(*self._pending))
+            self._pending = None
+        return self.candles
@@ -0,0 +1,385 @@
+#!/usr/bin/python3
+import re
+import sqlite3
+import stat
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from lib.candle_store import (
+    COMPACT_COLUMNS_SQL,
+    LEGACY_TO_COMPACT_SQL,
+    ensure_compact_table,
+    is_compact,
+    to_minute,
+    upsert_candles,
+)
+from lib.log_util import LoggerUtil
+
+PARTITION_NAME = "FCT_{year}.db"
+PARTITION_FILE = re.compile(r"^FCT_(\d{4})\.db$")
+PARTITION_SCHEMA = re.compile(r"^p(\d{4})$")
+
+# The night session of the last trading day of a year arrives with the first report of the next one
+FREEZE_GRACE_DAYS = 7
+
+# SQLite attaches at most this many databases to one connection (SQLITE_MAX_ATTACHED of stock builds)
+MAX_ATTACHED = 10
+
+
+class CandlePartitions:
+    """
+    Minute candles split into one SQLite file per year next to FCT_DB.db.
+
+    FCT_{year}.db holds the compact tw{symbol}_m tables of one year. The
+    partitions a date range needs are attached to a connection as p{year},
+    and TEMP views named tw{symbol}_m and tw{symbol} union them, so queries
+    written for the single-file layout keep working. Past years are frozen:
+    the file is made read-only and readers attach it with immutable=1.
+
+    SQLite attaches at most MAX_ATTACHED databases to a connection, so
+    readers of a longer history go through attach_batches(), which attaches
+    a batch of years at a time.
+
+    The layout is active as soon as one partition file exists; until then
+    every method leaves connections untouched.
+    """
+
+    def __init__(self, base_path: Path):
+        """
+        Initialize the partition set
+
+        Args:
+            base_path (Path): Directory holding FCT_DB.db and the partitions.
+        """
+        self.logger = LoggerUtil(name=__name__).get_logger()
+        self.base_path = Path(base_path)
+
+    @staticmethod
+    def schema(year: int) -> str:
+        """Schema name a partition is attached as"""
+        return f"p{year}"
+
+    def path(self, year: int) -> Path:
+        """Database file of a partition"""
+        return self.base_path / PARTITION_NAME.format(year=year)
+
+    def years(self) -> List[int]:
+        """Years with a partition file, in ascending order"""
+        if not self.base_path.is_dir():
+            return []
+        matches = (PARTITION_FILE.match(path.name) for path in self.base_path.iterdir())
+        return sorted(int(match.group(1)) for match in matches if match)
+
+    @property
+    def enabled(self) -> bool:
+        """Whether candles are stored in year partitions"""
+        return bool(self.years())
+
+    def is_frozen(self, year: int) -> bool:
+        """Whether a partition was made immutable by freeze()"""
+        path = self.path(year)
+        return path.exists() and not path.stat().st_mode & stat.S_IWUSR
+
+    @staticmethod
+    def _attached(conn: sqlite3.Connection) -> Dict[str, str]:
+        return {row[1]: row[2] for row in conn.execute("PRAGMA database_list;").fetchall()}
+
+    @staticmethod
+    def _free_slots(attached: Dict[str, str]) -> int:
+        """Databases partitions may occupy next to the ones the caller attached itself"""
+        others = [
+            schema for schema in attached if schema not in ("main", "temp") and not PARTITION_SCHEMA.match(schema)
+        ]
+        return MAX_ATTACHED - len(others)
+
+    @staticmethod
+    def _union(name: str, schemas: Iterable[str]) -> str:
+        return " UNION ALL ".join(f"SELECT * FROM {schema}.{name}" for schema in schemas)
+
+    @staticmethod
+    def _tables(conn: sqlite3.Connection, schemas: Iterable[str]) -> Dict[str, List[str]]:
+        """Compact candle tables of attached partitions, to the schemas holding each"""
+        tables: Dict[str, List[str]] = {}
+        for schema in schemas:
+            for (name,) in conn.execute(
+                f"SELECT name FROM {schema}.sqlite_master WHERE type='table' AND name GLOB 'tw*_m';"
+            ).fetchall():
+                tables.setdefault(name, []).append(schema)
+        return tables
+
+    def attach(self, conn: sqlite3.Connection, start_date: datetime, end_date: datetime) -> List[int]:
+        """
+        Attach the partitions of a date range for reading and rebuild the TEMP views over them.
+
+        Partitions outside the range are detached. A range before the first
+        partition still gets the newest one, so the views exist and queries
+        return no rows instead of failing. A connection that already has the
+        partitions and views of the range is left as it is, so repeated reads
+        on a cached connection attach once per range.
+
+        Args:
+            conn (sqlite3.Connection): Connection opened with uri=True, e.g. a read-only
+                connection of the ConnectionManager.
+            start_date (datetime): First date of the range.
+            end_date (datetime): Last date of the range.
+
+        Returns:
+            List[int]: Years attached, empty if the layout is not in use.
+
+        Raises:
+            ValueError: If the range spans more partitions than the connection can attach; use attach_batches().
+        """
+        all_years = self.years()
+        if not all_years:
+            return []
+        years = [year for year in all_years if start_date.year <= year <= end_date.year] or all_years[-1:]
+        wanted = {self.schema(year): year for year in years}
+
+        attached = self._attached(conn)
+        if len(wanted) > self._free_slots(attached):
+            raise ValueError(
+                f"{len(wanted)} partitions needed for {years[0]}-{years[-1]}, but only {self._free_slots(attached)} "
+                f"can be attached to one connection; read the range with attach_batches()"
+            )
+
+        # A long-lived connection keeps its views while the range needs the same partitions and tables
+        if {schema for schema in attached if PARTITION_SCHEMA.match(schema)} == set(wanted):
+            views = conn.execute("SELECT name, sql FROM temp.sqlite_master WHERE type='view' AND name GLOB 'tw*_m';")
+            if {name: sql.split(" AS ", 1)[1] for name, sql in views.fetchall()} == {
+                name: self._union(name, schemas) for name, schemas in self._tables(conn, wanted).items()
+            }:
+                return years
+
+        # Views must go before the databases they read from
+        views = conn.execute("SELECT name FROM temp.sqlite_master WHERE type='view' AND name GLOB 'tw*';").fetchall()
+        for (name,) in views:
+            conn.execute(f"DROP VIEW temp.{name};")
+        for schema in attached:
+            if PARTITION_SCHEMA.match(schema) and schema not in wanted:
+                conn.execute(f"DETACH DATABASE {schema};")
+
+        for schema, year in wanted.items():
+            if schema in attached:
+                continue
+            mode = "ro&immutable=1" if self.is_frozen(year) else "ro"
+            conn.execute(f"ATTACH DATABASE ? AS {schema};", (f"{self.path(year).resolve().as_uri()}?mode={mode}",))
+
+        for name, schemas in self._tables(conn, wanted).items():
+            conn.execute(f"CREATE TEMP VIEW {name} AS {self._union(name, schemas)};")
+            conn.execute(f"CREATE TEMP VIEW {name[:-2]} AS SELECT {COMPACT_COLUMNS_SQL} FROM temp.{name};")
+
+        self.logger.debug(f"Attached candle partitions {years}")
+        return years
+
+    def attach_batches(
+        self, conn: sqlite3.Connection, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None
+    ) -> Iterator[Tuple[Optional[datetime], Optional[datetime]]]:
+        """
+        Attach the partitions of a range a batch of years at a time, for readers of more years than attach() takes
+
+        Each batch is attached when the next item is requested, so the caller
+        must not be inside a transaction then. A range that fits one batch,
+        or a database without partitions, yields once.
+
+        Args:
+            conn (sqlite3.Connection): Connection opened with uri=True; databases the caller attached
+                itself (e.g. an output file) reduce the batch size.
+            start_date (datetime, optional): First date. Defaults to the first partition.
+            end_date (datetime, optional): Last date. Defaults to the last partition.
+
+        Returns:
+            Iterator over the part of the range each batch covers, as (first date, last date); the
+                outer ends are start_date and end_date as given.
+        """
+        first, last = (start_date or datetime.min), (end_date or datetime.max)
+        years = [year for year in self.years() if first.year <= year <= last.year]
+        size = self._free_slots(self._attached(conn))
+        batches = [years[index : index + size] for index in range(0, len(years), size)]
+        if len(batches) <= 1:
+            self.attach(conn, first, last)
+            yield start_date, end_date
+            return
+
+        for number, batch in enumerate(batches):
+            self.attach(conn, datetime(batch[0], 1, 1), datetime(batch[-1], 12, 31))
+            yield (
+                start_date if number == 0 else datetime(batch[0], 1, 1),
+                end_date if number == len(batches) - 1 else datetime(batch[-1], 12, 31),
+            )
+
+    def prepare(self, conn: sqlite3.Connection, years: Iterable[int]):
+        """
+        Attach partitions for writing, creating missing ones.
+
+        ATTACH is not allowed inside a transaction, so call this before the
+        first write of the transaction that stores the candles. Outside a
+        transaction, partitions of other years are detached first, so a
+        connection reused across a long backfill stays under MAX_ATTACHED.
+
+        Args:
+            conn (sqlite3.Connection): Writable connection to FCT_DB.db.
+            years (Iterable[int]): Years about to be written.
+
+        Raises:
+            PermissionError: If a year is frozen.
+            ValueError: If more years are asked for than the connection can attach.
+        """
+        years = sorted(set(years))
+        attached = self._attached(conn)
+        if not conn.in_transaction:
+            for schema in list(attached):
+                match = PARTITION_SCHEMA.match(schema)
+                if match and int(match.group(1)) not in years:
+                    conn.execute(f"DETACH DATABASE {schema};")
+                    del attached[schema]
+        partitions = {schema for schema in attached if PARTITION_SCHEMA.match(schema)}
+        if len(partitions | {self.schema(year) for year in years}) > self._free_slots(attached):
+            raise ValueError(
+                f"Cannot attach partitions {years} for writing next to {sorted(partitions)}: "
+                f"SQLite attaches at most {MAX_ATTACHED} databases"
+            )
+        for year in years:
+            if self.is_frozen(year):
+                raise PermissionError(
+                    f"{self.path(year).name} is frozen (run 'db_tool.py unfreeze {year}' to write it)"
+                )
+            schema = self.schema(year)
+            if schema in attached:
+                continue
+            conn.execute(f"ATTACH DATABASE ? AS {schema};", (str(self.path(year)),))
+            conn.execute(f"PRAGMA {schema}.journal_mode=WAL;")
+            self.logger.debug(f"Attached {self.path(year).name} for writing")
+
+    def store(self, cursor: sqlite3.Cursor, symbol: str, candles: Sequence[Tuple]):
+        """
+        Upsert candles into the partitions of their years
+
+        Args:
+            cursor (sqlite3.Cursor): Cursor of a connection passed to prepare(), committed by the caller.
+            symbol (str): Futures symbol (e.g., 'TX').
+            candles (Sequence[Tuple]): Candle tuples (Date, Time, Open, High, Low, Close, Volume).
+        """
+        by_year: Dict[int, List[Tuple]] = {}
+        for candle in candles:
+            by_year.setdefault(int(candle[0][:4]), []).append(candle)
+
+        for year, rows in by_year.items():
+            schema = self.schema(year)
+            ensure_compact_table(cursor, symbol, schema)
+            upsert_candles(cursor, symbol, rows, schema)
+
+    def split(self, conn: sqlite3.Connection, symbols: Iterable[str]) -> Dict[int, int]:
+        """
+        Move the candles of FCT_DB.db into year partitions, one symbol and year per transaction.
+
+        The source table of a symbol is dropped once all its years are copied;
+        run VACUUM on FCT_DB.db afterwards to give the space back.
+
+        Args:
+            conn (sqlite3.Connection): Connection to FCT_DB.db opened with isolation_level=None.
+            symbols (Iterable[str]): Futures symbols (e.g., ['TX', 'MTX']).
+
+        Returns:
+            Dict[int, int]: Candles written per year.
+        """
+        cursor = conn.cursor()
+        moved: Dict[int, int] = {}
+        for symbol in symbols:
+            if is_compact(cursor, symbol):
+                source = f"SELECT * FROM tw{symbol}_m"
+                years_sql = f"SELECT DISTINCT strftime('%Y', Minute * 60, 'unixepoch') FROM tw{symbol}_m;"
+                drops = [f"DROP VIEW IF EXISTS tw{symbol};", f"DROP TABLE tw{symbol}_m;"]
+            else:
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?;", (f"tw{symbol}",))
+                if cursor.fetchone() is None:
+                    self.logger.warning(f"tw{symbol} not found, nothing to split")
+                    continue
+                source = LEGACY_TO_COMPACT_SQL.format(symbol=symbol)
+                years_sql = f"SELECT DISTINCT substr(Date, 1, 4) FROM tw{symbol};"
+                drops = [f"DROP TABLE tw{symbol};"]
+
+            years = [int(row[0]) for row in cursor.execute(years_sql).fetchall()]
+
+            # One year per transaction keeps a single partition attached; a failed run is resumed by running it again
+            for year in years:
+                self.prepare(conn, [year])
+                schema = self.schema(year)
+                cursor.execute("BEGIN;")
+                try:
+                    ensure_compact_table(cursor, symbol, schema)
+                    cursor.execute(
+                        f"INSERT OR REPLACE INTO {schema}.tw{symbol}_m SELECT * FROM ({source}) "
+                        "WHERE Minute>=? AND Minute<?;",
+                        (to_minute(f"{year}/01/01", "00:00:00"), to_minute(f"{year + 1}/01/01", "00:00:00")),
+                    )
+                    moved[year] = moved.get(year, 0) + cursor.rowcount
+                    cursor.execute("COMMIT;")
+                except Exception:
+                    cursor.execute("ROLLBACK;")
+                    raise
+                cursor.execute(f"DETACH DATABASE {schema};")
+
+            # The source goes once every year is copied
+            cursor.execute("BEGIN;")
+            try:
+                for statement in drops:
+                    cursor.execute(statement)
+                cursor.execute("COMMIT;")
+            except Exception:
+                cursor.execute("ROLLBACK;")
+                raise
+            self.logger.info(f"Moved tw{symbol} into partitions {years}")
+
+        return moved
+
+    def freeze(self, year: int):
+        """
+        Make a partition immutable: fold its WAL back into the file and drop write permission.
+
+        No other connection may have the partition open.
+
+        Args:
+            year (int): Partition year.
+        """
+        path = self.path(year)
+        conn = sqlite3.connect(str(path))
+        try:
+            conn.execute("PRAGMA journal_mode=DELETE;")
+        finally:
+            conn.close()
+        path.chmod(stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        self.logger.info(f"Froze {path.name}")
+
+    def unfreeze(self, year: int):
+        """
+        Make a frozen partition writable again, e.g. for a --force or --fill-gaps backfill of a closed year.
+
+        Readers that attached it with immutable=1 must reconnect to see the new
+        rows. freeze_closed_years() freezes it again.
+
+        Args:
+            year (int): Partition year.
+        """
+        path = self.path(year)
+        path.chmod(path.stat().st_mode | stat.S_IWUSR)
+        self.logger.info(f"Unfroze {path.name}")
+
+    def freeze_closed_years(self, today: Optional[date] = None) -> List[int]:
+        """
+        Freeze every partition of a year that ended more than FREEZE_GRACE_DAYS ago
+
+        Args:
+            today (date, optional): Reference date. Defaults to today.
+
+        Returns:
+            List[int]: Years frozen by this call.
+        """
+        today = today or date.today()
+        frozen = []
+        for year in self.years():
+            if self.is_frozen(year) or date(year + 1, 1, 1) + timedelta(days=FREEZE_GRACE_DAYS) > today:
+                continue
+            self.freeze(year)
+            frozen.append(year)
+        return frozen
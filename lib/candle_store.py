@@ -0,0 +1,242 @@
+#!/usr/bin/python3
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Optional, Sequence, Tuple
+
+from lib.db_schema import ensure_candle_table
+from lib.log_util import LoggerUtil
+
+# Re-ingested minutes replace the stored row in place
+CANDLE_UPSERT_SQL = """
+    INSERT INTO tw{symbol} VALUES (?,?,?,?,?,?,?)
+    ON CONFLICT(Date, Time) DO UPDATE SET
+        Open=excluded.Open,
+        High=excluded.High,
+        Low=excluded.Low,
+        Close=excluded.Close,
+        Volume=excluded.Volume;
+"""
+
+# Compact candles keyed by the epoch minute of the candle label (wall clock as UTC)
+COMPACT_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS {schema}.tw{symbol}_m(
+        Minute INTEGER PRIMARY KEY,
+        Open INTEGER NOT NULL,
+        High INTEGER NOT NULL,
+        Low INTEGER NOT NULL,
+        Close INTEGER NOT NULL,
+        Volume INTEGER NOT NULL
+    ) WITHOUT ROWID;
+"""
+
+COMPACT_UPSERT_SQL = """
+    INSERT INTO {schema}.tw{symbol}_m VALUES (?,?,?,?,?,?)
+    ON CONFLICT(Minute) DO UPDATE SET
+        Open=excluded.Open,
+        High=excluded.High,
+        Low=excluded.Low,
+        Close=excluded.Close,
+        Volume=excluded.Volume;
+"""
+
+# Columns of the legacy layout computed from the compact table
+COMPACT_COLUMNS_SQL = """
+    strftime('%Y/%m/%d', Minute * 60, 'unixepoch') AS Date,
+    strftime('%H:%M:%S', Minute * 60, 'unixepoch') AS Time,
+    Open, High, Low, Close, Volume
+"""
+
+# Legacy tw{symbol} name kept readable for get_data.py and ad-hoc SQL
+COMPAT_VIEW_SQL = (
+    "CREATE VIEW IF NOT EXISTS {schema}.tw{symbol} AS SELECT " + COMPACT_COLUMNS_SQL + " FROM tw{symbol}_m;"
+)
+
+# Legacy rows in the compact layout; later rows win for legacy duplicated minutes
+LEGACY_TO_COMPACT_SQL = """
+    SELECT CAST(strftime('%s', replace(Date, '/', '-') || ' ' || Time) AS INTEGER) / 60 AS Minute,
+           CAST(Open AS INTEGER) AS Open, CAST(High AS INTEGER) AS High, CAST(Low AS INTEGER) AS Low,
+           CAST(Close AS INTEGER) AS Close, CAST(Volume AS INTEGER) AS Volume
+    FROM tw{symbol} ORDER BY rowid
+"""
+
+
+def to_minute(date: str, time: str) -> int:
+    """
+    Convert a stored 'YYYY/MM/DD' date and 'HH:MM:SS' time to the compact epoch-minute key.
+
+    Args:
+        date (str): Candle date.
+        time (str): Candle time.
+
+    Returns:
+        int: Minutes since 1970-01-01 of the exchange wall clock.
+    """
+    stamp = datetime.strptime(f"{date} {time}", "%Y/%m/%d %H:%M:%S")
+    return (stamp - datetime(1970, 1, 1)) // timedelta(minutes=1)
+
+
+def is_compact(cursor: sqlite3.Cursor, symbol: str, schema: str = "main") -> bool:
+    """
+    Check whether a symbol has been converted to the compact schema.
+
+    Args:
+        cursor (sqlite3.Cursor): Database cursor.
+        symbol (str): Futures symbol (e.g., 'TX').
+        schema (str, optional): Attached database to look in. Defaults to 'main'.
+
+    Returns:
+        bool: True if tw{symbol}_m exists; in 'temp' it is a view over year partitions.
+    """
+    cursor.execute(
+        f"SELECT 1 FROM {schema}.sqlite_master WHERE type IN ('table', 'view') AND name=?;", (f"tw{symbol}_m",)
+    )
+    return cursor.fetchone() is not None
+
+
+def ensure_compact_table(cursor: sqlite3.Cursor, symbol: str, schema: str = "main"):
+    """
+    Create a compact candle table and its legacy-named view.
+
+    Args:
+        cursor (sqlite3.Cursor): Database cursor.
+        symbol (str): Futures symbol (e.g., 'TX').
+        schema (str, optional): Attached database to create them in. Defaults to 'main'.
+    """
+    cursor.execute(COMPACT_TABLE_SQL.format(schema=schema, symbol=symbol))
+    cursor.execute(COMPAT_VIEW_SQL.format(schema=schema, symbol=symbol))
+
+
+def upsert_candles(cursor: sqlite3.Cursor, symbol: str, candles: Sequence[Tuple], schema: str = "main") -> int:
+    """
+    Write candles to whichever schema the symbol uses, replacing the stored span they cover.
+
+    New minutes are upserted in place; stored minutes between the first and
+    last candle that are not among the new candles are deleted one by one,
+    so a corrected report also drops the minutes it no longer has while an
+    unchanged re-ingest deletes nothing.
+
+    Args:
+        cursor (sqlite3.Cursor): Database cursor, committed by the caller.
+        symbol (str): Futures symbol (e.g., 'TX').
+        candles (Sequence[Tuple]): Candle tuples (Date, Time, Open, High, Low, Close, Volume).
+        schema (str, optional): Attached database holding the candles. Defaults to 'main'.
+
+    Returns:
+        int: Number of legacy duplicated rows removed while creating the unique key.
+    """
+    if not candles:
+        return 0
+    if is_compact(cursor, symbol, schema):
+        rows = [(to_minute(candle[0], candle[1]),) + tuple(candle[2:]) for candle in candles]
+        minutes = {row[0] for row in rows}
+        stored = cursor.execute(
+            f"SELECT Minute FROM {schema}.tw{symbol}_m WHERE Minute>=? AND Minute<=?;", (min(minutes), max(minutes))
+        ).fetchall()
+        vanished = [row for row in stored if row[0] not in minutes]
+        cursor.executemany(f"DELETE FROM {schema}.tw{symbol}_m WHERE Minute=?;", vanished)
+        cursor.executemany(COMPACT_UPSERT_SQL.format(schema=schema, symbol=symbol), rows)
+        return 0
+
+    removed = ensure_candle_table(cursor, symbol)
+    keys = {tuple(candle[:2]) for candle in candles}
+    stored = cursor.execute(
+        f"SELECT Date, Time FROM tw{symbol} WHERE (Date, Time) >= (?, ?) AND (Date, Time) <= (?, ?);",
+        min(keys) + max(keys),
+    ).fetchall()
+    vanished = [row for row in stored if row not in keys]
+    cursor.executemany(f"DELETE FROM tw{symbol} WHERE Date=? AND Time=?;", vanished)
+    cursor.executemany(CANDLE_UPSERT_SQL.format(symbol=symbol), candles)
+    return removed
+
+
+def select_candles(
+    cursor: sqlite3.Cursor, symbol: str, date: str, after: str, until: str, schema: Optional[str] = None
+) -> sqlite3.Cursor:
+    """
+    Run the query for the candles of one day with after < Time <= until, in time order.
+
+    Compact tables are searched on their integer primary key; legacy tables
+    on the (Date, Time) text columns. Rows use the legacy column layout.
+    Year partitions attached by CandlePartitions.attach() take precedence.
+
+    Args:
+        cursor (sqlite3.Cursor): Database cursor.
+        symbol (str): Futures symbol (e.g., 'TX').
+        date (str): Date in 'YYYY/MM/DD' format.
+        after (str): Exclusive start time 'HH:MM:SS'.
+        until (str): Inclusive end time 'HH:MM:SS'.
+        schema (str, optional): Attached database to read, e.g. a partition attached for writing.
+            Defaults to the TEMP partition views if present, else 'main'.
+
+    Returns:
+        sqlite3.Cursor: The cursor, ready for fetchall() or fetchmany().
+    """
+    if schema is None:
+        schema = "temp" if is_compact(cursor, symbol, "temp") else "main"
+    if is_compact(cursor, symbol, schema):
+        return cursor.execute(
+            f"SELECT {COMPACT_COLUMNS_SQL} FROM {schema}.tw{symbol}_m WHERE Minute>? AND Minute<=? ORDER BY Minute;",
+            (to_minute(date, after), to_minute(date, until)),
+        )
+    return cursor.execute(
+        f"SELECT * FROM {schema}.tw{symbol} WHERE Date=? AND Time>? AND Time<=? ORDER BY Date, Time;",
+        (date, after, until),
+    )
+
+
+class CandleCompactor:
+    """
+    Converts legacy text-keyed tw{symbol} tables to the compact integer schema.
+
+    Candles move to tw{symbol}_m (epoch-minute primary key, WITHOUT ROWID,
+    integer OHLCV) and tw{symbol} becomes a view with the original columns,
+    so existing readers keep working unchanged.
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        """
+        Initialize the compactor
+
+        Args:
+            conn (sqlite3.Connection): Connection to FCT_DB.db opened with isolation_level=None.
+        """
+        self.logger = LoggerUtil(name=__name__).get_logger()
+        self.conn = conn
+
+    def convert(self, symbol: str) -> int:
+        """
+        Convert one symbol in a single transaction
+
+        Args:
+            symbol (str): Futures symbol (e.g., 'TX').
+
+        Returns:
+            int: Number of candles in the compact table, 0 if already converted or missing.
+        """
+        cursor = self.conn.cursor()
+        if is_compact(cursor, symbol):
+            self.logger.info(f"tw{symbol} is already compact")
+            return 0
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?;", (f"tw{symbol}",))
+        if cursor.fetchone() is None:
+            self.logger.warning(f"tw{symbol} not found, nothing to convert")
+            return 0
+
+        cursor.execute("BEGIN;")
+        try:
+            cursor.execute(COMPACT_TABLE_SQL.format(schema="main", symbol=symbol))
+            cursor.execute(f"INSERT OR REPLACE INTO tw{symbol}_m {LEGACY_TO_COMPACT_SQL.format(symbol=symbol)};")
+            count = cursor.execute(f"SELECT COUNT(*) FROM tw{symbol}_m;").fetchone()[0]
+            cursor.execute(f"DROP TABLE tw{symbol};")
+            cursor.execute(COMPAT_VIEW_SQL.format(schema="main", symbol=symbol))
+            cursor.execute("COMMIT;")
+        except Exception:
+            cursor.execute("ROLLBACK;")
+            raise
+
+        self.logger.info(f"Converted tw{symbol} to tw{symbol}_m with {count} candles")
+        return count
+
+    def vacuum(self):
+        """Rebuild the database file to release the space of the dropped tables"""
+        self.conn.execute("VACUUM;")
@@ -0,0 +1,367 @@
+#!/usr/bin/python3
+import bisect
+import json
+import sqlite3
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from lib.candle_builder import CandleBuilder
+from lib.log_util import LoggerUtil
+from lib.trading_calendar import TradingCalendar
+
+SESSIONS = ("night", "day")
+
+# Coverage columns; the II tables only exist for the day session
+SOURCES = ("Candles", "II_Fut", "II_OP", "II_SPOT")
+II_SOURCES = SOURCES[1:]
+
+
+def trading_dates(day_dates: Sequence[str], candles: Iterable[Tuple[str, str, int]]) -> Dict[Tuple[str, str], int]:
+    """
+    Count candles per trading date and session.
+
+    The night session is reported with the next trading day: its evening
+    candles carry the calendar date before that day and its candles after
+    midnight the calendar date after the evening. Both belong to the first
+    day session that follows them.
+
+    Args:
+        day_dates (Sequence[str]): Sorted 'YYYY/MM/DD' dates with day session candles.
+        candles (Iterable[Tuple[str, str, int]]): (Date, Time, Count) of candles per calendar date and time bucket.
+
+    Returns:
+        Dict[Tuple[str, str], int]: (trading date, session) to number of candles.
+    """
+    counts: Dict[Tuple[str, str], int] = {}
+    for date, time, count in candles:
+        if CandleBuilder.is_day_candle(time):
+            key = (date, "day")
+        else:
+            # Evening candles belong to a later date, those after midnight to the same or a later one
+            position = (
+                bisect.bisect_right(day_dates, date) if time >= "15:00:00" else bisect.bisect_left(day_dates, date)
+            )
+            if position == len(day_dates):
+                continue
+            key = (day_dates[position], "night")
+        counts[key] = counts.get(key, 0) + count
+    return counts
+
+
+class CoverageIndex:
+    """
+    Records which data exists for every trading date, symbol and session.
+
+    Ingest writes the candle counts of a report, get_data.py writes the II
+    row counts of a date, and db_tool.py rebuilds the whole index from the
+    stored data. A NULL count means the source was never stored for the
+    date; missing() finds every gap of a date range with a single query.
+
+    Weekdays the holiday file does not list are expected to trade. A date
+    that still has no day session after --fill-gaps tried it is recorded as
+    closed, so later runs stop downloading it.
+    """
+
+    TABLE_SQL = """
+        CREATE TABLE IF NOT EXISTS coverage(
+            Date TEXT NOT NULL,
+            Symbol TEXT NOT NULL,
+            Session TEXT NOT NULL,
+            Candles INT,
+            II_Fut INT,
+            II_OP INT,
+            II_SPOT INT,
+            UpdatedAt TEXT,
+            PRIMARY KEY (Date, Symbol, Session)
+        ) WITHOUT ROWID;
+    """
+
+    CLOSED_TABLE_SQL = """
+        CREATE TABLE IF NOT EXISTS coverage_closed(
+            Date TEXT PRIMARY KEY,
+            Reason TEXT,
+            RecordedAt TEXT
+        ) WITHOUT ROWID;
+    """
+
+    # Expected (Date, Symbol, Session) rows of the trading days, left joined with what was recorded
+    MISSING_SQL = """
+        WITH expected AS (
+            SELECT days.value AS Date, symbols.value AS Symbol, sessions.value AS Session
+            FROM json_each(:days) AS days, json_each(:symbols) AS symbols, json_each(:sessions) AS sessions
+        )
+        SELECT e.Date, e.Symbol, e.Session, c.Candles, c.II_Fut, c.II_OP, c.II_SPOT
+        FROM expected AS e LEFT JOIN coverage AS c USING (Date, Symbol, Session)
+        WHERE ({conditions}) {closed}
+        ORDER BY e.Date, e.Symbol, e.Session;
+    """
+
+    def __init__(self, symbols: Sequence[str]):
+        """
+        Initialize the index
+
+        Args:
+            symbols (Sequence[str]): Futures symbols covered (e.g., ['TX', 'MTX']).
+        """
+        self.logger = LoggerUtil(name=__name__).get_logger()
+        self.symbols = list(symbols)
+
+    def record_candles(self, cursor: sqlite3.Cursor, date: str, symbol: str, candles: Iterable[Tuple]):
+        """
+        Record the candles of one report, night and day session
+
+        Args:
+            cursor (sqlite3.Cursor): Cursor of the transaction storing the candles.
+            date (str): Trading date of the report in 'YYYY/MM/DD' format.
+            symbol (str): Futures symbol (e.g., 'TX').
+            candles (Iterable[Tuple]): Candle tuples (Date, Time, ...) of the report.
+        """
+        counts = dict.fromkeys(SESSIONS, 0)
+        for candle in candles:
+            counts["day" if CandleBuilder.is_day_candle(candle[1]) else "night"] += 1
+        cursor.execute(self.TABLE_SQL)
+        self._upsert(cursor, ["Candles"], [(date, symbol, session, counts[session]) for session in SESSIONS])
+        if counts["day"]:
+            # A day session proves the market opened, whatever an earlier run concluded
+            cursor.execute(self.CLOSED_TABLE_SQL)
+            cursor.execute("DELETE FROM coverage_closed WHERE Date=?;", (date,))
+
+    def has_day_session(self, cursor: sqlite3.Cursor, date: str) -> bool:
+        """
+        Check whether any symbol has day session candles recorded on a date
+
+        Args:
+            cursor (sqlite3.Cursor): Cursor of the database holding the coverage table.
+            date (str): Date in 'YYYY/MM/DD' format.
+
+        Returns:
+            bool: True if the market traded on the date.
+        """
+        cursor.execute(self.TABLE_SQL)
+        row = cursor.execute(
+            "SELECT 1 FROM coverage WHERE Date=? AND Session='day' AND Candles > 0 LIMIT 1;", (date,)
+        ).fetchone()
+        return row is not None
+
+    def record_closed(self, cursor: sqlite3.Cursor, dates: Iterable[str], reason: str):
+        """
+        Record dates that have no day session, so missing() stops reporting them
+
+        Args:
+            cursor (sqlite3.Cursor): Database cursor, committed by the caller.
+            dates (Iterable[str]): Dates in 'YYYY/MM/DD' format.
+            reason (str): Why the date is taken as closed, kept for inspection.
+        """
+        recorded_at = datetime.now().isoformat(timespec="seconds")
+        rows = [(date, reason, recorded_at) for date in dates]
+        cursor.execute(self.CLOSED_TABLE_SQL)
+        cursor.executemany("INSERT OR REPLACE INTO coverage_closed VALUES (?,?,?);", rows)
+        if rows:
+            self.logger.warning(f"Recorded {len(rows)} closed dates ({reason}): {[row[0] for row in rows]}")
+
+    def closed_dates(self, cursor: sqlite3.Cursor) -> List[str]:
+        """
+        Get the dates recorded by record_closed()
+
+        Args:
+            cursor (sqlite3.Cursor): Cursor of the database holding the coverage table; read-only works.
+
+        Returns:
+            List[str]: Dates in 'YYYY/MM/DD' format, in date order.
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='coverage_closed';")
+        if cursor.fetchone() is None:
+            return []
+        return [row[0] for row in cursor.execute("SELECT Date FROM coverage_closed ORDER BY Date;").fetchall()]
+
+    def record_ii(self, cursor: sqlite3.Cursor, date: str, source: str, counts: Dict[str, int]):
+        """
+        Record the rows of one II table for a date
+
+        Args:
+            cursor (sqlite3.Cursor): Database cursor, committed by the caller.
+            date (str): Date in 'YYYY/MM/DD' format.
+            source (str): 'II_Fut', 'II_OP' or 'II_SPOT'.
+            counts (Dict[str, int]): Rows per symbol; II_OP and II_SPOT carry the rows of the whole date.
+        """
+        if source not in II_SOURCES:
+            raise ValueError(f"Unknown II source: {source}")
+        cursor.execute(self.TABLE_SQL)
+        self._upsert(cursor, [source], [(date, symbol, "day", counts.get(symbol, 0)) for symbol in self.symbols])
+
+    @staticmethod
+    def count_ii(ii_conn: sqlite3.Connection, source: str, dates: Iterable[str], symbols: Sequence[str]) -> Dict:
+        """
+        Count the rows of one II table per date and symbol
+
+        Args:
+            ii_conn (sqlite3.Connection): Connection to II_DB.db.
+            source (str): 'II_Fut', 'II_OP' or 'II_SPOT'.
+            dates (Iterable[str]): Dates in 'YYYY/MM/DD' format, or None for every date.
+            symbols (Sequence[str]): Futures symbols.
+
+        Returns:
+            Dict: Date to symbol to number of rows.
+        """
+        if source == "II_Fut":
+            query = "SELECT Date, Fut, COUNT(*) FROM II_Fut {where} GROUP BY Date, Fut;"
+        else:
+            query = f"SELECT Date, NULL, COUNT(*) FROM {source} {{where}} GROUP BY Date;"
+        dates = None if dates is None else sorted(set(dates))
+        if dates is None:
+            rows = ii_conn.execute(query.format(where="")).fetchall()
+        else:
+            rows = ii_conn.execute(
+                query.format(where="WHERE Date IN (SELECT value FROM json_each(?))"), (json.dumps(dates),)
+            ).fetchall()
+
+        counts: Dict[str, Dict[str, int]] = {date: {} for date in dates or []}
+        for date, symbol, count in rows:
+            by_symbol = counts.setdefault(date, {})
+            for target in [symbol] if symbol is not None else symbols:
+                if target in symbols:
+                    by_symbol[target] = count
+        return counts
+
+    def rebuild(
+        self,
+        fct_conn: sqlite3.Connection,
+        ii_conn: Optional[sqlite3.Connection],
+        write_cursor: sqlite3.Cursor,
+        batches: Iterable = (None,),
+    ) -> int:
+        """
+        Recompute the whole index from the stored candles and II tables
+
+        Every candle is read before the first write, so fct_conn may attach
+        databases between batches while write_cursor is a separate connection
+        of the same file.
+
+        Args:
+            fct_conn (sqlite3.Connection): Connection reading the tw{symbol} candles (views over partitions work).
+            ii_conn (sqlite3.Connection, optional): Connection to II_DB.db, None to skip the II columns.
+            write_cursor (sqlite3.Cursor): Cursor of the database holding the coverage table, committed by the caller.
+            batches (Iterable, optional): Iterated once per batch of candles to read, e.g.
+                CandlePartitions.attach_batches(fct_conn). Defaults to reading fct_conn as it is.
+
+        Returns:
+            int: Number of coverage rows written.
+        """
+        # Candles per calendar date and session part; night minutes are attributed by trading_dates()
+        buckets: Dict[str, List[Tuple[str, str, int]]] = {symbol: [] for symbol in self.symbols}
+        for _ in batches:
+            tables = {
+                row[0]
+                for row in fct_conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type IN ('table', 'view') "
+                    "UNION SELECT name FROM temp.sqlite_master WHERE type='view';"
+                ).fetchall()
+            }
+            for symbol in self.symbols:
+                if f"tw{symbol}" not in tables:
+                    continue
+                query = f"""
+                    SELECT Date, CASE WHEN Time <= '05:00:00' THEN '05:00:00'
+                                      WHEN Time >= '15:00:00' THEN '15:00:00' ELSE '12:00:00' END AS Bucket, COUNT(*)
+                    FROM tw{symbol} GROUP BY Date, Bucket ORDER BY Date;
+                """
+                buckets[symbol].extend(fct_conn.execute(query).fetchall())
+
+        write_cursor.execute(self.TABLE_SQL)
+        written = 0
+        for symbol in self.symbols:
+            day_dates = sorted({date for date, bucket, _ in buckets[symbol] if bucket == "12:00:00"})
+            counts = trading_dates(day_dates, buckets[symbol])
+            rows = [
+                (date, symbol, session, counts.get((date, session), 0)) for date in day_dates for session in SESSIONS
+            ]
+            self._upsert(write_cursor, ["Candles"], rows)
+            written += len(rows)
+
+        if ii_conn is not None:
+            for source in II_SOURCES:
+                for date, by_symbol in self.count_ii(ii_conn, source, None, self.symbols).items():
+                    self._upsert(
+                        write_cursor,
+                        [source],
+                        [(date, symbol, "day", by_symbol.get(symbol, 0)) for symbol in self.symbols],
+                    )
+        self.logger.info(f"Rebuilt coverage of {self.symbols}: {written} candle rows")
+        return written
+
+    def missing(
+        self,
+        cursor: sqlite3.Cursor,
+        start_date: datetime,
+        end_date: datetime,
+        sources: Sequence[str] = SOURCES,
+        calendar: Optional[TradingCalendar] = None,
+        recheck_closed: bool = False,
+    ) -> Dict[str, Set[str]]:
+        """
+        Find the gaps of a date range with one query
+
+        A source is missing when it was never recorded for the date, or when
+        a day session has no rows; an empty night session is a valid outcome
+        of an ingested report. Only trading days are expected to have data,
+        and dates recorded by record_closed() are not.
+
+        Args:
+            cursor (sqlite3.Cursor): Cursor of the database holding the coverage table.
+            start_date (datetime): First date of the range.
+            end_date (datetime): Last date of the range.
+            sources (Sequence[str], optional): Sources to check. Defaults to all of SOURCES.
+            calendar (TradingCalendar, optional): Calendar of the expected days. Defaults to weekdays.
+            recheck_closed (bool, optional): Also report the dates recorded as closed. Defaults to False.
+
+        Returns:
+            Dict[str, Set[str]]: 'YYYY/MM/DD' date to the sources missing on it, in date order.
+        """
+        conditions = []
+        for source in sources:
+            if source not in SOURCES:
+                raise ValueError(f"Unknown coverage source: {source}")
+            if source == "Candles":
+                conditions.append("c.Candles IS NULL OR (e.Session = 'day' AND c.Candles = 0)")
+            else:
+                conditions.append(f"(e.Session = 'day' AND COALESCE(c.{source}, 0) = 0)")
+        if not conditions:
+            return {}
+
+        days = (calendar or TradingCalendar()).trading_days(start_date, end_date)
+        cursor.execute(self.TABLE_SQL)
+        cursor.execute(self.CLOSED_TABLE_SQL)
+        closed = "" if recheck_closed else "AND e.Date NOT IN (SELECT Date FROM coverage_closed)"
+        rows = cursor.execute(
+            self.MISSING_SQL.format(conditions=" OR ".join(conditions), closed=closed),
+            {
+                "days": json.dumps([day.strftime("%Y/%m/%d") for day in days]),
+                "symbols": json.dumps(self.symbols),
+                "sessions": json.dumps(list(SESSIONS)),
+            },
+        ).fetchall()
+
+        gaps: Dict[str, Set[str]] = {}
+        for date, _, session, *counts in rows:
+            for source, count in zip(SOURCES, counts):
+                if source not in sources:
+                    continue
+                if source == "Candles" and (count is None or (session == "day" and count == 0)):
+                    gaps.setdefault(date, set()).add(source)
+                elif source != "Candles" and session == "day" and not count:
+                    gaps.setdefault(date, set()).add(source)
+        self.logger.info(f"Found {len(gaps)} dates with gaps between {start_date:%Y/%m/%d} and {end_date:%Y/%m/%d}")
+        return gaps
+
+    @staticmethod
+    def _upsert(cursor: sqlite3.Cursor, columns: List[str], rows: List[Tuple]):
+        updated_at = datetime.now().isoformat(timespec="seconds")
+        assignments = ", ".join(f"{column}=excluded.{column}" for column in columns + ["UpdatedAt"])
+        cursor.executemany(
+            f"""
+            INSERT INTO coverage(Date, Symbol, Session, {', '.join(columns)}, UpdatedAt)
+            VALUES (?,?,?,{','.join('?' * len(columns))},?)
+            ON CONFLICT(Date, Symbol, Session) DO UPDATE SET {assignments};
+            """,
+            [row + (updated_at,) for row in rows],
+        )
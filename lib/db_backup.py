@@ -0,0 +1,313 @@
+#!/usr/bin/python3
+import hashlib
+import json
+import lzma
+import os
+import sqlite3
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from lib.log_util import LoggerUtil
+
+# Fixed-size chunks line up with SQLite pages (at most 64 KiB), so an update only dirties the chunks of its pages
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+MANIFEST_PREFIX = "manifest_"
+CHUNK_SUFFIX = ".xz"
+
+
+class LocalBackend:
+    """Stores backup objects as files in a local directory"""
+
+    def __init__(self, root: Path):
+        """
+        Initialize the backend
+
+        Args:
+            root (Path): Backup directory, created on first write.
+        """
+        self.logger = LoggerUtil(name=__name__).get_logger()
+        self.root = Path(root)
+
+    def list(self) -> Set[str]:
+        """Names of the stored objects"""
+        if not self.root.is_dir():
+            return set()
+        return {path.name for path in self.root.iterdir() if path.is_file() and not path.name.startswith(".")}
+
+    def put(self, name: str, data: bytes):
+        """Store an object, replacing it atomically"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        staging = self.root / f".{name}.tmp"
+        staging.write_bytes(data)
+        staging.replace(self.root / name)
+
+    def get(self, name: str) -> bytes:
+        """Read an object"""
+        return (self.root / name).read_bytes()
+
+    def delete(self, name: str):
+        """Remove an object"""
+        (self.root / name).unlink(missing_ok=True)
+
+
+class GDriveBackend:
+    """
+    Stores backup objects as files in one Google Drive folder.
+
+    Uses the authenticated client of a devices.gdrive2.gdrive instance; the
+    folder is created at the Drive root if it does not exist yet.
+    """
+
+    FOLDER_MIMETYPE = "application/vnd.google-apps.folder"
+
+    def __init__(self, device, folder: str = "db_backup"):
+        """
+        Initialize the backend
+
+        Args:
+            device (gdrive): Authenticated Google Drive device.
+            folder (str, optional): Drive folder title. Defaults to 'db_backup'.
+        """
+        self.logger = LoggerUtil(name=__name__).get_logger()
+        self.drive = device.drive
+        found = device.getObjByName(folder)
+        if found:
+            self.folder = found[0]
+        else:
+            self.folder = self.drive.CreateFile({"title": folder, "mimeType": self.FOLDER_MIMETYPE})
+            self.folder.Upload()
+            self.logger.info(f"Created '{folder}' folder in gdrive: id={self.folder['id']}")
+        self._files: Optional[Dict[str, object]] = None
+
+    def _list_files(self) -> Dict[str, object]:
+        if self._files is None:
+            query = f"'{self.folder['id']}' in parents and trashed=false"
+            self._files = {item["title"]: item for item in self.drive.ListFile({"q": query}).GetList()}
+        return self._files
+
+    def list(self) -> Set[str]:
+        """Names of the stored objects, listed with one query and cached"""
+        return set(self._list_files())
+
+    def put(self, name: str, data: bytes):
+        """Upload an object, replacing a file of the same name"""
+        files = self._list_files()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / name
+            path.write_bytes(data)
+            file_obj = self.drive.CreateFile({"title": name, "parents": [{"id": self.folder["id"]}]})
+            file_obj.SetContentFile(str(path))
+            file_obj.Upload()
+        if name in files:
+            files[name].Delete()
+        files[name] = file_obj
+        self.logger.debug(f"Uploaded {name} ({len(data)} bytes) to gdrive")
+
+    def get(self, name: str) -> bytes:
+        """Download an object"""
+        file_obj = self.drive.CreateFile({"id": self._list_files()[name]["id"]})
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / name
+            file_obj.GetContentFile(str(path))
+            return path.read_bytes()
+
+    def delete(self, name: str):
+        """Remove an object"""
+        files = self._list_files()
+        if name in files:
+            files.pop(name).Delete()
+
+
+class DatabaseBackup:
+    """
+    Incremental backups of SQLite databases made of content-addressed chunks.
+
+    A backup copies the database with the sqlite3 backup API into a local
+    snapshot. In WAL mode the copy reads one consistent snapshot while ingest
+    keeps writing. The snapshot is cut into fixed-size chunks, each named by the
+    SHA-256 of its content and stored lzma-compressed. Only chunks the backend
+    does not hold yet are uploaded, followed by a manifest listing the chunk
+    order of the snapshot.
+    """
+
+    def __init__(self, backend, chunk_size: int = DEFAULT_CHUNK_SIZE, keep: int = 7):
+        """
+        Initialize the backup
+
+        Args:
+            backend (LocalBackend | GDriveBackend): Where chunks and manifests are stored.
+            chunk_size (int, optional): Chunk size in bytes, a multiple of 65536. Defaults to 4 MiB.
+            keep (int, optional): Manifests kept per database by prune(), at least 1. Defaults to 7.
+        """
+        if chunk_size <= 0 or chunk_size % 65536:
+            raise ValueError(f"Chunk size must be a positive multiple of 65536: {chunk_size}")
+        if keep < 1:
+            raise ValueError(f"At least one backup must be kept: {keep}")
+        self.logger = LoggerUtil(name=__name__).get_logger()
+        self.backend = backend
+        self.chunk_size = chunk_size
+        self.keep = keep
+
+    @staticmethod
+    def snapshot(db_path: Path, target: Path):
+        """
+        Copy a live database with the sqlite3 backup API
+
+        Args:
+            db_path (Path): Database to copy.
+            target (Path): Snapshot file, overwritten.
+        """
+        target.unlink(missing_ok=True)
+        source = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True)
+        dest = sqlite3.connect(str(target))
+        try:
+            # One step keeps a single read transaction, so the copy is consistent without blocking writers
+            source.backup(dest)
+            dest.execute("PRAGMA journal_mode=DELETE;")
+        finally:
+            dest.close()
+            source.close()
+
+    def backup(self, db_path: Path) -> Dict:
+        """
+        Back up one database
+
+        Args:
+            db_path (Path): Database file (e.g., FCT_DB.db).
+
+        Returns:
+            Dict: Manifest of the backup.
+        """
+        db_path = Path(db_path)
+        stored = self.backend.list()
+        chunks: List[str] = []
+        uploaded = 0
+        uploaded_bytes = 0
+
+        with tempfile.TemporaryDirectory(dir=db_path.parent, prefix=".backup_") as tmp_dir:
+            snapshot = Path(tmp_dir) / db_path.name
+            self.snapshot(db_path, snapshot)
+            size = snapshot.stat().st_size
+            with open(snapshot, "rb") as f:
+                while True:
+                    data = f.read(self.chunk_size)
+                    if not data:
+                        break
+                    digest = hashlib.sha256(data).hexdigest()
+                    chunks.append(digest)
+                    name = f"{digest}{CHUNK_SUFFIX}"
+                    if name in stored:
+                        continue
+                    compressed = lzma.compress(data)
+                    self.backend.put(name, compressed)
+                    stored.add(name)
+                    uploaded += 1
+                    uploaded_bytes += len(compressed)
+
+        created = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        manifest = {
+            "database": db_path.name,
+            "created": created,
+            "size": size,
+            "chunk_size": self.chunk_size,
+            "chunks": chunks,
+        }
+        self.backend.put(f"{MANIFEST_PREFIX}{db_path.name}_{created}.json", json.dumps(manifest, indent=1).encode())
+        self.logger.info(
+            f"Backed up {db_path.name} ({size} bytes): {uploaded}/{len(chunks)} chunks uploaded, {uploaded_bytes} bytes"
+        )
+        return manifest
+
+    def databases(self) -> List[str]:
+        """Names of the databases with at least one backup"""
+        # manifest_{database}_{YYYYmmdd}_{HHMMSS}_{microseconds}.json
+        manifests = (name for name in self.backend.list() if name.startswith(MANIFEST_PREFIX))
+        return sorted({name[len(MANIFEST_PREFIX) :].rsplit("_", 3)[0] for name in manifests})
+
+    def manifests(self, db_name: str) -> List[str]:
+        """
+        Manifests of a database, oldest first
+
+        Args:
+            db_name (str): Database file name (e.g., 'FCT_DB.db').
+
+        Returns:
+            List[str]: Manifest object names.
+        """
+        prefix = f"{MANIFEST_PREFIX}{db_name}_"
+        # Timestamps in the names sort lexically
+        return sorted(name for name in self.backend.list() if name.startswith(prefix) and name.endswith(".json"))
+
+    def restore(self, db_name: str, target: Path, manifest_name: Optional[str] = None) -> Path:
+        """
+        Rebuild a database from its chunks and check its integrity
+
+        Args:
+            db_name (str): Database file name (e.g., 'FCT_DB.db').
+            target (Path): File to write; it must not be a database in use.
+            manifest_name (str, optional): Manifest to restore. Defaults to the latest one.
+
+        Returns:
+            Path: The restored file.
+
+        Raises:
+            FileNotFoundError: If the database has no backup.
+            ValueError: If a chunk or the restored database is corrupt.
+        """
+        if manifest_name is None:
+            manifests = self.manifests(db_name)
+            if not manifests:
+                raise FileNotFoundError(f"No backup of {db_name}")
+            manifest_name = manifests[-1]
+        manifest = json.loads(self.backend.get(manifest_name))
+
+        target = Path(target)
+        staging = target.with_name(f".{target.name}.tmp")
+        with open(staging, "wb") as f:
+            for digest in manifest["chunks"]:
+                data = lzma.decompress(self.backend.get(f"{digest}{CHUNK_SUFFIX}"))
+                if hashlib.sha256(data).hexdigest() != digest:
+                    raise ValueError(f"Chunk {digest} of {manifest_name} is corrupt")
+                f.write(data)
+
+        conn = sqlite3.connect(str(staging))
+        try:
+            result = conn.execute("PRAGMA integrity_check;").fetchone()[0]
+        finally:
+            conn.close()
+        if result != "ok":
+            raise ValueError(f"Restored {db_name} failed the integrity check: {result}")
+        os.replace(staging, target)
+        self.logger.info(f"Restored {db_name} from {manifest_name} to {target}")
+        return target
+
+    def prune(self, db_names: List[str]) -> int:
+        """
+        Drop all but the newest `keep` manifests per database and the chunks no manifest uses
+
+        Args:
+            db_names (List[str]): Every database backed up to this backend; chunks are shared between them.
+
+        Returns:
+            int: Number of objects deleted.
+        """
+        deleted = 0
+        for db_name in db_names:
+            for name in self.manifests(db_name)[: -self.keep]:
+                self.backend.delete(name)
+                deleted += 1
+
+        stored = self.backend.list()
+        used = set()
+        for name in stored:
+            if name.startswith(MANIFEST_PREFIX):
+                used.update(f"{digest}{CHUNK_SUFFIX}" for digest in json.loads(self.backend.get(name))["chunks"])
+        for name in stored:
+            if name.endswith(CHUNK_SUFFIX) and name not in used:
+                self.backend.delete(name)
+                deleted += 1
+        self.logger.info(f"Pruned {deleted} backup objects")
+        return deleted
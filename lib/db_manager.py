@@ -0,0 +1,105 @@
+#!/usr/bin/python3
+import os
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from lib.log_util import LoggerUtil
+
+# Defaults for the "db" section of config.json
+DEFAULT_PRAGMAS: Dict[str, Any] = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -65536,  # Negative values are KiB: 64 MiB page cache
+    "mmap_size": 268435456,  # 256 MiB
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,  # Milliseconds to wait for a competing writer
+}
+
+# Pragmas which only a writable connection may change
+WRITE_PRAGMAS = ("journal_mode",)
+
+
+class ConnectionManager:
+    """
+    Hands out one cached SQLite connection per database file and access mode.
+
+    Writable connections switch the database to WAL so readers (exports, the
+    web frontend) never block on a running ingest; read-only connections are
+    opened with mode=ro. Every connection gets the configured pragmas once,
+    when it is opened.
+    """
+
+    def __init__(self, pragmas: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the manager
+
+        Args:
+            pragmas (Dict[str, Any], optional): Pragma overrides applied on top of DEFAULT_PRAGMAS.
+        """
+        self.logger = LoggerUtil(name=__name__).get_logger()
+        self.pragmas = {**DEFAULT_PRAGMAS, **(pragmas or {})}
+        self.pid = os.getpid()
+        self._connections: Dict[Tuple[str, bool], sqlite3.Connection] = {}
+
+    def connect(self, db_path: Path, readonly: bool = False) -> sqlite3.Connection:
+        """
+        Get the shared connection of a database, opening it on first use.
+
+        Callers must not close the returned connection; use close_all() at exit.
+
+        Args:
+            db_path (Path): Database file.
+            readonly (bool, optional): Open the database read-only. Defaults to False.
+
+        Returns:
+            sqlite3.Connection: Shared connection.
+        """
+        key = (str(Path(db_path).resolve()), readonly)
+        conn = self._connections.get(key)
+        if conn is not None:
+            return conn
+
+        if readonly:
+            conn = sqlite3.connect(f"{Path(key[0]).as_uri()}?mode=ro", uri=True)
+        else:
+            conn = sqlite3.connect(key[0])
+
+        for name, value in self.pragmas.items():
+            if readonly and name in WRITE_PRAGMAS:
+                continue
+            conn.execute(f"PRAGMA {name}={value};")
+
+        self.logger.debug(f"Opened {'read-only' if readonly else 'writable'} connection to {key[0]}")
+        self._connections[key] = conn
+        return conn
+
+    def close_all(self):
+        """Close every connection opened by this manager"""
+        for conn in self._connections.values():
+            conn.close()
+        self._connections.clear()
+
+
+_manager: Optional[ConnectionManager] = None
+
+
+def get_connection_manager(pragmas: Optional[Dict[str, Any]] = None) -> ConnectionManager:
+    """
+    Get the connection manager of the current process.
+
+    Connections cannot be shared across fork(), so a worker process gets its
+    own manager, with the pragmas of its parent, the first time it asks for one.
+
+    Args:
+        pragmas (Dict[str, Any], optional): Pragma overrides, used when the manager is created.
+
+    Returns:
+        ConnectionManager: Process-wide manager.
+    """
+    global _manager
+    if _manager is None or _manager.pid != os.getpid():
+        if pragmas is None and _manager is not None:
+            pragmas = _manager.pragmas
+        _manager = ConnectionManager(pragmas)
+    return _manager
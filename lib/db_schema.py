@@ -0,0 +1,421 @@
+#!/usr/bin/python3
+import sqlite3
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Sequence
+
+from lib.bar_builders import parse_bar_spec
+from lib.coverage import CoverageIndex
+from lib.ingest_ledger import IngestLedger
+from lib.log_util import LoggerUtil
+from lib.options_analytics import OptionsAnalytics
+
+# Continuous front month candles, one row per minute
+CANDLE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS tw{symbol}(
+        Date TEXT NOT NULL,
+        Time TEXT NOT NULL,
+        Open INT,
+        High INT,
+        Low INT,
+        Close INT,
+        Volume INT
+    );
+"""
+
+# Per-expiry candles; tw{symbol} keeps the continuous front month series
+EXPIRY_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS tw{symbol}_exp(
+        Date TEXT NOT NULL,
+        Time TEXT NOT NULL,
+        Expiry TEXT NOT NULL,
+        Open INT,
+        High INT,
+        Low INT,
+        Close INT,
+        Volume INT,
+        PRIMARY KEY (Date, Time, Expiry)
+    );
+"""
+
+# Re-ingested minutes of an expiry replace the stored row in place
+EXPIRY_UPSERT_SQL = """
+    INSERT INTO tw{symbol}_exp VALUES (?,?,?,?,?,?,?,?)
+    ON CONFLICT(Date, Time, Expiry) DO UPDATE SET
+        Open=excluded.Open,
+        High=excluded.High,
+        Low=excluded.Low,
+        Close=excluded.Close,
+        Volume=excluded.Volume;
+"""
+
+# Per-series option candles
+OPTION_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS tw{symbol}(
+        Date TEXT NOT NULL,
+        Time TEXT NOT NULL,
+        Expiry TEXT NOT NULL,
+        Strike REAL NOT NULL,
+        CP TEXT NOT NULL,
+        Open REAL,
+        High REAL,
+        Low REAL,
+        Close REAL,
+        Volume INT
+    );
+    CREATE INDEX IF NOT EXISTS tw{symbol}_date_time ON tw{symbol}(Date, Time);
+"""
+
+# Tick, volume and N-second bars, one table per bar type (e.g., twTX_tick500)
+BAR_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS tw{symbol}_{name}(
+        Date TEXT NOT NULL,
+        Time TEXT NOT NULL,
+        Open INT,
+        High INT,
+        Low INT,
+        Close INT,
+        Volume INT
+    );
+    CREATE INDEX IF NOT EXISTS tw{symbol}_{name}_date_time ON tw{symbol}_{name}(Date, Time);
+"""
+
+# Institutional investor tables of II_DB (see db/creat_tb_for_db)
+II_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS II_Fut(
+        Date TEXT NOT NULL,
+        Fut TEXT NOT NULL,
+        Institutional TEXT NOT NULL,
+        TR_B_Contract INT,
+        TR_B_Amount INT,
+        TR_S_Contract INT,
+        TR_S_Amount INT,
+        TR_Net_Contract INT,
+        TR_Net_Amount INT,
+        OI_B_Contract INT,
+        OI_B_Amount INT,
+        OI_S_Contract INT,
+        OI_S_Amount INT,
+        OI_Net_Contract INT,
+        OI_Net_Amount INT
+    );
+    CREATE TABLE IF NOT EXISTS II_OP(
+        Date TEXT NOT NULL,
+        OP TEXT NOT NULL,
+        PC TEXT NOT NULL,
+        Institutional TEXT NOT NULL,
+        TR_B_Contract INT,
+        TR_B_Amount INT,
+        TR_S_Contract INT,
+        TR_S_Amount INT,
+        TR_Net_Contract INT,
+        TR_Net_Amount INT,
+        OI_B_Contract INT,
+        OI_B_Amount INT,
+        OI_S_Contract INT,
+        OI_S_Amount INT,
+        OI_Net_Contract INT,
+        OI_Net_Amount INT
+    );
+    CREATE TABLE IF NOT EXISTS II_SPOT(
+        Date TEXT NOT NULL,
+        Institutional TEXT NOT NULL,
+        TR_B_Amount INT,
+        TR_S_Amount INT,
+        TR_Net_Amount INT
+    );
+"""
+
+# Every II query and delete filters on Date first
+II_INDEX_SQL = """
+    CREATE INDEX IF NOT EXISTS II_Fut_date ON II_Fut(Date, Fut, Institutional);
+    CREATE INDEX IF NOT EXISTS II_OP_date ON II_OP(Date, Institutional);
+    CREATE INDEX IF NOT EXISTS II_SPOT_date ON II_SPOT(Date, Institutional);
+"""
+
+
+def execute_statements(cursor: sqlite3.Cursor, script: str):
+    """
+    Execute a semicolon separated script statement by statement inside the current transaction.
+
+    Args:
+        cursor (sqlite3.Cursor): Database cursor.
+        script (str): SQL statements.
+    """
+    for statement in script.split(";"):
+        if statement.strip():
+            cursor.execute(statement)
+
+
+def ensure_candle_table(cursor: sqlite3.Cursor, symbol: str) -> int:
+    """
+    Create a candle table and its unique (Date, Time) index, dropping legacy duplicates first.
+
+    Args:
+        cursor (sqlite3.Cursor): Database cursor.
+        symbol (str): Futures symbol (e.g., 'TX').
+
+    Returns:
+        int: Number of duplicated rows removed.
+    """
+    cursor.execute(CANDLE_TABLE_SQL.format(symbol=symbol))
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type='index' AND name=?;", (f"tw{symbol}_date_time_key",))
+    if cursor.fetchone() is not None:
+        return 0
+
+    # Keep the most recently written row of every duplicated minute
+    cursor.execute(
+        f"DELETE FROM tw{symbol} WHERE rowid NOT IN (SELECT MAX(rowid) FROM tw{symbol} GROUP BY Date, Time);"
+    )
+    removed = cursor.rowcount
+    cursor.execute(f"CREATE UNIQUE INDEX tw{symbol}_date_time_key ON tw{symbol}(Date, Time);")
+    return removed
+
+
+def ensure_expiry_table(cursor: sqlite3.Cursor, symbol: str) -> int:
+    """
+    Create a per-expiry candle table with its unique (Date, Time, Expiry) key, dropping duplicates of older tables.
+
+    Args:
+        cursor (sqlite3.Cursor): Database cursor.
+        symbol (str): Futures symbol (e.g., 'TX').
+
+    Returns:
+        int: Number of duplicated rows removed.
+    """
+    cursor.execute(EXPIRY_TABLE_SQL.format(symbol=symbol))
+    # Tables created before the key was added to EXPIRY_TABLE_SQL get it as a unique index
+    if any(row[2] for row in cursor.execute(f"PRAGMA index_list(tw{symbol}_exp);").fetchall()):
+        return 0
+
+    cursor.execute(f"""
+        DELETE FROM tw{symbol}_exp
+        WHERE rowid NOT IN (SELECT MAX(rowid) FROM tw{symbol}_exp GROUP BY Date, Time, Expiry);
+        """)
+    removed = cursor.rowcount
+    cursor.execute(f"CREATE UNIQUE INDEX tw{symbol}_exp_key ON tw{symbol}_exp(Date, Time, Expiry);")
+    return removed
+
+
+class Migration(NamedTuple):
+    """One schema step; version is stored in PRAGMA user_version once applied"""
+
+    version: int
+    description: str
+    apply: Callable[[sqlite3.Cursor, Dict], None]
+
+
+def _fct_base_tables(cursor: sqlite3.Cursor, config: Dict):
+    for symbol in config.get("fut_rpt", {}).get("symbol", ["TX"]):
+        ensure_candle_table(cursor, symbol)
+        cursor.execute(EXPIRY_TABLE_SQL.format(symbol=symbol))
+    for symbol in config.get("opt_rpt", {}).get("symbol", []):
+        execute_statements(cursor, OPTION_TABLE_SQL.format(symbol=symbol))
+        cursor.execute(OptionsAnalytics.STRIKE_TABLE_SQL.format(symbol=symbol))
+        cursor.execute(OptionsAnalytics.DAILY_TABLE_SQL.format(symbol=symbol))
+    cursor.execute(IngestLedger.TABLE_SQL)
+
+
+def _fct_expiry_key(cursor: sqlite3.Cursor, config: Dict):
+    for symbol in config.get("fut_rpt", {}).get("symbol", ["TX"]):
+        ensure_expiry_table(cursor, symbol)
+
+
+def _fct_analytics_index(cursor: sqlite3.Cursor, config: Dict):
+    for symbol in config.get("opt_rpt", {}).get("symbol", []):
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS tw{symbol}_strike_date ON tw{symbol}_strike(Date);")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS tw{symbol}_daily_date ON tw{symbol}_daily(Date);")
+
+
+def _fct_coverage_table(cursor: sqlite3.Cursor, config: Dict):
+    cursor.execute(CoverageIndex.TABLE_SQL)
+
+
+def _fct_drop_expiry_index(cursor: sqlite3.Cursor, config: Dict):
+    # Databases migrated before step 2 became the unique key carry a plain index over the same columns
+    for symbol in config.get("fut_rpt", {}).get("symbol", ["TX"]):
+        cursor.execute(f"DROP INDEX IF EXISTS tw{symbol}_exp_date_time;")
+
+
+def _ii_base_tables(cursor: sqlite3.Cursor, config: Dict):
+    execute_statements(cursor, II_TABLE_SQL)
+    execute_statements(cursor, II_INDEX_SQL)
+
+
+def _fct_bar_index(cursor: sqlite3.Cursor, config: Dict):
+    for symbol in config.get("fut_rpt", {}).get("symbol", ["TX"]):
+        for spec in config.get("fut_rpt", {}).get("bars", []):
+            name = parse_bar_spec(spec).name
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?;", (f"tw{symbol}_{name}",))
+            if cursor.fetchone() is not None:
+                execute_statements(cursor, BAR_TABLE_SQL.format(symbol=symbol, name=name))
+
+
+# Ordered migrations per database; append new steps, never edit applied ones
+MIGRATIONS: Dict[str, List[Migration]] = {
+    "FCT_DB.db": [
+        Migration(1, "candle, option and ledger tables with unique (Date, Time) keys", _fct_base_tables),
+        Migration(2, "unique (Date, Time, Expiry) key on per-expiry candles", _fct_expiry_key),
+        Migration(3, "index daily option analytics on Date", _fct_analytics_index),
+        Migration(4, "coverage of candles and II rows per date, symbol and session", _fct_coverage_table),
+        Migration(5, "drop the plain (Date, Time, Expiry) index the unique key replaced", _fct_drop_expiry_index),
+        Migration(6, "index tick, volume and second bars on (Date, Time)", _fct_bar_index),
+    ],
+    "II_DB.db": [
+        Migration(1, "institutional investor tables with Date indexes", _ii_base_tables),
+    ],
+}
+
+
+class HotQuery(NamedTuple):
+    """A frequently run query whose plan should use an index"""
+
+    db_name: str
+    name: str
+    sql: str
+
+
+# Hot queries of mining_rpt.py and get_data.py, with representative parameters
+HOT_QUERIES: Sequence[HotQuery] = (
+    HotQuery(
+        "FCT_DB.db",
+        "mining_rpt._get_data_for_day",
+        "SELECT * FROM twTX WHERE Date='2024/01/02' AND Time>'08:45:00' AND Time<='13:45:00' ORDER BY Date, Time;",
+    ),
+    HotQuery(
+        "FCT_DB.db",
+        "mining_rpt._get_data_for_day (compact)",
+        "SELECT * FROM twTX_m WHERE Minute>28403085 AND Minute<=28403385 ORDER BY Minute;",
+    ),
+    HotQuery(
+        "FCT_DB.db",
+        "mining_rpt._get_bars_for_day",
+        "SELECT * FROM twTX_tick500 WHERE Date='2024/01/02' AND Time>'05:00:00' AND Time<'15:00:00' "
+        "ORDER BY Date, Time, rowid;",
+    ),
+    HotQuery(
+        "FCT_DB.db",
+        "get_data.run_trading_strategy (twTX)",
+        "SELECT Date, Time, Close FROM twTX WHERE Date>='2020/01/01' AND (Time='13:30:00' OR Time='13:45:00') "
+        "ORDER BY Date, Time;",
+    ),
+    HotQuery(
+        "II_DB.db",
+        "get_data.run_trading_strategy (II_Fut)",
+        "SELECT Date, OI_Net_Contract FROM II_Fut WHERE Date>='2020/01/01' AND Fut='TX' AND Institutional='FOR';",
+    ),
+    HotQuery(
+        "II_DB.db",
+        "get_data.run_trading_strategy (II_SPOT)",
+        "SELECT Date, SUM(TR_Net_Amount) FROM II_SPOT WHERE Date>='2020/01/01' AND Institutional LIKE 'FOR%' "
+        "GROUP BY Date;",
+    ),
+    HotQuery(
+        "II_DB.db",
+        "get_data.run_trading_strategy (II_OP)",
+        "SELECT Date, OI_B_Contract, OI_S_Contract, OI_B_Amount, OI_S_Amount FROM II_OP "
+        "WHERE Institutional='FOR' AND Date>='2020/01/01';",
+    ),
+    HotQuery(
+        "II_DB.db",
+        "get_data._generate_mtx_strategy",
+        "SELECT Date, OI_Net_Contract FROM II_Fut WHERE Date>='2020/01/01' AND Fut='MTX' ORDER BY Date ASC;",
+    ),
+)
+
+
+class SchemaManager:
+    """
+    Creates and migrates the FCT_DB and II_DB databases.
+
+    Each database records the last applied migration in PRAGMA user_version;
+    pending migrations are applied in order, each in its own transaction.
+    """
+
+    def __init__(self, base_path: Path, config: Dict):
+        """
+        Initialize the schema manager
+
+        Args:
+            base_path (Path): Directory holding the database files.
+            config (Dict): Parsed config.json, used for the configured symbols.
+        """
+        self.logger = LoggerUtil(name=__name__).get_logger()
+        self.base_path = Path(base_path)
+        self.config = config
+
+    def current_version(self, db_name: str) -> int:
+        """Get the applied schema version of a database, 0 if it does not exist"""
+        db_path = self.base_path / db_name
+        if not db_path.exists():
+            return 0
+        with sqlite3.connect(str(db_path)) as conn:
+            version = conn.execute("PRAGMA user_version;").fetchone()[0]
+        conn.close()
+        return version
+
+    def migrate(self, db_name: str, create: bool = False) -> int:
+        """
+        Apply pending migrations to one database
+
+        Args:
+            db_name (str): Database file name (a key of MIGRATIONS).
+            create (bool, optional): Create the database if missing. Defaults to False.
+
+        Returns:
+            int: Number of migrations applied.
+        """
+        db_path = self.base_path / db_name
+        if not db_path.exists() and not create:
+            raise FileNotFoundError(f"Database not found: {db_path} (run init to create it)")
+
+        conn = sqlite3.connect(str(db_path), isolation_level=None)
+        try:
+            version = conn.execute("PRAGMA user_version;").fetchone()[0]
+            pending = [m for m in MIGRATIONS[db_name] if m.version > version]
+            for migration in pending:
+                cursor = conn.cursor()
+                cursor.execute("BEGIN;")
+                try:
+                    migration.apply(cursor, self.config)
+                    cursor.execute(f"PRAGMA user_version={migration.version};")
+                    cursor.execute("COMMIT;")
+                except Exception:
+                    cursor.execute("ROLLBACK;")
+                    raise
+                self.logger.info(f"{db_name}: applied migration {migration.version} ({migration.description})")
+        finally:
+            conn.close()
+
+        if not pending:
+            self.logger.info(f"{db_name}: schema is up to date at version {version}")
+        return len(pending)
+
+    def explain(self, queries: Sequence[HotQuery] = HOT_QUERIES) -> List[tuple]:
+        """
+        Report the query plans of the hot queries
+
+        Args:
+            queries (Sequence[HotQuery], optional): Queries to explain. Defaults to HOT_QUERIES.
+
+        Returns:
+            List of (query name, plan lines, uses index) tuples.
+        """
+        report = []
+        for query in queries:
+            db_path = self.base_path / query.db_name
+            if not db_path.exists():
+                self.logger.warning(f"{query.name}: {query.db_name} not found, skipped")
+                continue
+            with sqlite3.connect(str(db_path)) as conn:
+                try:
+                    rows = conn.execute(f"EXPLAIN QUERY PLAN {query.sql}").fetchall()
+                except sqlite3.Error as e:
+                    self.logger.warning(f"{query.name}: {e}")
+                    continue
+            conn.close()
+
+            plan = [row[-1] for row in rows]
+            # Searches go through an index or primary key; a SCAN reads the whole table
+            uses_index = not any(line.startswith("SCAN") for line in plan)
+            report.append((query.name, plan, uses_index))
+        return report
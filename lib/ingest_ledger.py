@@ -0,0 +1,131 @@
+#!/usr/bin/python3
+import hashlib
+import json
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from lib.db_manager import get_connection_manager
+from lib.log_util import LoggerUtil
+
+
+class IngestLedger:
+    """
+    Records which report files have been ingested, keyed by their content hash.
+
+    A report whose size, SHA-256 and parser version match its ledger entry has
+    already been written to the database by the same code, so it can be
+    skipped without parsing it again.
+    """
+
+    TABLE_SQL = """
+        CREATE TABLE IF NOT EXISTS ingest_ledger(
+            Filename TEXT PRIMARY KEY,
+            Size INT NOT NULL,
+            SHA256 TEXT NOT NULL,
+            ParserVersion INT NOT NULL,
+            Symbols TEXT,
+            RowCounts TEXT,
+            IngestedAt TEXT
+        );
+    """
+
+    def __init__(self, db_path: Path):
+        """
+        Initialize the ledger
+
+        Args:
+            db_path (Path): Path to the database holding the ledger table.
+        """
+        self.logger = LoggerUtil(name=__name__).get_logger()
+        self.db_path = Path(db_path)
+
+    @staticmethod
+    def file_digest(path: Path, block_size: int = 1 << 20) -> str:
+        """
+        Compute the SHA-256 of a file in fixed-size blocks.
+
+        Args:
+            path (Path): File to hash.
+            block_size (int, optional): Read size in bytes. Defaults to 1 MiB.
+
+        Returns:
+            str: Hex digest.
+        """
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def is_current(
+        self, path: Path, digest: str, parser_version: int, symbols: Iterable[str], size: Optional[int] = None
+    ) -> bool:
+        """
+        Check whether a report was already ingested unchanged by the same parser version.
+
+        Args:
+            path (Path): Report file.
+            digest (str): SHA-256 of the report from file_digest().
+            parser_version (int): Current parser version.
+            symbols (Iterable[str]): Symbols requested from the report.
+            size (int, optional): Report size in bytes, for a report read from an archive. Defaults to the file size.
+
+        Returns:
+            bool: True if the ledger entry matches and every requested symbol produced rows.
+        """
+        # Same connection as the writer, so entries of an open batch are visible
+        conn = get_connection_manager().connect(self.db_path)
+        conn.execute(self.TABLE_SQL)
+        row = conn.execute(
+            "SELECT Size, SHA256, ParserVersion, Symbols FROM ingest_ledger WHERE Filename=?;", (Path(path).name,)
+        ).fetchone()
+
+        if row is None:
+            return False
+        stored_size, stored_digest, stored_version, stored_symbols = row
+        return (
+            stored_size == (size if size is not None else Path(path).stat().st_size)
+            and stored_digest == digest
+            and stored_version == parser_version
+            and set(symbols) <= set(json.loads(stored_symbols or "[]"))
+        )
+
+    def record(
+        self,
+        cursor: sqlite3.Cursor,
+        path: Path,
+        digest: str,
+        parser_version: int,
+        row_counts: Dict[str, int],
+        size: Optional[int] = None,
+    ):
+        """
+        Record a successful ingest of a report
+
+        Only symbols that produced rows are recorded as covered, so a symbol
+        missing from this ingest is parsed again on the next run.
+
+        Args:
+            cursor (sqlite3.Cursor): Database cursor, committed by the caller with the ingested data.
+            path (Path): Report file.
+            digest (str): SHA-256 of the report from file_digest().
+            parser_version (int): Parser version used.
+            row_counts (Dict[str, int]): Number of rows written per symbol.
+            size (int, optional): Report size in bytes, for a report read from an archive. Defaults to the file size.
+        """
+        cursor.execute(self.TABLE_SQL)
+        cursor.execute(
+            "INSERT OR REPLACE INTO ingest_ledger VALUES (?,?,?,?,?,?,?);",
+            (
+                Path(path).name,
+                size if size is not None else Path(path).stat().st_size,
+                digest,
+                parser_version,
+                json.dumps(sorted(symbol for symbol, count in row_counts.items() if count)),
+                json.dumps(row_counts),
+                datetime.now().isoformat(timespec="seconds"),
+            ),
+        )
+        self.logger.info(f"Recorded ingest of {Path(path).name} (parser v{parser_version}): {row_counts}")
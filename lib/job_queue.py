@@ -0,0 +1,219 @@
+#!/usr/bin/python3
+import fcntl
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, IO, List, Optional, Sequence
+
+from lib.log_util import LoggerUtil
+
+# Three hours covers the slowest backfill; a job still queued after that gives up
+DEFAULT_TIMEOUT = 3 * 60 * 60
+
+# Seconds between attempts to take a busy lock
+POLL_INTERVAL = 1.0
+
+HISTORY_NAME = "jobs.log"
+
+
+class JobLease:
+    """
+    Locks held by one running job.
+
+    Released by release() or when the process exits; the kernel drops flock
+    locks with the file descriptors, so a crashed job never blocks the queue.
+    """
+
+    def __init__(self, queue: "JobQueue", job: str, files: List[IO], queued_at: float, waited: float):
+        self.queue = queue
+        self.job = job
+        self.files = files
+        self.queued_at = queued_at
+        self.waited = waited
+        self.started_at = time.time()
+
+    def release(self, status: str = "done"):
+        """
+        Release the locks and record the job in the history
+
+        Args:
+            status (str, optional): Outcome written to the history. Defaults to 'done'.
+        """
+        if not self.files:
+            return
+        for f in reversed(self.files):
+            f.truncate(0)
+            f.close()
+        self.files = []
+        held = time.time() - self.started_at
+        self.queue.record(self.job, status, self.queued_at, self.waited, held)
+        self.queue.logger.info(f"Job '{self.job}' {status} after {held:.1f}s, waited {self.waited:.1f}s")
+
+    def __enter__(self) -> "JobLease":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release("done" if exc_type is None else "failed")
+
+
+class JobQueue:
+    """
+    Serializes the cron jobs that share databases, report directories and output files.
+
+    Every resource is a lock file in the lock directory, taken with flock():
+    shared by jobs that only read the resource, exclusive by jobs that write
+    it. A job takes all its locks in one fixed order, so jobs with
+    overlapping resources run one after the other instead of failing with
+    "database is locked". While a job waits it holds the queue slot of its
+    name; a second run of the same job that finds the slot taken leaves,
+    because the queued one will do the same work.
+
+    The same lock files can be taken from shell scripts with flock(1).
+    """
+
+    def __init__(self, lock_dir: Path, timeout: float = DEFAULT_TIMEOUT):
+        """
+        Initialize the queue
+
+        Args:
+            lock_dir (Path): Directory of the lock files, created on first use.
+            timeout (float, optional): Seconds a job may wait for its locks. Defaults to three hours.
+        """
+        self.logger = LoggerUtil(name=__name__).get_logger()
+        self.lock_dir = Path(lock_dir)
+        self.timeout = timeout
+
+    def lock_path(self, resource: Path) -> Path:
+        """
+        Lock file of a resource
+
+        Resources next to the lock directory keep their name (FCT_DB.db.lock,
+        fut_rpt.lock); others are named after their absolute path.
+
+        Args:
+            resource (Path): Database, directory or output file.
+
+        Returns:
+            Path: Lock file.
+        """
+        resource = Path(resource).resolve()
+        if resource.parent == self.lock_dir.resolve().parent:
+            name = resource.name
+        else:
+            name = str(resource).strip(os.sep).replace(os.sep, "_")
+        return self.lock_dir / f"{name}.lock"
+
+    def acquire(self, job: str, exclusive: Sequence[Path] = (), shared: Sequence[Path] = ()) -> Optional[JobLease]:
+        """
+        Wait for the locks of a job
+
+        Args:
+            job (str): Job name; runs with the same name are duplicates of each other.
+            exclusive (Sequence[Path], optional): Resources the job writes.
+            shared (Sequence[Path], optional): Resources the job only reads.
+
+        Returns:
+            Optional[JobLease]: Held locks, or None if the same job is already queued.
+
+        Raises:
+            TimeoutError: If the locks are still busy after the timeout.
+        """
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        queued_at = time.time()
+        slot_path = self.lock_dir / f"queue_{job.replace(os.sep, '_').replace(' ', '_')}.lock"
+        slot = open(slot_path, "a+")
+        try:
+            fcntl.flock(slot, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            slot.close()
+            self.record(job, "skipped", queued_at, 0.0, 0.0)
+            self.logger.info(f"Job '{job}' is already queued, skipping this run")
+            return None
+
+        # Exclusive wins when a resource is listed twice; sorting fixes the locking order across jobs
+        modes: Dict[Path, int] = {self.lock_path(path): fcntl.LOCK_SH for path in shared}
+        modes.update({self.lock_path(path): fcntl.LOCK_EX for path in exclusive})
+        files: List[IO] = []
+        try:
+            for path in sorted(modes):
+                files.append(self._lock(job, path, modes[path], queued_at))
+        except TimeoutError:
+            for f in files:
+                f.close()
+            self.record(job, "timeout", queued_at, time.time() - queued_at, 0.0)
+            raise
+        finally:
+            # Once the locks are held the next run of this job may queue behind it; a later run creates a new slot
+            slot_path.unlink(missing_ok=True)
+            slot.close()
+
+        waited = time.time() - queued_at
+        self.logger.info(f"Job '{job}' started after waiting {waited:.1f}s for {len(files)} locks")
+        return JobLease(self, job, files, queued_at, waited)
+
+    def _lock(self, job: str, path: Path, mode: int, queued_at: float) -> IO:
+        f = open(path, "a+")
+        reported = False
+        while True:
+            try:
+                fcntl.flock(f, mode | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if not reported:
+                    f.seek(0)
+                    holder = f.read().strip() or "readers"
+                    self.logger.info(f"Job '{job}' queued for {path.name}, held by {holder}")
+                    reported = True
+                if time.time() - queued_at > self.timeout:
+                    f.close()
+                    raise TimeoutError(f"Job '{job}' gave up waiting {self.timeout}s for {path.name}")
+                time.sleep(POLL_INTERVAL)
+
+        # Writers leave their name for the jobs queued behind them
+        if mode == fcntl.LOCK_EX:
+            f.truncate(0)
+            f.write(f"'{job}' (pid {os.getpid()}, since {datetime.now():%H:%M:%S})")
+            f.flush()
+        return f
+
+    def record(self, job: str, status: str, queued_at: float, waited: float, held: float):
+        """
+        Append a job to the history
+
+        Args:
+            job (str): Job name.
+            status (str): 'done', 'failed', 'skipped' or 'timeout'.
+            queued_at (float): Epoch seconds the job asked for its locks.
+            waited (float): Seconds spent waiting for the locks.
+            held (float): Seconds the locks were held.
+        """
+        entry = {
+            "job": job,
+            "status": status,
+            "queued": datetime.fromtimestamp(queued_at).isoformat(timespec="seconds"),
+            "waited": round(waited, 1),
+            "held": round(held, 1),
+            "pid": os.getpid(),
+        }
+        # One short append per line is atomic, so concurrent jobs do not interleave entries
+        with open(self.lock_dir / HISTORY_NAME, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def history(self, limit: int = 20) -> List[Dict]:
+        """
+        Latest jobs of the history
+
+        Args:
+            limit (int, optional): Number of entries. Defaults to 20.
+
+        Returns:
+            List[Dict]: Entries, oldest first.
+        """
+        path = self.lock_dir / HISTORY_NAME
+        if not path.exists():
+            return []
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.readlines()[-limit:]
+        return [json.loads(line) for line in lines if line.strip()]
@@ -0,0 +1,332 @@
+#!/usr/bin/python3
+import calendar
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+from lib.candle_partitions import CandlePartitions
+from lib.candle_store import COMPACT_COLUMNS_SQL, is_compact, to_minute
+from lib.db_manager import get_connection_manager
+from lib.log_util import LoggerUtil
+
+MINUTES_PER_YEAR = 365 * 24 * 60
+
+# Weekday of weekly contracts by expiry suffix (e.g., 202301W1 -> Wednesday, 202506F1 -> Friday)
+WEEKLY_WEEKDAYS = {"W": calendar.WEDNESDAY, "F": calendar.FRIDAY}
+
+
+def norm_pdf(x: np.ndarray) -> np.ndarray:
+    """Standard normal probability density"""
+    return np.exp(-0.5 * x * x) / np.sqrt(2.0 * np.pi)
+
+
+def norm_cdf(x: np.ndarray) -> np.ndarray:
+    """
+    Standard normal cumulative distribution (Abramowitz-Stegun 26.2.17, |error| < 7.5e-8).
+
+    Args:
+        x (np.ndarray): Input values.
+
+    Returns:
+        np.ndarray: N(x).
+    """
+    t = 1.0 / (1.0 + 0.2316419 * np.abs(x))
+    poly = t * (0.319381530 + t * (-0.356563782 + t * (1.781477937 + t * (-1.821255978 + t * 1.330274429))))
+    upper = 1.0 - norm_pdf(x) * poly
+    return np.where(x >= 0, upper, 1.0 - upper)
+
+
+def black76_price(
+    forward: np.ndarray, strike: np.ndarray, years: np.ndarray, rate: float, sigma: np.ndarray, is_call: np.ndarray
+) -> np.ndarray:
+    """
+    Black-76 option price on a futures underlying.
+
+    Args:
+        forward (np.ndarray): Futures price.
+        strike (np.ndarray): Strike price.
+        years (np.ndarray): Time to expiry in years.
+        rate (float): Continuously compounded risk-free rate.
+        sigma (np.ndarray): Volatility.
+        is_call (np.ndarray): True for calls, False for puts.
+
+    Returns:
+        np.ndarray: Option prices.
+    """
+    sqrt_t = np.sqrt(years)
+    d1 = (np.log(forward / strike) + 0.5 * sigma * sigma * years) / (sigma * sqrt_t)
+    d2 = d1 - sigma * sqrt_t
+    discount = np.exp(-rate * years)
+    call = discount * (forward * norm_cdf(d1) - strike * norm_cdf(d2))
+    put = discount * (strike * norm_cdf(-d2) - forward * norm_cdf(-d1))
+    return np.where(is_call, call, put)
+
+
+def implied_volatility(
+    price: np.ndarray,
+    forward: np.ndarray,
+    strike: np.ndarray,
+    years: np.ndarray,
+    rate: float,
+    is_call: np.ndarray,
+    low: float = 1e-4,
+    high: float = 5.0,
+    iterations: int = 60,
+) -> np.ndarray:
+    """
+    Solve Black-76 implied volatility for all options at once by vectorized bisection.
+
+    Args:
+        price (np.ndarray): Option prices.
+        forward (np.ndarray): Futures price.
+        strike (np.ndarray): Strike price.
+        years (np.ndarray): Time to expiry in years.
+        rate (float): Continuously compounded risk-free rate.
+        is_call (np.ndarray): True for calls, False for puts.
+        low (float, optional): Lower volatility bound. Defaults to 1e-4.
+        high (float, optional): Upper volatility bound. Defaults to 5.0.
+        iterations (int, optional): Bisection steps. Defaults to 60.
+
+    Returns:
+        np.ndarray: Implied volatility, NaN where the price is outside the no-arbitrage bounds.
+    """
+    lower = np.full(price.shape, low)
+    upper = np.full(price.shape, high)
+    for _ in range(iterations):
+        mid = 0.5 * (lower + upper)
+        too_high = black76_price(forward, strike, years, rate, mid, is_call) > price
+        upper = np.where(too_high, mid, upper)
+        lower = np.where(too_high, lower, mid)
+
+    sigma = 0.5 * (lower + upper)
+    price_low = black76_price(forward, strike, years, rate, np.full(price.shape, low), is_call)
+    price_high = black76_price(forward, strike, years, rate, np.full(price.shape, high), is_call)
+    valid = (price > price_low) & (price < price_high)
+    return np.where(valid, sigma, np.nan)
+
+
+def black76_greeks(
+    forward: np.ndarray, strike: np.ndarray, years: np.ndarray, rate: float, sigma: np.ndarray, is_call: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Black-76 delta, gamma and vega (per 1% volatility).
+
+    Args:
+        forward (np.ndarray): Futures price.
+        strike (np.ndarray): Strike price.
+        years (np.ndarray): Time to expiry in years.
+        rate (float): Continuously compounded risk-free rate.
+        sigma (np.ndarray): Volatility.
+        is_call (np.ndarray): True for calls, False for puts.
+
+    Returns:
+        Tuple of (delta, gamma, vega) arrays.
+    """
+    sqrt_t = np.sqrt(years)
+    d1 = (np.log(forward / strike) + 0.5 * sigma * sigma * years) / (sigma * sqrt_t)
+    discount = np.exp(-rate * years)
+    delta = np.where(is_call, discount * norm_cdf(d1), -discount * norm_cdf(-d1))
+    gamma = discount * norm_pdf(d1) / (forward * sigma * sqrt_t)
+    vega = discount * forward * norm_pdf(d1) * sqrt_t / 100.0
+    return delta, gamma, vega
+
+
+def expiry_datetime(expiry: str) -> datetime:
+    """
+    Get the final settlement time of a TAIFEX option expiry field.
+
+    Monthly contracts (YYYYMM) settle on the third Wednesday, weekly contracts
+    (YYYYMMWn / YYYYMMFn) on the n-th Wednesday / Friday of the month, at 13:30.
+
+    Args:
+        expiry (str): Expiry field (e.g., '202301', '202301W2').
+
+    Returns:
+        datetime: Settlement time.
+    """
+    year, month = int(expiry[:4]), int(expiry[4:6])
+    weekday, nth = calendar.WEDNESDAY, 3
+    if len(expiry) > 6:
+        weekday, nth = WEEKLY_WEEKDAYS[expiry[6].upper()], int(expiry[7:])
+
+    first = datetime(year, month, 1)
+    offset = (weekday - first.weekday()) % 7 + 7 * (nth - 1)
+    return first + timedelta(days=offset, hours=13, minutes=30)
+
+
+class OptionGreeksEngine:
+    """
+    Batch engine computing per-minute implied volatility and greeks of every option series.
+
+    The underlying of each option candle is the matching one-minute close of the
+    futures series (twTX by default). All series and minutes of a day are solved
+    in one vectorized pass; history can be fanned out across processes by day.
+    """
+
+    TABLE_SQL = """
+        CREATE TABLE IF NOT EXISTS tw{symbol}_iv(
+            Date TEXT NOT NULL,
+            Time TEXT NOT NULL,
+            Expiry TEXT NOT NULL,
+            Strike REAL NOT NULL,
+            CP TEXT NOT NULL,
+            Underlying INT,
+            IV REAL,
+            Delta REAL,
+            Gamma REAL,
+            Vega REAL,
+            PRIMARY KEY (Date, Time, Expiry, Strike, CP)
+        );
+    """
+
+    def __init__(self, db_path: Path, symbol: str = "TXO", underlying: str = "TX", rate: float = 0.015):
+        """
+        Initialize the engine
+
+        Args:
+            db_path (Path): Path to the candle database.
+            symbol (str, optional): Option symbol. Defaults to 'TXO'.
+            underlying (str, optional): Futures symbol used as underlying. Defaults to 'TX'.
+            rate (float, optional): Continuously compounded risk-free rate. Defaults to 0.015.
+        """
+        self.logger = LoggerUtil(name=__name__).get_logger()
+        self.db_path = Path(db_path)
+        self.symbol = symbol
+        self.underlying = underlying
+        self.rate = rate
+
+    def compute_day(self, date: str) -> List[Tuple]:
+        """
+        Compute IV and greeks for every option candle of one date.
+
+        Args:
+            date (str): Date in 'YYYY/MM/DD' format.
+
+        Returns:
+            List of (Date, Time, Expiry, Strike, CP, Underlying, IV, Delta, Gamma, Vega) rows.
+        """
+        day = datetime.strptime(date, "%Y/%m/%d")
+        conn = get_connection_manager().connect(self.db_path, readonly=True)
+        CandlePartitions(self.db_path.parent).attach(conn, day, day)
+        cursor = conn.cursor()
+
+        # Both reads search their (Date, Time) or Minute key; the closes are matched by time in memory
+        closes = self._underlying_closes(cursor, date)
+        options = cursor.execute(
+            f"SELECT Time, Expiry, Strike, CP, Close FROM tw{self.symbol} WHERE Date=?;", (date,)
+        ).fetchall()
+        rows = [option + (closes[option[0]],) for option in options if option[0] in closes]
+        if not rows:
+            self.logger.warning(f"No option candles with matching {self.underlying} closes on {date}")
+            return []
+
+        times, expiries, strikes, cps, prices, forwards = zip(*rows)
+        strike = np.array(strikes, dtype=np.float64)
+        price = np.array(prices, dtype=np.float64)
+        forward = np.array(forwards, dtype=np.float64)
+        is_call = np.array(cps) == "C"
+
+        # Minutes to settlement, computed once per distinct expiry and time
+        unique_expiries, expiry_index = np.unique(np.array(expiries), return_inverse=True)
+        expiry_minutes = np.array(
+            [(expiry_datetime(e) - day).total_seconds() / 60 for e in unique_expiries.tolist()], dtype=np.float64
+        )
+        unique_times, time_index = np.unique(np.array(times), return_inverse=True)
+        time_minutes = np.array([int(t[:2]) * 60 + int(t[3:5]) for t in unique_times.tolist()], dtype=np.float64)
+        years = (expiry_minutes[expiry_index.reshape(-1)] - time_minutes[time_index.reshape(-1)]) / MINUTES_PER_YEAR
+
+        valid = (years > 0) & (price > 0) & (forward > 0)
+        iv = np.full(len(rows), np.nan)
+        delta = np.full(len(rows), np.nan)
+        gamma = np.full(len(rows), np.nan)
+        vega = np.full(len(rows), np.nan)
+        iv[valid] = implied_volatility(
+            price[valid], forward[valid], strike[valid], years[valid], self.rate, is_call[valid]
+        )
+
+        solved = valid & ~np.isnan(iv)
+        delta[solved], gamma[solved], vega[solved] = black76_greeks(
+            forward[solved], strike[solved], years[solved], self.rate, iv[solved], is_call[solved]
+        )
+
+        def to_sql(values: np.ndarray) -> List:
+            return [None if np.isnan(v) else round(v, 6) for v in values.tolist()]
+
+        result = list(
+            zip(
+                [date] * len(rows),
+                times,
+                expiries,
+                strikes,
+                cps,
+                forwards,
+                to_sql(iv),
+                to_sql(delta),
+                to_sql(gamma),
+                to_sql(vega),
+            )
+        )
+        self.logger.info(f"Solved IV for {int(solved.sum())}/{len(rows)} option candles on {date}")
+        return result
+
+    def _underlying_closes(self, cursor: sqlite3.Cursor, date: str) -> Dict[str, int]:
+        """
+        Get the one-minute closes of the underlying on one date
+
+        Args:
+            cursor (sqlite3.Cursor): Cursor with the partitions of the date attached.
+            date (str): Date in 'YYYY/MM/DD' format.
+
+        Returns:
+            Dict[str, int]: Close by candle time 'HH:MM:SS'.
+        """
+        schema = "temp" if is_compact(cursor, self.underlying, "temp") else "main"
+        if is_compact(cursor, self.underlying, schema):
+            first = to_minute(date, "00:00:00")
+            rows = cursor.execute(
+                f"SELECT {COMPACT_COLUMNS_SQL} FROM {schema}.tw{self.underlying}_m WHERE Minute>=? AND Minute<?;",
+                (first, first + 24 * 60),
+            )
+        else:
+            rows = cursor.execute(f"SELECT * FROM tw{self.underlying} WHERE Date=?;", (date,))
+        return {row[1]: row[5] for row in rows.fetchall()}
+
+    def store(self, rows_by_date: Dict[str, List[Tuple]]):
+        """
+        Replace IV rows of the given dates in one transaction
+
+        Args:
+            rows_by_date (Dict[str, List[Tuple]]): Rows from compute_day() keyed by date.
+        """
+        with get_connection_manager().connect(self.db_path) as conn:
+            conn.execute(self.TABLE_SQL.format(symbol=self.symbol))
+            for date, rows in rows_by_date.items():
+                conn.execute(f"DELETE FROM tw{self.symbol}_iv WHERE Date=?;", (date,))
+                conn.executemany(f"INSERT INTO tw{self.symbol}_iv VALUES (?,?,?,?,?,?,?,?,?,?);", rows)
+        self.logger.info(f"Stored IV surface for {len(rows_by_date)} days in tw{self.symbol}_iv")
+
+    def run(self, dates: Iterable[str], workers: int = 1) -> int:
+        """
+        Compute and store IV and greeks for several dates, optionally with a process pool
+
+        Args:
+            dates (Iterable[str]): Dates in 'YYYY/MM/DD' format.
+            workers (int, optional): Number of worker processes. Defaults to 1 (in-process).
+
+        Returns:
+            int: Number of rows stored.
+        """
+        dates = list(dates)
+        if workers > 1 and len(dates) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = dict(zip(dates, pool.map(self.compute_day, dates)))
+        else:
+            results = {date: self.compute_day(date) for date in dates}
+
+        results = {date: rows for date, rows in results.items() if rows}
+        if results:
+            self.store(results)
+        return sum(len(rows) for rows in results.values())
@@ -0,0 +1,146 @@
+#!/usr/bin/python3
+import sqlite3
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+from lib.log_util import LoggerUtil
+
+
+class OptionsDailyStats(NamedTuple):
+    """Daily analytics of one option symbol"""
+
+    strike_rows: List[tuple]  # (Date, Expiry, Strike, CallVolume, PutVolume)
+    expiry_rows: List[tuple]  # (Date, Expiry, CallVolume, PutVolume, PCRatio, MaxPain, MinStrike, MaxStrike)
+
+
+class OptionsAnalytics:
+    """
+    Computes daily strike-level analytics from parsed options trades.
+
+    Daily reports carry trades only, so traded volume by strike stands in for
+    open interest, and the max-pain estimate is weighted by that volume.
+    """
+
+    STRIKE_TABLE_SQL = """
+        CREATE TABLE IF NOT EXISTS tw{symbol}_strike(
+            Date TEXT NOT NULL,
+            Expiry TEXT NOT NULL,
+            Strike REAL NOT NULL,
+            CallVolume INT,
+            PutVolume INT
+        );
+    """
+
+    DAILY_TABLE_SQL = """
+        CREATE TABLE IF NOT EXISTS tw{symbol}_daily(
+            Date TEXT NOT NULL,
+            Expiry TEXT NOT NULL,
+            CallVolume INT,
+            PutVolume INT,
+            PCRatio REAL,
+            MaxPain REAL,
+            MinStrike REAL,
+            MaxStrike REAL
+        );
+    """
+
+    def __init__(self):
+        """Initialize the analytics stage"""
+        self.logger = LoggerUtil(name=__name__).get_logger()
+
+    @staticmethod
+    def max_pain(strikes: np.ndarray, call_volumes: np.ndarray, put_volumes: np.ndarray) -> float:
+        """
+        Estimate the settlement strike that minimizes the total payout to option holders.
+
+        Args:
+            strikes (np.ndarray): Sorted strikes of one expiry.
+            call_volumes (np.ndarray): Call volume per strike.
+            put_volumes (np.ndarray): Put volume per strike.
+
+        Returns:
+            float: Max-pain strike.
+        """
+        # diff[i, j] = candidate settlement i - strike j
+        diff = strikes[:, None] - strikes[None, :]
+        payout = np.maximum(diff, 0) @ call_volumes + np.maximum(-diff, 0) @ put_volumes
+        return float(strikes[np.argmin(payout)])
+
+    def compute(self, date: str, columns: Dict[str, np.ndarray], expiries: Sequence[str]) -> OptionsDailyStats:
+        """
+        Compute volume by strike and per-expiry summaries with array reductions.
+
+        Args:
+            date (str): Trade date in 'YYYY/MM/DD' format.
+            columns (Dict[str, np.ndarray]): Columns as returned by OptionsRptReader.read_columns().
+            expiries (Sequence[str]): Expiry vocabulary the 'expiry' column indexes into.
+
+        Returns:
+            OptionsDailyStats: Strike-level rows and per-expiry summary rows.
+        """
+        if len(columns["volume"]) == 0:
+            return OptionsDailyStats([], [])
+
+        # Group trades by (expiry, strike) with a single integer key
+        strikes, strike_index = np.unique(columns["strike"], return_inverse=True)
+        keys, group = np.unique(columns["expiry"] * len(strikes) + strike_index.reshape(-1), return_inverse=True)
+        group = group.reshape(-1)
+        volumes = columns["volume"].astype(np.float64)
+        is_call = columns["cp"] == 0
+
+        call_volumes = np.bincount(group, weights=np.where(is_call, volumes, 0), minlength=len(keys)).astype(np.int64)
+        put_volumes = np.bincount(group, weights=np.where(is_call, 0, volumes), minlength=len(keys)).astype(np.int64)
+        key_expiries = keys // len(strikes)
+        key_strikes = strikes[keys % len(strikes)]
+
+        strike_rows = [
+            (date, expiries[e], k, c, p)
+            for e, k, c, p in zip(
+                key_expiries.tolist(), key_strikes.tolist(), call_volumes.tolist(), put_volumes.tolist()
+            )
+        ]
+
+        # Keys are sorted, so each expiry is a contiguous slice
+        expiry_rows = []
+        starts = np.flatnonzero(np.concatenate(([True], key_expiries[1:] != key_expiries[:-1])))
+        for start, end in zip(starts.tolist(), np.append(starts[1:], len(keys)).tolist()):
+            call_total = int(call_volumes[start:end].sum())
+            put_total = int(put_volumes[start:end].sum())
+            expiry_rows.append(
+                (
+                    date,
+                    expiries[key_expiries[start]],
+                    call_total,
+                    put_total,
+                    round(put_total / call_total, 4) if call_total else None,
+                    self.max_pain(key_strikes[start:end], call_volumes[start:end], put_volumes[start:end]),
+                    float(key_strikes[start]),
+                    float(key_strikes[end - 1]),
+                )
+            )
+
+        self.logger.info(f"Computed analytics for {len(expiry_rows)} expiries and {len(strike_rows)} strikes")
+        return OptionsDailyStats(strike_rows, expiry_rows)
+
+    def store(self, cursor: sqlite3.Cursor, symbol: str, stats: OptionsDailyStats, date: Optional[str] = None):
+        """
+        Replace the analytics rows of one day
+
+        Args:
+            cursor (sqlite3.Cursor): Database cursor, committed by the caller.
+            symbol (str): Option symbol (e.g., 'TXO').
+            stats (OptionsDailyStats): Result of compute().
+            date (str, optional): Trade date to replace. Defaults to the date of the rows.
+        """
+        if date is None:
+            if not stats.expiry_rows:
+                return
+            date = stats.expiry_rows[0][0]
+
+        cursor.execute(self.STRIKE_TABLE_SQL.format(symbol=symbol))
+        cursor.execute(self.DAILY_TABLE_SQL.format(symbol=symbol))
+        cursor.execute(f"DELETE FROM tw{symbol}_strike WHERE Date=?;", (date,))
+        cursor.execute(f"DELETE FROM tw{symbol}_daily WHERE Date=?;", (date,))
+        cursor.executemany(f"INSERT INTO tw{symbol}_strike VALUES (?,?,?,?,?);", stats.strike_rows)
+        cursor.executemany(f"INSERT INTO tw{symbol}_daily VALUES (?,?,?,?,?,?,?,?);", stats.expiry_rows)
+        self.logger.info(f"Stored analytics for [{symbol}] on {date}")
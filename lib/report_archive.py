@@ -0,0 +1,487 @@
+#!/usr/bin/python3
+import hashlib
+import io
+import json
+import lzma
+import re
+import zipfile
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+from lib.log_util import LoggerUtil
+
+INDEX_NAME = "index.json"
+ARCHIVE_VERSION = 1
+
+# Daily report names: Daily_YYYY_MM_DD.zip, OptionsDaily_YYYY_MM_DD.zip
+REPORT_NAME = re.compile(r"^(?P<prefix>[A-Za-z]+_)(?P<month>\d{4}_\d{2})_(?P<day>\d{2})\.zip$")
+
+# A month whose lines mostly need their own shape is not tabular; such members are stored verbatim
+MAX_SHAPE_RATIO = 0.05
+
+# Shape tokens are literal fields (str) or numeric fields ([width, decimals])
+Token = Union[str, List[int]]
+
+
+def _encode_field(field: bytes) -> Tuple[Token, Optional[int]]:
+    """
+    Split a field into its shape token and numeric value.
+
+    Digits-only fields and decimals that fit an int64 are numeric; the token keeps the zero
+    padding and number of decimals needed to print them back identically.
+    Everything else is a literal, kept as latin-1 text so any byte survives.
+    """
+    integer, dot, fraction = field.partition(b".")
+    if integer.isdigit() and (not dot or fraction.isdigit()) and len(integer) + len(fraction) <= 18:
+        width = len(integer) if len(integer) > 1 and integer.startswith(b"0") else 0
+        return [width, len(fraction)], int(integer + fraction)
+    return field.decode("latin-1"), None
+
+
+def _format_field(token: Token, value: int) -> bytes:
+    if isinstance(token, str):
+        return token.encode("latin-1")
+    width, decimals = token
+    if not decimals:
+        return b"%0*d" % (width, value)
+    integer, fraction = divmod(value, 10**decimals)
+    return b"%0*d.%0*d" % (width, integer, decimals, fraction)
+
+
+def _pack(arrays: Dict[str, np.ndarray]) -> bytes:
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    return lzma.compress(buffer.getvalue())
+
+
+def _unpack(data: bytes) -> Dict[str, np.ndarray]:
+    with np.load(io.BytesIO(lzma.decompress(data))) as npz:
+        return {name: npz[name] for name in npz.files}
+
+
+def _smallest(values: np.ndarray) -> np.ndarray:
+    """Downcast an int64 array to the narrowest signed dtype holding it"""
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if not len(values) or (values.min() >= info.min and values.max() <= info.max):
+            return values.astype(dtype)
+    return values
+
+
+def encode_lines(lines: List[bytes]) -> Dict[str, np.ndarray]:
+    """
+    Encode report lines of one product as a shape table and delta-encoded numeric columns.
+
+    Args:
+        lines (List[bytes]): Lines without terminators.
+
+    Returns:
+        Dict[str, np.ndarray]: 'shapes' (JSON bytes), 'shape_ids' and one 'c{n}' column per numeric slot.
+    """
+    shapes: Dict[str, int] = {}
+    shape_ids = np.empty(len(lines), dtype=np.int64)
+    rows: List[List[int]] = []
+    for number, line in enumerate(lines):
+        tokens, values = [], []
+        for field in line.split(b","):
+            token, value = _encode_field(field)
+            tokens.append(token)
+            if value is not None:
+                values.append(value)
+        shape_ids[number] = shapes.setdefault(json.dumps(tokens, ensure_ascii=False), len(shapes))
+        rows.append(values)
+
+    slots = max((len(values) for values in rows), default=0)
+    table = np.zeros((len(lines), slots), dtype=np.int64)
+    for number, values in enumerate(rows):
+        table[number, : len(values)] = values
+
+    arrays = {
+        "shapes": np.frombuffer(json.dumps(list(shapes)).encode("utf-8"), dtype=np.uint8),
+        "shape_ids": _smallest(shape_ids),
+    }
+    for slot in range(slots):
+        # Consecutive ticks share dates, times and nearby prices, so deltas are mostly tiny
+        arrays[f"c{slot}"] = _smallest(np.diff(table[:, slot], prepend=0))
+    return arrays
+
+
+def decode_lines(arrays: Dict[str, np.ndarray]) -> List[bytes]:
+    """
+    Rebuild the lines encoded by encode_lines()
+
+    Args:
+        arrays (Dict[str, np.ndarray]): Arrays from encode_lines().
+
+    Returns:
+        List[bytes]: Lines without terminators, identical to the encoded ones.
+    """
+    shapes = [json.loads(shape) for shape in json.loads(arrays["shapes"].tobytes().decode("utf-8"))]
+    slots = len([name for name in arrays if name.startswith("c")])
+    columns = [np.cumsum(arrays[f"c{slot}"], dtype=np.int64).tolist() for slot in range(slots)]
+
+    lines = []
+    for number, shape_id in enumerate(arrays["shape_ids"].tolist()):
+        slot = 0
+        fields = []
+        for token in shapes[shape_id]:
+            if isinstance(token, str):
+                fields.append(token.encode("latin-1"))
+            else:
+                fields.append(_format_field(token, columns[slot][number]))
+                slot += 1
+        lines.append(b",".join(fields))
+    return lines
+
+
+class ReportArchive:
+    """
+    Reads a monthly report archive written by ArchiveCompactor.
+
+    The archive is a ZIP of independently compressed entries: one per day,
+    report member and product, plus the line order of every member and an
+    index. Reading one product of one day decompresses only its entry.
+    """
+
+    def __init__(self, path: Path):
+        """
+        Open an archive
+
+        Args:
+            path (Path): Monthly archive (e.g., Daily_2023_01.zip).
+        """
+        self.logger = LoggerUtil(name=__name__).get_logger()
+        self.path = Path(path)
+        self.zip_file = zipfile.ZipFile(self.path, "r")
+        self.index = json.loads(self.zip_file.read(INDEX_NAME))
+
+    @classmethod
+    def locate(cls, archive_dir: Path, report_name: str) -> Optional[Path]:
+        """
+        Find the monthly archive holding a daily report
+
+        Args:
+            archive_dir (Path): Directory of the monthly archives.
+            report_name (str): Daily report ZIP name (e.g., 'Daily_2023_01_10.zip').
+
+        Returns:
+            Optional[Path]: Archive path, None if the report was not archived.
+        """
+        match = REPORT_NAME.match(report_name)
+        if not match:
+            return None
+        path = Path(archive_dir) / f"{match.group('prefix')}{match.group('month')}.zip"
+        if not path.exists():
+            return None
+        with cls(path) as archive:
+            return path if report_name in archive.index["reports"] else None
+
+    def close(self):
+        """Close the archive file"""
+        self.zip_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def reports(self) -> List[str]:
+        """Names of the daily reports held by the archive"""
+        return sorted(self.index["reports"])
+
+    def _report(self, day: str) -> Tuple[str, Dict]:
+        day = day.replace("/", "_")
+        for name, report in self.index["reports"].items():
+            if report["day"] == day:
+                return name, report
+        raise KeyError(f"{day} not in {self.path.name}")
+
+    def products(self, day: str) -> List[str]:
+        """
+        Products traded on a day
+
+        Args:
+            day (str): Trading day as 'YYYY_MM_DD' or 'YYYY/MM/DD'.
+
+        Returns:
+            List[str]: Product codes, stripped of padding.
+        """
+        _, report = self._report(day)
+        groups = {self._product(group) for member in report["members"] for group in member["groups"]}
+        return sorted(group for group in groups if group)
+
+    def read_lines(self, day: str, product: str) -> List[str]:
+        """
+        Decode the report lines of one product and day, in report order
+
+        Args:
+            day (str): Trading day as 'YYYY_MM_DD' or 'YYYY/MM/DD'.
+            product (str): Product code (e.g., 'TX').
+
+        Returns:
+            List[str]: Lines without terminators, decoded like RptReader does.
+        """
+        report_name, _ = self._report(day)
+        return list(self.iter_lines(report_name, [product]))
+
+    def iter_lines(self, report_name: str, products: Optional[Iterable[str]] = None) -> Iterator[str]:
+        """
+        Decode the lines of an archived daily report member by member, like RptReader does for the ZIP
+
+        Args:
+            report_name (str): Daily report ZIP name (e.g., 'Daily_2023_01_10.zip').
+            products (Iterable[str], optional): Only decode the lines of these products. Defaults to every line.
+
+        Returns:
+            Iterator over lines without terminators. Lines of a product keep their report order;
+            with products given, a member yields them product by product.
+        """
+        products = set(products) if products is not None else None
+        encoding = self.index["encoding"]
+        for member in self.index["reports"][report_name]["members"]:
+            if products is not None and member["mode"] != "raw":
+                for number, group in enumerate(member["groups"]):
+                    if self._product(group) in products:
+                        for line in decode_lines(_unpack(self.zip_file.read(f"{member['entry']}/{number}.bin"))):
+                            yield line.decode(encoding, errors="replace")
+                continue
+
+            # A verbatim member has to be decompressed whole
+            for line in self._reproduce_member(member).splitlines():
+                if products is not None:
+                    fields = line.split(b",", 2)
+                    if len(fields) < 2 or self._product(fields[1].decode("latin-1")) not in products:
+                        continue
+                yield line.decode(encoding, errors="replace")
+
+    def source_digest(self, report_name: str) -> Tuple[int, str]:
+        """
+        Size and SHA-256 of the daily ZIP a report was packed from, as IngestLedger records them
+
+        Archives packed before the ZIP digest was kept hash the member digests
+        instead, so their reports do not match a ledger entry of the ZIP.
+
+        Args:
+            report_name (str): Daily report ZIP name (e.g., 'Daily_2023_01_10.zip').
+
+        Returns:
+            Tuple[int, str]: ZIP size in bytes and hex digest.
+        """
+        report = self.index["reports"][report_name]
+        digest = report.get("sha256")
+        if digest is None:
+            members = "".join(member["sha256"] for member in report["members"])
+            digest = hashlib.sha256(members.encode("ascii")).hexdigest()
+        return report["size"], digest
+
+    def reproduce(self, report_name: str) -> Dict[str, bytes]:
+        """
+        Rebuild every member of a daily report byte for byte
+
+        Args:
+            report_name (str): Daily report ZIP name (e.g., 'Daily_2023_01_10.zip').
+
+        Returns:
+            Dict[str, bytes]: Member name to original content.
+        """
+        report = self.index["reports"][report_name]
+        return {member["name"]: self._reproduce_member(member) for member in report["members"]}
+
+    def _reproduce_member(self, member: Dict) -> bytes:
+        if member["mode"] == "raw":
+            return self._read_raw(member)
+
+        group_lines = [
+            iter(decode_lines(_unpack(self.zip_file.read(f"{member['entry']}/{number}.bin"))))
+            for number in range(len(member["groups"]))
+        ]
+        order = _unpack(self.zip_file.read(f"{member['entry']}/order.bin"))
+        groups = np.repeat(order["groups"], order["runs"]).tolist()
+        terminator = member["terminator"].encode("latin-1")
+        text = terminator.join(next(group_lines[group]) for group in groups)
+        return text + (terminator if member["trailing"] else b"")
+
+    def _product(self, group: str) -> str:
+        """Product code of a group name, which keeps the raw bytes as latin-1"""
+        return group.encode("latin-1").decode(self.index["encoding"], errors="replace").strip()
+
+    def _read_raw(self, member: Dict) -> bytes:
+        return lzma.decompress(self.zip_file.read(f"{member['entry']}/raw.bin"))
+
+
+class ArchiveCompactor:
+    """
+    Repacks the daily report ZIPs of a month into one archive.
+
+    Every report member is split into lines, grouped by product, and each
+    group is stored as a table of line shapes plus delta-encoded numeric
+    columns (see encode_lines()). A member is only stored that way if it
+    decodes back to the exact original bytes; otherwise it is kept verbatim.
+    """
+
+    def __init__(self, report_dir: Path, archive_dir: Path, encoding: str = "cp950"):
+        """
+        Initialize the compactor
+
+        Args:
+            report_dir (Path): Directory of the daily report ZIPs.
+            archive_dir (Path): Directory of the monthly archives.
+            encoding (str, optional): Text encoding of the reports. Defaults to cp950 (Big5).
+        """
+        self.logger = LoggerUtil(name=__name__).get_logger()
+        self.report_dir = Path(report_dir)
+        self.archive_dir = Path(archive_dir)
+        self.encoding = encoding
+
+    def months(self, prefix: str) -> Dict[str, List[Path]]:
+        """
+        Group the daily reports of a type by month
+
+        Args:
+            prefix (str): Report name prefix ('Daily_' or 'OptionsDaily_').
+
+        Returns:
+            Dict[str, List[Path]]: 'YYYY_MM' to report paths in date order.
+        """
+        months: Dict[str, List[Path]] = {}
+        for path in sorted(self.report_dir.glob(f"{prefix}*.zip")):
+            match = REPORT_NAME.match(path.name)
+            if match and match.group("prefix") == prefix:
+                months.setdefault(match.group("month"), []).append(path)
+        return months
+
+    def archive_path(self, prefix: str, month: str) -> Path:
+        """Monthly archive of a report type"""
+        return self.archive_dir / f"{prefix}{month}.zip"
+
+    def _encode_member(self, entry: str, name: str, text: bytes) -> Tuple[Dict, Dict[str, bytes]]:
+        """Encode one report member, falling back to verbatim storage if it does not round-trip"""
+        terminator = b"\r\n" if b"\r\n" in text else b"\n"
+        trailing = text.endswith(terminator)
+        lines = (text[: -len(terminator)] if trailing else text).split(terminator)
+
+        # Group lines by the product field, keeping the first-seen order of products
+        groups: Dict[bytes, List[bytes]] = {}
+        line_groups = np.empty(len(lines), dtype=np.int64)
+        numbers: Dict[bytes, int] = {}
+        for position, line in enumerate(lines):
+            fields = line.split(b",", 2)
+            group = fields[1] if len(fields) > 1 else b""
+            line_groups[position] = numbers.setdefault(group, len(numbers))
+            groups.setdefault(group, []).append(line)
+
+        entries: Dict[str, bytes] = {}
+        encoded = {}
+        shape_count = 0
+        for group, group_lines in groups.items():
+            encoded[group] = encode_lines(group_lines)
+            shape_count += len(json.loads(encoded[group]["shapes"].tobytes().decode("utf-8")))
+
+        meta = {"name": name, "entry": entry, "size": len(text), "sha256": hashlib.sha256(text).hexdigest()}
+        meta.update({"terminator": terminator.decode("latin-1"), "trailing": trailing})
+        meta["groups"] = [group.decode("latin-1") for group in groups]
+
+        # Verify before trusting the columns with the only copy
+        rebuilt = [iter(decode_lines(encoded[group])) for group in groups]
+        round_trip = terminator.join(next(rebuilt[group]) for group in line_groups.tolist())
+        round_trip += terminator if trailing else b""
+        if round_trip != text or shape_count > max(16, MAX_SHAPE_RATIO * len(lines)):
+            self.logger.warning(f"{entry} is not tabular, storing it verbatim")
+            meta["mode"] = "raw"
+            entries[f"{entry}/raw.bin"] = lzma.compress(text)
+            return meta, entries
+
+        meta["mode"] = "columns"
+        for number, group in enumerate(groups):
+            entries[f"{entry}/{number}.bin"] = _pack(encoded[group])
+
+        # Line order as runs of group numbers; reports list each product contiguously
+        starts = np.flatnonzero(np.diff(line_groups, prepend=-1))
+        runs = np.diff(np.append(starts, len(line_groups)))
+        entries[f"{entry}/order.bin"] = _pack({"groups": _smallest(line_groups[starts]), "runs": runs})
+        return meta, entries
+
+    def compact(self, prefix: str, month: str) -> Optional[Path]:
+        """
+        Write the archive of one month, merging with the reports it already holds
+
+        Args:
+            prefix (str): Report name prefix ('Daily_' or 'OptionsDaily_').
+            month (str): Month as 'YYYY_MM'.
+
+        Returns:
+            Optional[Path]: Archive path, None if there is nothing to archive.
+        """
+        reports = self.months(prefix).get(month, [])
+        if not reports:
+            self.logger.warning(f"No {prefix}{month}_*.zip reports in {self.report_dir}")
+            return None
+
+        target = self.archive_path(prefix, month)
+        index = {"version": ARCHIVE_VERSION, "encoding": self.encoding, "reports": {}}
+        entries: Dict[str, bytes] = {}
+
+        # Reports archived earlier stay unless a daily ZIP replaces them
+        if target.exists():
+            with zipfile.ZipFile(target, "r") as previous:
+                index["reports"] = json.loads(previous.read(INDEX_NAME))["reports"]
+                replaced = {report.name for report in reports}
+                for name in list(index["reports"]):
+                    if name in replaced:
+                        del index["reports"][name]
+                kept = {member["entry"] for report in index["reports"].values() for member in report["members"]}
+                for info in previous.infolist():
+                    if info.filename.rsplit("/", 1)[0] in kept:
+                        entries[info.filename] = previous.read(info)
+
+        for path in reports:
+            day = REPORT_NAME.match(path.name).group("month") + "_" + REPORT_NAME.match(path.name).group("day")
+            members = []
+            with zipfile.ZipFile(path, "r") as daily:
+                for number, name in enumerate(n for n in daily.namelist() if not n.endswith("/")):
+                    meta, member_entries = self._encode_member(f"{day}/{number}", name, daily.read(name))
+                    members.append(meta)
+                    entries.update(member_entries)
+            index["reports"][path.name] = {
+                "day": day,
+                "size": path.stat().st_size,
+                "sha256": hashlib.sha256(path.read_bytes()).hexdigest(),
+                "members": members,
+            }
+            self.logger.info(f"Packed {path.name}: {[member['mode'] for member in members]}")
+
+        # Entries are already compressed; write to a temporary file and swap it in
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        staging = target.with_name(f".{target.name}.tmp")
+        with zipfile.ZipFile(staging, "w", zipfile.ZIP_STORED) as archive:
+            archive.writestr(INDEX_NAME, json.dumps(index, ensure_ascii=False, indent=1))
+            for name in sorted(entries):
+                archive.writestr(name, entries[name])
+        staging.replace(target)
+
+        size = sum(path.stat().st_size for path in reports)
+        self.logger.info(f"Archived {len(reports)} reports of {month}: {size} -> {target.stat().st_size} bytes")
+        return target
+
+    def verify(self, archive_path: Path) -> List[str]:
+        """
+        Check every member of an archive against its recorded SHA-256
+
+        Args:
+            archive_path (Path): Monthly archive.
+
+        Returns:
+            List[str]: Names of reports that do not reproduce exactly, empty if all do.
+        """
+        failed = []
+        with ReportArchive(archive_path) as archive:
+            for report_name in archive.reports():
+                members = archive.reproduce(report_name)
+                for member in archive.index["reports"][report_name]["members"]:
+                    content = members.get(member["name"], b"")
+                    if hashlib.sha256(content).hexdigest() != member["sha256"]:
+                        failed.append(report_name)
+                        break
+        return failed
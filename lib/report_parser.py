@@ -0,0 +1,454 @@
+#!/usr/bin/python3
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from lib.bar_builders import BarBuilder
+from lib.candle_builder import CandleAccumulator, CandleBuilder
+from lib.log_util import LoggerUtil
+from lib.rpt_reader import RptReader
+from lib.shared_ticks import SharedSlice, SharedTickStore, read_shared
+from lib.volume_profile import SessionProfile, VolumeProfiler
+
+# Part of a session task that computes the volume profile instead of a bar type
+PROFILE_PART = "profile"
+
+
+class ParsedReport(NamedTuple):
+    """Everything ingest stores from a futures report"""
+
+    expiry_candles: Dict[str, Dict[str, List[Tuple]]]  # Symbol to expiry to one-minute candles
+    candles: Dict[str, List[Tuple]]  # Symbol to the front month series
+    bars: Dict[str, Dict[str, List[Tuple]]]  # Symbol to bar type name to bars
+    profiles: Dict[str, List[SessionProfile]]  # Symbol to session profiles
+    ticks: Dict[str, Dict[str, np.ndarray]]  # Symbol to expiry to ticks (date, time, price, volume)
+
+
+class ReportParser:
+    """
+    Turns a futures report into candles, bars and session profiles.
+
+    The parser holds no connection or file handle, so its bound methods can
+    be sent to worker processes: given a pool, parse() reads a report once
+    into shared memory and fans the candles, bars and profiles of its series
+    out to the workers.
+    """
+
+    def __init__(
+        self, candle_builder: CandleBuilder, bar_builders: Sequence[BarBuilder], volume_profiler: VolumeProfiler
+    ):
+        """
+        Initialize the parser
+
+        Args:
+            candle_builder (CandleBuilder): Builder of the one-minute candles.
+            bar_builders (Sequence[BarBuilder]): Bar types to build from the front month ticks.
+            volume_profiler (VolumeProfiler): Profiler of the front month sessions.
+        """
+        self.logger = LoggerUtil(name=__name__).get_logger()
+        self.candle_builder = candle_builder
+        self.bar_builders = list(bar_builders)
+        self.volume_profiler = volume_profiler
+
+    def parse(
+        self,
+        zip_path: Path,
+        symbols: List[str],
+        archive_path: Optional[Path] = None,
+        chunk_size: int = 0,
+        pool: Optional[Executor] = None,
+    ) -> ParsedReport:
+        """
+        Parse a report in one pass and build everything stored from it
+
+        With a worker pool the ticks are parsed once into a shared memory
+        block; workers build the candles of every series and the bars and
+        profiles of every session from views of it, so only the built rows
+        come back pickled.
+
+        Args:
+            zip_path (Path): Report ZIP file.
+            symbols (List[str]): Symbols to process (e.g., ['TX', 'MTX']).
+            archive_path (Path, optional): Monthly archive read if the ZIP file is missing.
+            chunk_size (int, optional): Ticks per block to bound memory; such a parse keeps no ticks,
+                bars or profiles and runs in-process. Defaults to 0 (whole report).
+            pool (Executor, optional): Worker processes to build from shared memory. Defaults to None (in-process).
+
+        Returns:
+            ParsedReport: Candles, bars, profiles and ticks per symbol; symbols without data are left out.
+        """
+        ticks_by_symbol = {}
+        if chunk_size:
+            expiry_candles_by_symbol = self.build_expiry_candles_chunked(zip_path, symbols, chunk_size, archive_path)
+        else:
+            ticks_by_symbol = self.read_expiry_ticks(zip_path, symbols, archive_path)
+
+        shared_ticks = SharedTickStore(ticks_by_symbol) if pool is not None and ticks_by_symbol else None
+        try:
+            if shared_ticks is not None:
+                expiry_candles_by_symbol = self.map_expiry_candles(shared_ticks, pool)
+            elif not chunk_size:
+                expiry_candles_by_symbol = self.build_expiry_candles(ticks_by_symbol)
+
+            candles_by_symbol = {}
+            front_months_by_symbol = {}
+            for symbol in symbols:
+                expiry_candles = expiry_candles_by_symbol.get(symbol)
+                if not expiry_candles:
+                    self.logger.warning(f"No data found for symbol {symbol} in {zip_path}")
+                    continue
+
+                # Build the continuous series from the front month of each session
+                front_months = self.front_months(symbol, expiry_candles)
+                candles = self.select_front_month(expiry_candles, front_months)
+                if not candles:
+                    self.logger.warning(f"No candles generated from the {symbol} tick data")
+                    continue
+                candles_by_symbol[symbol] = candles
+                if symbol in ticks_by_symbol:
+                    front_months_by_symbol[symbol] = front_months
+
+            # Build the configured bar types and session profiles from the same front month ticks
+            if shared_ticks is not None:
+                bars_by_symbol, profiles_by_symbol = self.map_sessions(shared_ticks, front_months_by_symbol, pool)
+            else:
+                bars_by_symbol = {}
+                profiles_by_symbol = {}
+                for symbol, front_months in front_months_by_symbol.items():
+                    session_ticks = self.session_ticks(ticks_by_symbol[symbol], front_months)
+                    if self.bar_builders:
+                        bars_by_symbol[symbol] = self.build_bars(session_ticks)
+                    profiles_by_symbol[symbol] = self.build_profiles(session_ticks)
+        finally:
+            if shared_ticks is not None:
+                shared_ticks.close()
+
+        return ParsedReport(
+            expiry_candles_by_symbol, candles_by_symbol, bars_by_symbol, profiles_by_symbol, ticks_by_symbol
+        )
+
+    def map_expiry_candles(self, shared_ticks: SharedTickStore, pool: Executor) -> Dict[str, Dict[str, List[Tuple]]]:
+        """
+        Build candles per symbol and expiry in worker processes reading the series from shared memory
+
+        Args:
+            shared_ticks (SharedTickStore): Ticks of the report.
+            pool (Executor): Worker processes.
+
+        Returns:
+            Dict[str, Dict[str, List[Tuple]]]: Symbol to expiry to candle tuples.
+        """
+        # Largest series first so the pool stays balanced
+        offsets = shared_ticks.offsets
+        series = sorted(offsets, key=lambda key: offsets[key][1] - offsets[key][0], reverse=True)
+        self.logger.info(f"Building candles of {len(series)} series in worker processes")
+        results = pool.map(self.build_shared_candles, [shared_ticks.slice(symbol, expiry) for symbol, expiry in series])
+        candles_by_series = dict(zip(series, results))
+
+        # Keep the report order of the expiries
+        expiry_candles_by_symbol = {}
+        for symbol, expiry in offsets:
+            expiry_candles_by_symbol.setdefault(symbol, {})[expiry] = candles_by_series[(symbol, expiry)]
+        return expiry_candles_by_symbol
+
+    def map_sessions(
+        self, shared_ticks: SharedTickStore, front_months_by_symbol: Dict[str, Dict[str, str]], pool: Executor
+    ) -> Tuple[Dict[str, Dict[str, List[Tuple]]], Dict[str, List[SessionProfile]]]:
+        """
+        Build the bars and profiles of every front month session in worker processes, one bar type per task
+
+        Args:
+            shared_ticks (SharedTickStore): Ticks of the report.
+            front_months_by_symbol (Dict[str, Dict[str, str]]): Symbol to session to front month expiry.
+            pool (Executor): Worker processes.
+
+        Returns:
+            Tuple: Symbol to bar type name to bar tuples in time order, and symbol to session profiles.
+        """
+        parts = [builder.name for builder in self.bar_builders] + [PROFILE_PART]
+        keys = [
+            (symbol, session, part, expiry)
+            for symbol, front_months in front_months_by_symbol.items()
+            for session, expiry in front_months.items()
+            for part in parts
+        ]
+        tasks = [(shared_ticks.slice(symbol, expiry), session, part) for symbol, session, part, expiry in keys]
+        results = pool.map(self.build_shared_session, tasks)
+
+        bars_by_symbol = {}
+        profiles_by_symbol = {symbol: [] for symbol in front_months_by_symbol}
+        for (symbol, _, part, _), result in zip(keys, results):
+            if result is None:
+                # The front month had no ticks in the session
+                continue
+            if part == PROFILE_PART:
+                profiles_by_symbol[symbol].append(result)
+            else:
+                bars_by_symbol.setdefault(symbol, {}).setdefault(part, []).extend(result)
+
+        if self.bar_builders:
+            for symbol in front_months_by_symbol:
+                bars = bars_by_symbol.setdefault(symbol, {})
+                for builder in self.bar_builders:
+                    # Bars never span a session break
+                    bars[builder.name] = sorted(bars.get(builder.name, []), key=lambda bar: (bar[0], bar[1]))
+        return bars_by_symbol, profiles_by_symbol
+
+    def build_shared_candles(self, location: SharedSlice) -> List[Tuple]:
+        """
+        Worker entry point building the one-minute candles of a series in shared memory
+
+        Args:
+            location (SharedSlice): Series location.
+
+        Returns:
+            List[Tuple]: Candle tuples (Date, Time, Open, High, Low, Close, Volume).
+        """
+        return read_shared(location, self.ticks_to_candles)
+
+    def build_shared_session(self, task: Tuple[SharedSlice, str, str]) -> Union[List[Tuple], SessionProfile, None]:
+        """
+        Worker entry point building one bar type or the profile of one session of a series in shared memory
+
+        Args:
+            task (Tuple[SharedSlice, str, str]): Series location, session ('night' or 'day') and bar type name,
+                or PROFILE_PART for the session profile.
+
+        Returns:
+            Union[List[Tuple], SessionProfile, None]: Bar tuples or the profile, None if the session has no ticks.
+        """
+        location, session, part = task
+        # The masked copy outlives the view of the shared block
+        tick_array = read_shared(
+            location, lambda ticks: ticks[self.candle_builder.day_session_mask(ticks[:, 1]) == (session == "day")]
+        )
+        if len(tick_array) == 0:
+            return None
+        if part == PROFILE_PART:
+            return self.build_profiles({session: tick_array})[0]
+
+        builder = next(builder for builder in self.bar_builders if builder.name == part)
+        return builder.build(tick_array[:, 0], tick_array[:, 1], tick_array[:, 2], tick_array[:, 3])
+
+    def read_expiry_ticks(
+        self, zip_path: Path, symbols: List[str], archive_path: Optional[Path] = None
+    ) -> Dict[str, Dict[str, np.ndarray]]:
+        """
+        Read the whole report into tick arrays per symbol and outright expiry
+
+        Args:
+            zip_path (Path): Report ZIP file.
+            symbols (List[str]): Symbols to process.
+            archive_path (Path, optional): Monthly archive read if the ZIP file is missing.
+
+        Returns:
+            Dict[str, Dict[str, np.ndarray]]: Symbol to expiry to tick array with columns (date, time, price, volume).
+        """
+        ticks_by_symbol = {}
+        for symbol, by_expiry in RptReader(zip_path, archive_path).read_ticks(symbols).items():
+            # Calendar spreads quote price differences, not contract prices
+            ticks_by_expiry = {
+                expiry: tick_array
+                for expiry, tick_array in by_expiry.items()
+                if "/" not in expiry and len(tick_array) > 0
+            }
+            if not ticks_by_expiry:
+                continue
+            self.logger.info(
+                f"Found {sum(len(a) for a in ticks_by_expiry.values())} ticks for {symbol} "
+                f"in expiries {sorted(ticks_by_expiry)}"
+            )
+            ticks_by_symbol[symbol] = ticks_by_expiry
+
+        return ticks_by_symbol
+
+    def build_expiry_candles(
+        self, ticks_by_symbol: Dict[str, Dict[str, np.ndarray]]
+    ) -> Dict[str, Dict[str, List[Tuple]]]:
+        """
+        Build candles per symbol and expiry from tick arrays held in memory
+
+        Args:
+            ticks_by_symbol (Dict[str, Dict[str, np.ndarray]]): Symbol to expiry to tick array.
+
+        Returns:
+            Dict[str, Dict[str, List[Tuple]]]: Symbol to expiry to candle tuples.
+        """
+        return {
+            symbol: {expiry: self.ticks_to_candles(tick_array) for expiry, tick_array in by_expiry.items()}
+            for symbol, by_expiry in ticks_by_symbol.items()
+        }
+
+    def build_expiry_candles_chunked(
+        self, zip_path: Path, symbols: List[str], chunk_size: int, archive_path: Optional[Path] = None
+    ) -> Dict[str, Dict[str, List[Tuple]]]:
+        """
+        Build candles per symbol and expiry from fixed-size tick blocks with bounded memory
+
+        Args:
+            zip_path (Path): Report ZIP file.
+            symbols (List[str]): Symbols to process.
+            chunk_size (int): Number of ticks per block.
+            archive_path (Path, optional): Monthly archive read if the ZIP file is missing.
+
+        Returns:
+            Dict[str, Dict[str, List[Tuple]]]: Symbol to expiry to candle tuples.
+        """
+        self.logger.info(f"Parsing {zip_path} in blocks of {chunk_size} ticks")
+        reader = RptReader(zip_path, archive_path)
+        accumulators: Dict[Tuple[int, int], CandleAccumulator] = {}
+
+        for block in reader.iter_blocks(symbols, chunk_size):
+            # Feed each (symbol, expiry) series of the block to its own accumulator
+            series = np.unique(block[:, :2], axis=0)
+            for symbol_code, expiry_code in series.tolist():
+                if "/" in reader.expiries[expiry_code]:
+                    # Calendar spreads quote price differences, not contract prices
+                    continue
+                mask = (block[:, 0] == symbol_code) & (block[:, 1] == expiry_code)
+                accumulator = accumulators.setdefault(
+                    (symbol_code, expiry_code), CandleAccumulator(self.candle_builder)
+                )
+                accumulator.feed(block[mask, 2], block[mask, 3], block[mask, 4], block[mask, 5])
+
+        expiry_candles_by_symbol = {}
+        for (symbol_code, expiry_code), accumulator in accumulators.items():
+            symbol, expiry = symbols[symbol_code], reader.expiries[expiry_code]
+            candles = accumulator.finish()
+            self.logger.info(
+                f"Generated {len(candles)} candles from {accumulator.tick_count} ticks for {symbol} {expiry}"
+            )
+            expiry_candles_by_symbol.setdefault(symbol, {})[expiry] = candles
+
+        return expiry_candles_by_symbol
+
+    def front_months(self, symbol: str, expiry_candles: Dict[str, List[Tuple]]) -> Dict[str, str]:
+        """
+        Find the most traded expiry in each session
+
+        Args:
+            symbol (str): Symbol being processed.
+            expiry_candles (Dict[str, List[Tuple]]): Expiry to candle tuples.
+
+        Returns:
+            Dict[str, str]: Session ('night' or 'day') to front month expiry, for sessions with trades.
+        """
+        front_months = {}
+        for session, is_day in (("night", False), ("day", True)):
+            session_candles = {
+                expiry: [candle for candle in candles if self.candle_builder.is_day_candle(candle[1]) == is_day]
+                for expiry, candles in expiry_candles.items()
+            }
+            volumes = {expiry: sum(candle[6] for candle in candles) for expiry, candles in session_candles.items()}
+            front_month = max(volumes, key=volumes.get)
+            if not session_candles[front_month]:
+                continue
+
+            self.logger.info(
+                f"Front month of {symbol} {session} session: {front_month} (volume={volumes[front_month]})"
+            )
+            front_months[session] = front_month
+
+        return front_months
+
+    def select_front_month(self, expiry_candles: Dict[str, List[Tuple]], front_months: Dict[str, str]) -> List[Tuple]:
+        """
+        Select the candles of the front month expiry in each session
+
+        Args:
+            expiry_candles (Dict[str, List[Tuple]]): Expiry to candle tuples.
+            front_months (Dict[str, str]): Session to front month expiry from front_months().
+
+        Returns:
+            List[Tuple]: Front month candle tuples in time order.
+        """
+        front_candles = []
+        for session, expiry in front_months.items():
+            is_day = session == "day"
+            front_candles.extend(
+                candle for candle in expiry_candles[expiry] if self.candle_builder.is_day_candle(candle[1]) == is_day
+            )
+
+        return sorted(front_candles, key=lambda candle: (candle[0], candle[1]))
+
+    def session_ticks(
+        self, ticks_by_expiry: Dict[str, np.ndarray], front_months: Dict[str, str]
+    ) -> Dict[str, np.ndarray]:
+        """
+        Slice the front month ticks of each session
+
+        Args:
+            ticks_by_expiry (Dict[str, np.ndarray]): Expiry to tick array with columns (date, time, price, volume).
+            front_months (Dict[str, str]): Session to front month expiry from front_months().
+
+        Returns:
+            Dict[str, np.ndarray]: Session to tick array of its front month.
+        """
+        session_ticks = {}
+        for session, expiry in front_months.items():
+            tick_array = ticks_by_expiry[expiry]
+            in_session = self.candle_builder.day_session_mask(tick_array[:, 1]) == (session == "day")
+            if in_session.any():
+                session_ticks[session] = tick_array[in_session]
+        return session_ticks
+
+    def build_bars(self, session_ticks: Dict[str, np.ndarray]) -> Dict[str, List[Tuple]]:
+        """
+        Build the configured bar types from the front month ticks of each session
+
+        Args:
+            session_ticks (Dict[str, np.ndarray]): Session to tick array from session_ticks().
+
+        Returns:
+            Dict[str, List[Tuple]]: Bar type name (e.g., 'tick500') to bar tuples in time order.
+        """
+        bars = {builder.name: [] for builder in self.bar_builders}
+        for tick_array in session_ticks.values():
+            # Bars never span a session break
+            for builder in self.bar_builders:
+                bars[builder.name].extend(
+                    builder.build(tick_array[:, 0], tick_array[:, 1], tick_array[:, 2], tick_array[:, 3])
+                )
+
+        return {name: sorted(rows, key=lambda bar: (bar[0], bar[1])) for name, rows in bars.items()}
+
+    def build_profiles(self, session_ticks: Dict[str, np.ndarray]) -> List[SessionProfile]:
+        """
+        Compute the volume profile, VWAP and value area of each session
+
+        Args:
+            session_ticks (Dict[str, np.ndarray]): Session to tick array from session_ticks().
+
+        Returns:
+            List[SessionProfile]: Session profiles.
+        """
+        profiles = []
+        for session, tick_array in session_ticks.items():
+            # A night session belongs to the trading day it closes on
+            date = str(tick_array[:, 0].max())
+            profile = self.volume_profiler.compute(
+                f"{date[:4]}/{date[4:6]}/{date[6:]}", session, tick_array[:, 2], tick_array[:, 3]
+            )
+            self.logger.info(
+                f"Profile of {profile.date} {session} session: VWAP={profile.vwap} POC={profile.poc} "
+                f"VA={profile.val}-{profile.vah}"
+            )
+            profiles.append(profile)
+        return profiles
+
+    def ticks_to_candles(self, tick_array: np.ndarray) -> List[Tuple]:
+        """
+        Convert tick data into one-minute OHLCV candles.
+
+        Args:
+            tick_array (np.ndarray): Integer tick array with columns (date, time, price, volume).
+
+        Returns:
+            List[Tuple]: Candle tuples (Date, Time, Open, High, Low, Close, Volume).
+        """
+        if tick_array.size == 0:
+            self.logger.warning("Tick array is empty. No candles to process.")
+            return []
+
+        return self.candle_builder.build(tick_array[:, 0], tick_array[:, 1], tick_array[:, 2], tick_array[:, 3])
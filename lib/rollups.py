@@ -0,0 +1,248 @@
+#!/usr/bin/python3
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from lib.candle_store import select_candles
+from lib.log_util import LoggerUtil
+
+# Intraday rollups, in 1-minute candles per bar
+ROLLUP_INTERVALS = (5, 15, 30, 60, 300)
+
+# Calendar rollups built from the daily bars
+ROLLUP_PERIODS = ("day", "week", "month")
+
+# Day session exported by mining_rpt.py: SESSION_START < Time <= SESSION_END
+SESSION_START = "08:45:00"
+SESSION_END = "13:45:00"
+
+
+def aggregate(rows: Sequence[Tuple]) -> Tuple:
+    """
+    Merge consecutive candles into one bar labelled with the date and time of the last one.
+
+    Args:
+        rows (Sequence[Tuple]): Candle tuples (Date, Time, Open, High, Low, Close, Volume) in time order.
+
+    Returns:
+        Tuple: Bar tuple in the same layout.
+    """
+    return (
+        rows[-1][0],
+        rows[-1][1],
+        int(rows[0][2]),
+        max(int(row[3]) for row in rows),
+        min(int(row[4]) for row in rows),
+        int(rows[-1][5]),
+        sum(int(row[6]) for row in rows),
+    )
+
+
+def rollup_rows(rows: Sequence[Tuple], interval: int) -> List[Tuple]:
+    """
+    Group the day session candles of one date into bars of `interval` consecutive candles.
+
+    The last bar keeps whatever candles are left, as the TXT export always did.
+
+    Args:
+        rows (Sequence[Tuple]): Candle tuples of one day session in time order.
+        interval (int): Candles per bar.
+
+    Returns:
+        List[Tuple]: Bar tuples (Date, Time, Open, High, Low, Close, Volume).
+    """
+    return [aggregate(rows[start : start + interval]) for start in range(0, len(rows), interval)]
+
+
+def period_key(period: str, date: str) -> str:
+    """
+    Bucket of a date for a calendar rollup.
+
+    Args:
+        period (str): 'day', 'week' or 'month'.
+        date (str): Date in 'YYYY/MM/DD' format.
+
+    Returns:
+        str: The date itself, the Monday of its week, or 'YYYY/MM'.
+    """
+    if period == "day":
+        return date
+    if period == "week":
+        day = datetime.strptime(date, "%Y/%m/%d")
+        return (day - timedelta(days=day.weekday())).strftime("%Y/%m/%d")
+    return date[:7]
+
+
+class RollupBuilder:
+    """
+    Maintains materialized bars of the exported day session per symbol.
+
+    tw{symbol}_roll{N} holds the N-minute bars and tw{symbol}_roll_{period}
+    the daily, weekly and monthly bars. A stored date only changes its own
+    day and the week and month containing it, so ingest rebuilds just those
+    buckets inside the transaction that wrote the candles.
+    """
+
+    INTERVAL_TABLE_SQL = """
+        CREATE TABLE IF NOT EXISTS tw{symbol}_roll{interval}(
+            Date TEXT NOT NULL,
+            Time TEXT NOT NULL,
+            Open INT,
+            High INT,
+            Low INT,
+            Close INT,
+            Volume INT,
+            PRIMARY KEY (Date, Time)
+        ) WITHOUT ROWID;
+    """
+
+    PERIOD_TABLE_SQL = """
+        CREATE TABLE IF NOT EXISTS tw{symbol}_roll_{period}(
+            Period TEXT PRIMARY KEY,
+            Date TEXT NOT NULL,
+            Time TEXT NOT NULL,
+            Open INT,
+            High INT,
+            Low INT,
+            Close INT,
+            Volume INT
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, intervals: Sequence[int] = ROLLUP_INTERVALS):
+        """
+        Initialize the builder
+
+        Args:
+            intervals (Sequence[int], optional): Intraday bar sizes in minutes. Defaults to ROLLUP_INTERVALS.
+        """
+        self.logger = LoggerUtil(name=__name__).get_logger()
+        self.intervals = tuple(intervals)
+
+    def _create_tables(self, cursor: sqlite3.Cursor, symbol: str):
+        for interval in self.intervals:
+            cursor.execute(self.INTERVAL_TABLE_SQL.format(symbol=symbol, interval=interval))
+        for period in ROLLUP_PERIODS:
+            cursor.execute(self.PERIOD_TABLE_SQL.format(symbol=symbol, period=period))
+
+    def update(self, cursor: sqlite3.Cursor, symbol: str, dates: Iterable[str], schema: Optional[str] = None) -> int:
+        """
+        Rebuild the rollups of the given dates from the stored 1-minute candles
+
+        Args:
+            cursor (sqlite3.Cursor): Database cursor, committed by the caller.
+            symbol (str): Futures symbol (e.g., 'TX').
+            dates (Iterable[str]): Dates in 'YYYY/MM/DD' format whose candles changed.
+            schema (str, optional): Attached database holding the candles; see select_candles().
+
+        Returns:
+            int: Number of intraday bars written.
+        """
+        self._create_tables(cursor, symbol)
+        dates = sorted(set(dates))
+        written = 0
+        for date in dates:
+            rows = select_candles(cursor, symbol, date, SESSION_START, SESSION_END, schema).fetchall()
+            for interval in self.intervals:
+                bars = rollup_rows(rows, interval)
+                cursor.execute(f"DELETE FROM tw{symbol}_roll{interval} WHERE Date=?;", (date,))
+                cursor.executemany(f"INSERT INTO tw{symbol}_roll{interval} VALUES (?,?,?,?,?,?,?);", bars)
+                written += len(bars)
+
+            cursor.execute(f"DELETE FROM tw{symbol}_roll_day WHERE Period=?;", (date,))
+            if rows:
+                cursor.execute(f"INSERT INTO tw{symbol}_roll_day VALUES (?,?,?,?,?,?,?,?);", (date,) + aggregate(rows))
+
+        # Weeks and months are merged from the daily bars of their bucket
+        for period in ROLLUP_PERIODS[1:]:
+            for key in sorted({period_key(period, date) for date in dates}):
+                first = key if period == "week" else f"{key}/01"
+                last = (
+                    (datetime.strptime(key, "%Y/%m/%d") + timedelta(days=6)).strftime("%Y/%m/%d")
+                    if period == "week"
+                    else f"{key}/31"
+                )
+                days = cursor.execute(
+                    f"""
+                    SELECT Date, Time, Open, High, Low, Close, Volume FROM tw{symbol}_roll_day
+                    WHERE Period BETWEEN ? AND ? ORDER BY Period;
+                    """,
+                    (first, last),
+                ).fetchall()
+                cursor.execute(f"DELETE FROM tw{symbol}_roll_{period} WHERE Period=?;", (key,))
+                if days:
+                    cursor.execute(
+                        f"INSERT INTO tw{symbol}_roll_{period} VALUES (?,?,?,?,?,?,?,?);", (key,) + aggregate(days)
+                    )
+
+        self.logger.debug(f"Rebuilt rollups of [{symbol}] for {len(dates)} dates")
+        return written
+
+    def read(self, cursor: sqlite3.Cursor, symbol: str, interval: int, date: str) -> Optional[List[Tuple]]:
+        """
+        Get the stored intraday bars of one date
+
+        Args:
+            cursor (sqlite3.Cursor): Database cursor.
+            symbol (str): Futures symbol (e.g., 'TX').
+            interval (int): Bar size in minutes.
+            date (str): Date in 'YYYY/MM/DD' format.
+
+        Returns:
+            Optional[List[Tuple]]: Bars in time order, or None if the date has not been rolled up.
+        """
+        if interval not in self.intervals or not self._has_table(cursor, f"tw{symbol}_roll{interval}"):
+            return None
+        rows = cursor.execute(
+            f"SELECT * FROM tw{symbol}_roll{interval} WHERE Date=? ORDER BY Time;", (date,)
+        ).fetchall()
+        return rows or None
+
+    def read_range(self, cursor: sqlite3.Cursor, symbol: str, interval: int, first: str, last: str) -> List[Tuple]:
+        """
+        Get the stored intraday bars of a date range in one query
+
+        Args:
+            cursor (sqlite3.Cursor): Database cursor.
+            symbol (str): Futures symbol (e.g., 'TX').
+            interval (int): Bar size in minutes.
+            first (str): First date in 'YYYY/MM/DD' format.
+            last (str): Last date in 'YYYY/MM/DD' format.
+
+        Returns:
+            List[Tuple]: Bars in time order; dates that have not been rolled up are missing.
+        """
+        if interval not in self.intervals or not self._has_table(cursor, f"tw{symbol}_roll{interval}"):
+            return []
+        return cursor.execute(
+            f"SELECT * FROM tw{symbol}_roll{interval} WHERE Date BETWEEN ? AND ? ORDER BY Date, Time;", (first, last)
+        ).fetchall()
+
+    def read_periods(self, cursor: sqlite3.Cursor, symbol: str, period: str, first: str, last: str) -> List[Tuple]:
+        """
+        Get the calendar bars whose last trading date falls within a range
+
+        Args:
+            cursor (sqlite3.Cursor): Database cursor.
+            symbol (str): Futures symbol (e.g., 'TX').
+            period (str): 'day', 'week' or 'month'.
+            first (str): First date in 'YYYY/MM/DD' format.
+            last (str): Last date in 'YYYY/MM/DD' format.
+
+        Returns:
+            List[Tuple]: Bar tuples (Date, Time, Open, High, Low, Close, Volume) in date order.
+        """
+        if not self._has_table(cursor, f"tw{symbol}_roll_{period}"):
+            return []
+        return cursor.execute(
+            f"""
+            SELECT Date, Time, Open, High, Low, Close, Volume FROM tw{symbol}_roll_{period}
+            WHERE Date BETWEEN ? AND ? ORDER BY Period;
+            """,
+            (first, last),
+        ).fetchall()
+
+    @staticmethod
+    def _has_table(cursor: sqlite3.Cursor, name: str) -> bool:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?;", (name,))
+        return cursor.fetchone() is not None
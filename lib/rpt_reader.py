@@ -0,0 +1,325 @@
+#!/usr/bin/python3
+import io
+import zipfile
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+from lib.log_util import LoggerUtil
+from lib.report_archive import ReportArchive
+
+
+class Tick(NamedTuple):
+    """A single trade record from a TAIFEX daily report"""
+
+    product: str
+    expiry: str
+    date: int
+    time: int
+    price: int
+    volume: int
+
+
+class OptionTick(NamedTuple):
+    """A single trade record from a TAIFEX daily options report"""
+
+    product: str
+    expiry: str
+    strike: float
+    cp: str
+    date: int
+    time: int
+    price: float
+    volume: int
+
+
+def parse_price(value: str) -> int:
+    """
+    Parse a price field, rounding the rare decimal quotes to an integer.
+
+    Args:
+        value (str): Raw price field.
+
+    Returns:
+        int: Parsed price.
+    """
+    try:
+        return int(value)
+    except ValueError:
+        return int(round(float(value)))
+
+
+class RptReader:
+    """
+    Streams tick rows from a TAIFEX daily futures report ZIP (Daily_YYYY_MM_DD.zip).
+
+    Lines are decoded lazily straight from the archive member, so the report
+    never has to be extracted to disk or piped through external tools. Once
+    the ZIP is pruned, the report is read from its monthly archive instead.
+    """
+
+    # Reports are published in Big5 (cp950) encoding
+    ENCODING = "cp950"
+
+    # Column layout: date, product, expiry, time, price, volume(B+S), near, far, opening auction flag
+    DATE_COL = 0
+    PRODUCT_COL = 1
+    EXPIRY_COL = 2
+    TIME_COL = 3
+    PRICE_COL = 4
+    VOLUME_COL = 5
+
+    # Columns of the numeric blocks yielded by iter_blocks()
+    BLOCK_COLUMNS = ("symbol", "expiry", "date", "time", "price", "volume")
+
+    def __init__(self, zip_path: Path, archive_path: Optional[Path] = None):
+        """
+        Initialize the reader for a report ZIP file.
+
+        Args:
+            zip_path (Path): Path to the report ZIP file.
+            archive_path (Path, optional): Monthly archive holding the report, read if the ZIP file is missing.
+        """
+        self.logger = LoggerUtil(name=__name__).get_logger()
+        self.zip_path = Path(zip_path)
+        self.archive_path = Path(archive_path) if archive_path is not None else None
+
+        # Expiry vocabulary used to encode expiry fields as integers in blocks
+        self.expiries: List[str] = []
+        self._expiry_codes: Dict[str, int] = {}
+
+    def iter_lines(self, products: Optional[Iterable[str]] = None) -> Iterator[str]:
+        """
+        Lazily decode lines of every report member in the ZIP file.
+
+        Args:
+            products (Iterable[str], optional): Products the caller keeps. An archive only decodes their
+                lines; a ZIP yields every line. Defaults to all.
+
+        Returns:
+            Iterator over report lines without line terminators.
+        """
+        if not self.zip_path.exists() and self.archive_path is not None:
+            with ReportArchive(self.archive_path) as archive:
+                yield from archive.iter_lines(self.zip_path.name, products)
+            return
+
+        if not self.zip_path.exists():
+            self.logger.error(f"ZIP file not found: {self.zip_path}")
+            raise FileNotFoundError(f"ZIP file not found: {self.zip_path}")
+
+        with zipfile.ZipFile(self.zip_path, "r") as zip_file:
+            for name in zip_file.namelist():
+                if name.endswith("/"):
+                    continue
+                with zip_file.open(name, "r") as member:
+                    text = io.TextIOWrapper(member, encoding=self.ENCODING, errors="replace")
+                    for line in text:
+                        yield line.rstrip("\r\n")
+
+    def iter_ticks(
+        self, symbols: Optional[Iterable[str]] = None, expiries: Optional[Iterable[str]] = None
+    ) -> Iterator[Tick]:
+        """
+        Yield typed ticks filtered on product and expiry fields.
+
+        Args:
+            symbols (Iterable[str], optional): Products to keep (e.g., 'TX', 'MTX'). Defaults to all.
+            expiries (Iterable[str], optional): Expiry fields to keep (e.g., '202301'). Defaults to all.
+
+        Returns:
+            Iterator over Tick rows.
+        """
+        symbols = set(symbols) if symbols is not None else None
+        expiries = set(expiries) if expiries is not None else None
+        max_split = self.VOLUME_COL + 1
+
+        for line in self.iter_lines(symbols):
+            fields = line.split(",", max_split)
+            if len(fields) <= self.VOLUME_COL or not fields[self.DATE_COL].strip().isdigit():
+                # Skip header and blank lines
+                continue
+
+            product = fields[self.PRODUCT_COL].strip()
+            if symbols is not None and product not in symbols:
+                continue
+            expiry = fields[self.EXPIRY_COL].strip()
+            if expiries is not None and expiry not in expiries:
+                continue
+
+            try:
+                yield Tick(
+                    product,
+                    expiry,
+                    int(fields[self.DATE_COL]),
+                    int(fields[self.TIME_COL]),
+                    parse_price(fields[self.PRICE_COL].strip()),
+                    int(fields[self.VOLUME_COL]),
+                )
+            except ValueError:
+                self.logger.debug(f"Skipping malformed line: {line}")
+
+    def read_ticks(
+        self, symbols: Iterable[str], expiries: Optional[Iterable[str]] = None
+    ) -> Dict[str, Dict[str, np.ndarray]]:
+        """
+        Split ticks of several symbols and expiries into per-symbol buffers in a single pass.
+
+        Args:
+            symbols (Iterable[str]): Products to read (e.g., ['TX', 'MTX']).
+            expiries (Iterable[str], optional): Expiry fields to keep. Defaults to every expiry in the report.
+
+        Returns:
+            Dict mapping symbol to expiry to an int64 array with columns (date, time, price, volume).
+        """
+        expiries = list(expiries) if expiries is not None else None
+        rows: Dict[str, Dict[str, List[tuple]]] = {
+            symbol: {expiry: [] for expiry in expiries or []} for symbol in symbols
+        }
+        for tick in self.iter_ticks(rows.keys(), expiries):
+            rows[tick.product].setdefault(tick.expiry, []).append(tick[2:])
+
+        return {
+            symbol: {expiry: np.array(data, dtype=np.int64).reshape(-1, 4) for expiry, data in by_expiry.items()}
+            for symbol, by_expiry in rows.items()
+        }
+
+    def expiry_code(self, expiry: str) -> int:
+        """
+        Get the integer code of an expiry field, registering it on first use.
+
+        Args:
+            expiry (str): Expiry field (e.g., '202301').
+
+        Returns:
+            int: Index of the expiry in self.expiries.
+        """
+        code = self._expiry_codes.get(expiry)
+        if code is None:
+            code = self._expiry_codes[expiry] = len(self.expiries)
+            self.expiries.append(expiry)
+        return code
+
+    def iter_blocks(
+        self, symbols: Iterable[str], chunk_size: int, expiries: Optional[Iterable[str]] = None
+    ) -> Iterator[np.ndarray]:
+        """
+        Yield ticks in fixed-size numeric blocks so memory stays bounded by the chunk size.
+
+        The block buffer is reused between iterations; consume or copy it before
+        requesting the next block.
+
+        Args:
+            symbols (Iterable[str]): Products to read (e.g., ['TX', 'MTX']).
+            chunk_size (int): Maximum number of ticks per block.
+            expiries (Iterable[str], optional): Expiry fields to keep. Defaults to every expiry in the report.
+
+        Returns:
+            Iterator over int64 arrays with columns BLOCK_COLUMNS, where symbol is the index
+            in symbols and expiry the index in self.expiries.
+        """
+        symbols = list(symbols)
+        symbol_codes = {symbol: code for code, symbol in enumerate(symbols)}
+        block = np.empty((chunk_size, len(self.BLOCK_COLUMNS)), dtype=np.int64)
+
+        count = 0
+        for tick in self.iter_ticks(symbols, expiries):
+            block[count] = (symbol_codes[tick.product], self.expiry_code(tick.expiry)) + tick[2:]
+            count += 1
+            if count == chunk_size:
+                yield block
+                count = 0
+
+        if count:
+            yield block[:count]
+
+
+class OptionsRptReader(RptReader):
+    """
+    Streams trade rows from a TAIFEX daily options report ZIP (OptionsDaily_YYYY_MM_DD.zip).
+    """
+
+    # Column layout: date, product, strike, expiry, call/put, time, price, volume(B or S), opening auction flag
+    DATE_COL = 0
+    PRODUCT_COL = 1
+    STRIKE_COL = 2
+    EXPIRY_COL = 3
+    CP_COL = 4
+    TIME_COL = 5
+    PRICE_COL = 6
+    VOLUME_COL = 7
+
+    # Integer codes of the call/put field
+    CP_CODES = {"C": 0, "P": 1}
+
+    def iter_ticks(
+        self, symbols: Optional[Iterable[str]] = None, expiries: Optional[Iterable[str]] = None
+    ) -> Iterator[OptionTick]:
+        """
+        Yield typed option trades filtered on product and expiry fields.
+
+        Args:
+            symbols (Iterable[str], optional): Products to keep (e.g., 'TXO'). Defaults to all.
+            expiries (Iterable[str], optional): Expiry fields to keep (e.g., '202301', '202301W1'). Defaults to all.
+
+        Returns:
+            Iterator over OptionTick rows.
+        """
+        symbols = set(symbols) if symbols is not None else None
+        expiries = set(expiries) if expiries is not None else None
+        max_split = self.VOLUME_COL + 1
+
+        for line in self.iter_lines(symbols):
+            fields = line.split(",", max_split)
+            if len(fields) <= self.VOLUME_COL or not fields[self.DATE_COL].strip().isdigit():
+                # Skip header and blank lines
+                continue
+
+            product = fields[self.PRODUCT_COL].strip()
+            if symbols is not None and product not in symbols:
+                continue
+            expiry = fields[self.EXPIRY_COL].strip()
+            if expiries is not None and expiry not in expiries:
+                continue
+
+            try:
+                yield OptionTick(
+                    product,
+                    expiry,
+                    float(fields[self.STRIKE_COL]),
+                    fields[self.CP_COL].strip()[:1].upper(),
+                    int(fields[self.DATE_COL]),
+                    int(fields[self.TIME_COL]),
+                    float(fields[self.PRICE_COL]),
+                    int(fields[self.VOLUME_COL]),
+                )
+            except ValueError:
+                self.logger.debug(f"Skipping malformed line: {line}")
+
+    def read_columns(self, symbols: Iterable[str]) -> Dict[str, Dict[str, np.ndarray]]:
+        """
+        Split option trades of several symbols into numeric column arrays in a single pass.
+
+        Args:
+            symbols (Iterable[str]): Products to read (e.g., ['TXO']).
+
+        Returns:
+            Dict mapping symbol to columns 'expiry' (code into self.expiries), 'strike', 'cp'
+            (CP_CODES), 'date', 'time', 'price' and 'volume'.
+        """
+        names = ("expiry", "strike", "cp", "date", "time", "price", "volume")
+        rows: Dict[str, List[tuple]] = {symbol: [] for symbol in symbols}
+        for tick in self.iter_ticks(rows.keys()):
+            if tick.cp not in self.CP_CODES:
+                self.logger.debug(f"Skipping trade with unknown call/put field: {tick}")
+                continue
+            rows[tick.product].append((self.expiry_code(tick.expiry), tick.strike, self.CP_CODES[tick.cp]) + tick[4:])
+
+        columns = {}
+        for symbol, data in rows.items():
+            table = np.array(data, dtype=np.float64).reshape(-1, len(names))
+            columns[symbol] = {
+                name: table[:, i] if name in ("strike", "price") else table[:, i].astype(np.int64)
+                for i, name in enumerate(names)
+            }
+        return columns
@@ -0,0 +1,96 @@
+#!/usr/bin/python3
+from multiprocessing import shared_memory
+from typing import Callable, Dict, NamedTuple, Tuple, TypeVar
+
+import numpy as np
+from lib.log_util import LoggerUtil
+
+# Columns of every tick row: date, time, price, volume
+TICK_COLUMNS = 4
+
+T = TypeVar("T")
+
+
+class SharedSlice(NamedTuple):
+    """Location of one tick series inside a shared memory block, cheap to send to workers"""
+
+    shm_name: str
+    rows: int  # Total rows of the shared block
+    start: int
+    end: int
+
+
+class SharedTickStore:
+    """
+    Packs the tick arrays of all series of a report into one shared memory block.
+
+    The parent copies every (symbol, expiry) array once into the block; worker
+    processes attach to the block by name and read their slice in place with
+    read_shared(), so tick data is never pickled between processes.
+    """
+
+    def __init__(self, ticks_by_symbol: Dict[str, Dict[str, np.ndarray]]):
+        """
+        Copy tick arrays into a new shared memory block
+
+        Args:
+            ticks_by_symbol (Dict[str, Dict[str, np.ndarray]]): Mapping of symbol to expiry to int64
+                tick array with columns (date, time, price, volume).
+        """
+        self.logger = LoggerUtil(name=__name__).get_logger()
+        self.rows = sum(len(tick_array) for by_expiry in ticks_by_symbol.values() for tick_array in by_expiry.values())
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, self.rows * TICK_COLUMNS * 8))
+        self.array = np.ndarray((self.rows, TICK_COLUMNS), dtype=np.int64, buffer=self.shm.buf)
+
+        self.offsets: Dict[Tuple[str, str], Tuple[int, int]] = {}
+        start = 0
+        for symbol, by_expiry in ticks_by_symbol.items():
+            for expiry, tick_array in by_expiry.items():
+                end = start + len(tick_array)
+                self.array[start:end] = tick_array
+                self.offsets[(symbol, expiry)] = (start, end)
+                start = end
+
+        self.logger.info(f"Shared {self.rows} ticks of {len(self.offsets)} series in {self.shm.name}")
+
+    def slice(self, symbol: str, expiry: str) -> SharedSlice:
+        """Get the worker-side location of one series"""
+        start, end = self.offsets[(symbol, expiry)]
+        return SharedSlice(self.shm.name, self.rows, start, end)
+
+    def close(self):
+        """Release and remove the shared memory block; workers must be done with it"""
+        del self.array
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self) -> "SharedTickStore":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def read_shared(location: SharedSlice, reader: Callable[[np.ndarray], T]) -> T:
+    """
+    Attach to a shared block in a worker process and apply a reader to a view of one series.
+
+    The view is only valid during the call, so the reader must return data
+    that does not reference it (e.g., candle tuples or a masked copy).
+
+    Args:
+        location (SharedSlice): Series location from SharedTickStore.slice().
+        reader (Callable[[np.ndarray], T]): Function of the tick rows (date, time, price, volume).
+
+    Returns:
+        T: Result of the reader.
+    """
+    shm = shared_memory.SharedMemory(name=location.shm_name)
+    ticks = None
+    try:
+        ticks = np.ndarray((location.rows, TICK_COLUMNS), dtype=np.int64, buffer=shm.buf)[location.start : location.end]
+        return reader(ticks)
+    finally:
+        # Views must be released before the block can be closed
+        del ticks
+        shm.close()
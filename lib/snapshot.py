@@ -0,0 +1,205 @@
+#!/usr/bin/python3
+import fnmatch
+import os
+import re
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import List, Sequence
+
+from lib.candle_partitions import CandlePartitions
+from lib.log_util import LoggerUtil
+from lib.rollups import ROLLUP_PERIODS
+
+DEFAULT_SNAPSHOT_NAME = "FCT_WEB.db"
+
+# Derived tables the frontend reads: rollups, volume profiles, options analytics and coverage. Per-expiry
+# candles, raw option candles, tick/volume/second bars, implied volatilities and ingest bookkeeping stay behind
+SNAPSHOT_TABLES = ("tw*_roll*", "tw*_profile", "tw*_strike", "tw*_daily", "coverage")
+
+# Candles clustered by time: a date range is one contiguous run of pages
+SNAPSHOT_CANDLE_SQL = """
+    CREATE TABLE IF NOT EXISTS snap.tw{symbol}(
+        Date TEXT NOT NULL,
+        Time TEXT NOT NULL,
+        Open INT,
+        High INT,
+        Low INT,
+        Close INT,
+        Volume INT,
+        PRIMARY KEY (Date, Time)
+    ) WITHOUT ROWID;
+"""
+
+# Covering indexes of the reads that do not follow the primary keys
+SNAPSHOT_INDEX_SQL = {
+    # Session closes of every date (get_data.run_trading_strategy, the web charts)
+    "tw{symbol}": "CREATE INDEX snap.tw{symbol}_time_close ON tw{symbol}(Time, Date, Close);",
+    # Calendar bars by their last trading date (RollupBuilder.read_periods)
+    "tw{symbol}_roll_{period}": (
+        "CREATE INDEX snap.tw{symbol}_roll_{period}_date "
+        "ON tw{symbol}_roll_{period}(Date, Time, Open, High, Low, Close, Volume);"
+    ),
+}
+
+SNAPSHOT_INFO_SQL = """
+    CREATE TABLE snap.snapshot_info(
+        PublishedAt TEXT NOT NULL,
+        LastDate TEXT
+    );
+"""
+
+
+class SnapshotPublisher:
+    """
+    Publishes a read-only copy of FCT_DB.db for the web frontend.
+
+    The snapshot is built in a staging file next to FCT_DB.db from one
+    read transaction, so ingest keeps writing while it is built. Candles of
+    every layout (legacy, compact or partitioned) are laid out as
+    tw{symbol} tables clustered by (Date, Time); the derived tables of
+    SNAPSHOT_TABLES are copied in time order with their indexes, plus
+    covering indexes for the frontend reads. The file is then vacuumed,
+    analyzed, checked, made read-only and renamed over the previous
+    snapshot. Readers that have the old file open keep reading it, new
+    readers get the new one, and no reader ever waits for a writer.
+    """
+
+    def __init__(self, base_path: Path, symbols: Sequence[str], snapshot_name: str = DEFAULT_SNAPSHOT_NAME):
+        """
+        Initialize the publisher
+
+        Args:
+            base_path (Path): Directory holding FCT_DB.db and its partitions.
+            symbols (Sequence[str]): Futures symbols whose candles are published (e.g., ['TX', 'MTX']).
+            snapshot_name (str, optional): Snapshot file name. Defaults to 'FCT_WEB.db'.
+        """
+        self.logger = LoggerUtil(name=__name__).get_logger()
+        self.base_path = Path(base_path)
+        self.symbols = list(symbols)
+        self.db_path = self.base_path / "FCT_DB.db"
+        self.target = self.base_path / snapshot_name
+
+    def publish(self) -> Path:
+        """
+        Build the snapshot and swap it into place
+
+        Returns:
+            Path: The published snapshot.
+
+        Raises:
+            FileNotFoundError: If FCT_DB.db does not exist.
+            ValueError: If the built snapshot fails its integrity check; the previous one stays in place.
+        """
+        if not self.db_path.exists():
+            raise FileNotFoundError(f"Database not found: {self.db_path}")
+
+        staging = self.target.with_name(f".{self.target.name}.tmp")
+        staging.unlink(missing_ok=True)
+        conn = sqlite3.connect(f"{self.db_path.resolve().as_uri()}?mode=ro", uri=True, isolation_level=None)
+        try:
+            # The staging file is thrown away on failure, so it needs no journal
+            conn.execute("ATTACH DATABASE ? AS snap;", (str(staging),))
+            conn.execute("PRAGMA snap.journal_mode=OFF;")
+            conn.execute("PRAGMA snap.synchronous=OFF;")
+
+            # Partitions are attached a batch of years at a time, which ATTACH allows only between transactions
+            candles = 0
+            for _ in CandlePartitions(self.base_path).attach_batches(conn):
+                conn.execute("BEGIN;")
+                candles += sum(self._copy_candles(conn, symbol) for symbol in self.symbols)
+                conn.execute("COMMIT;")
+
+            conn.execute("BEGIN;")
+            tables = self._derived_tables(conn)
+            for name in tables:
+                self._copy_table(conn, name)
+            last_date = self._last_date(conn)
+            conn.execute(SNAPSHOT_INFO_SQL)
+            conn.execute(
+                "INSERT INTO snap.snapshot_info VALUES (?, ?);",
+                (datetime.now().isoformat(timespec="seconds"), last_date),
+            )
+            self._create_indexes(conn)
+            conn.execute("COMMIT;")
+            conn.close()
+
+            # On its own connection, where the TEMP views over the partitions cannot shadow the snapshot tables
+            conn = sqlite3.connect(str(staging), isolation_level=None)
+            conn.execute("VACUUM;")
+            conn.execute("ANALYZE;")
+            conn.execute("PRAGMA journal_mode=DELETE;")
+            result = conn.execute("PRAGMA quick_check;").fetchone()[0]
+        except BaseException:
+            conn.close()
+            staging.unlink(missing_ok=True)
+            raise
+        conn.close()
+
+        if result != "ok":
+            staging.unlink(missing_ok=True)
+            raise ValueError(f"Snapshot failed the integrity check: {result}")
+
+        # Read-only like a frozen partition; rename() replaces the previous snapshot in one step
+        staging.chmod(0o444)
+        os.replace(staging, self.target)
+        self.logger.info(
+            f"Published {self.target.name} ({self.target.stat().st_size} bytes): "
+            f"{candles} candles up to {last_date}, {len(tables)} derived tables"
+        )
+        return self.target
+
+    def _copy_candles(self, conn: sqlite3.Connection, symbol: str) -> int:
+        # tw{symbol} resolves to the partition views, the compact view or the legacy table
+        found = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name=? UNION ALL SELECT 1 FROM temp.sqlite_master WHERE name=?;",
+            (f"tw{symbol}", f"tw{symbol}"),
+        ).fetchone()
+        if found is None:
+            return 0
+        conn.execute(SNAPSHOT_CANDLE_SQL.format(symbol=symbol))
+        query = f"""
+            INSERT OR REPLACE INTO snap.tw{symbol}
+            SELECT Date, Time, Open, High, Low, Close, Volume FROM tw{symbol} ORDER BY Date, Time;
+        """
+        return conn.execute(query).rowcount
+
+    @staticmethod
+    def _derived_tables(conn: sqlite3.Connection) -> List[str]:
+        names = conn.execute("SELECT name FROM main.sqlite_master WHERE type='table' ORDER BY name;").fetchall()
+        return [name for (name,) in names if any(fnmatch.fnmatchcase(name, pattern) for pattern in SNAPSHOT_TABLES)]
+
+    @staticmethod
+    def _copy_table(conn: sqlite3.Connection, name: str):
+        """Copy a table of FCT_DB.db with its indexes, rows in time order when it has a Date column"""
+        (sql,) = conn.execute("SELECT sql FROM main.sqlite_master WHERE type='table' AND name=?;", (name,)).fetchone()
+        conn.execute(re.sub(r"^CREATE TABLE\s+", "CREATE TABLE snap.", sql, count=1))
+
+        columns = [row[1] for row in conn.execute(f'PRAGMA main.table_info("{name}");').fetchall()]
+        order = [column for column in ("Date", "Time") if column in columns]
+        order_by = f" ORDER BY {', '.join(order)}" if order else ""
+        conn.execute(f'INSERT INTO snap."{name}" SELECT * FROM main."{name}"{order_by};')
+
+        indexes = conn.execute(
+            "SELECT sql FROM main.sqlite_master WHERE type='index' AND tbl_name=? AND sql IS NOT NULL;", (name,)
+        ).fetchall()
+        for (index_sql,) in indexes:
+            conn.execute(re.sub(r"^CREATE (UNIQUE )?INDEX\s+", r"CREATE \1INDEX snap.", index_sql, count=1))
+
+    def _create_indexes(self, conn: sqlite3.Connection):
+        tables = {row[0] for row in conn.execute("SELECT name FROM snap.sqlite_master WHERE type='table';")}
+        for symbol in self.symbols:
+            if f"tw{symbol}" in tables:
+                conn.execute(SNAPSHOT_INDEX_SQL["tw{symbol}"].format(symbol=symbol))
+            for period in ROLLUP_PERIODS:
+                if f"tw{symbol}_roll_{period}" in tables:
+                    conn.execute(SNAPSHOT_INDEX_SQL["tw{symbol}_roll_{period}"].format(symbol=symbol, period=period))
+
+    def _last_date(self, conn: sqlite3.Connection) -> str:
+        tables = {row[0] for row in conn.execute("SELECT name FROM snap.sqlite_master WHERE type='table';")}
+        dates = [
+            conn.execute(f"SELECT MAX(Date) FROM snap.tw{symbol};").fetchone()[0]
+            for symbol in self.symbols
+            if f"tw{symbol}" in tables
+        ]
+        return max((date for date in dates if date), default=None)
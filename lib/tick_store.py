@@ -0,0 +1,231 @@
+#!/usr/bin/python3
+import json
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+from lib.log_util import LoggerUtil
+
+# Column files of one day, in the order of the tick arrays they are built from
+TICK_DTYPES: Dict[str, str] = {
+    "time": "<i8",  # Epoch seconds of the exchange wall clock, treated as UTC like the compact candles
+    "price": "<i4",
+    "volume": "<i4",  # As reported: both sides of every trade
+    "expiry": "u1",  # Index into the expiries list of the day index
+}
+
+INDEX_NAME = "index.json"
+EPOCH = datetime(1970, 1, 1)
+
+
+def to_epoch_seconds(dates: np.ndarray, times: np.ndarray) -> np.ndarray:
+    """
+    Convert YYYYMMDD dates and HHMMSS times of ticks to epoch seconds.
+
+    Args:
+        dates (np.ndarray): Integer dates.
+        times (np.ndarray): Integer times.
+
+    Returns:
+        np.ndarray: int64 seconds since 1970-01-01 of the wall clock.
+    """
+    unique_dates, inverse = np.unique(dates, return_inverse=True)
+    day_seconds = np.array(
+        [(datetime.strptime(str(date), "%Y%m%d") - EPOCH).days * 86400 for date in unique_dates.tolist()],
+        dtype=np.int64,
+    )
+    return day_seconds[inverse.reshape(-1)] + times // 10000 * 3600 + times // 100 % 100 * 60 + times % 100
+
+
+class TickDay:
+    """
+    Memory-mapped ticks of one symbol and trading day.
+
+    Columns are read-only np.memmap arrays over the column files, so opening
+    a day reads only the index and slicing an expiry copies nothing. Rows are
+    grouped by expiry and in time order within each expiry.
+    """
+
+    def __init__(self, path: Path):
+        """
+        Open a stored day
+
+        Args:
+            path (Path): Day directory written by TickStore.write().
+        """
+        with open(path / INDEX_NAME, "r", encoding="utf-8") as f:
+            self.index = json.load(f)
+        self.path = path
+        self.rows: int = self.index["rows"]
+        self.expiries: List[str] = self.index["expiries"]
+        # mmap cannot map an empty file
+        self.columns: Dict[str, np.ndarray] = {
+            name: (
+                np.memmap(path / f"{name}.bin", dtype=dtype, mode="r", shape=(self.rows,))
+                if self.rows
+                else np.empty(0, dtype=dtype)
+            )
+            for name, dtype in self.index["columns"].items()
+        }
+        self.time = self.columns["time"]
+        self.price = self.columns["price"]
+        self.volume = self.columns["volume"]
+        self.expiry = self.columns["expiry"]
+
+    def select(self, expiry: str) -> Dict[str, np.ndarray]:
+        """
+        Get the columns of one expiry as views
+
+        Args:
+            expiry (str): Expiry field (e.g., '202301').
+
+        Returns:
+            Dict[str, np.ndarray]: Column name to memmap view, empty columns if the expiry did not trade.
+        """
+        start, end = self.index["offsets"].get(expiry, (0, 0))
+        return {name: column[start:end] for name, column in self.columns.items()}
+
+    def datetimes(self) -> np.ndarray:
+        """Tick times as datetime64[s] (a copy)"""
+        return self.columns["time"].astype("datetime64[s]")
+
+
+class TickStore:
+    """
+    Keeps the parsed ticks of every ingested report as fixed-dtype column files.
+
+    Each day lives in {root}/{symbol}/{YYYY}/{YYYY_MM_DD}/ with one raw
+    little-endian file per column and a small JSON index holding the row
+    count, dtypes and per-expiry row ranges. Days are written to a temporary
+    directory and renamed into place, so readers never see a partial day.
+    """
+
+    def __init__(self, root: Path):
+        """
+        Initialize the store
+
+        Args:
+            root (Path): Store directory, created on first write.
+        """
+        self.logger = LoggerUtil(name=__name__).get_logger()
+        self.root = Path(root)
+
+    def day_path(self, symbol: str, day: str) -> Path:
+        """
+        Directory of one day
+
+        Args:
+            symbol (str): Futures symbol (e.g., 'TX').
+            day (str): Trading day as 'YYYY_MM_DD' or 'YYYY/MM/DD'.
+
+        Returns:
+            Path: Day directory.
+        """
+        day = day.replace("/", "_")
+        return self.root / symbol / day[:4] / day
+
+    def write(self, symbol: str, day: str, ticks_by_expiry: Dict[str, np.ndarray]) -> int:
+        """
+        Store the ticks of one symbol and trading day, replacing a previous copy
+
+        Args:
+            symbol (str): Futures symbol (e.g., 'TX').
+            day (str): Trading day of the report as 'YYYY_MM_DD'.
+            ticks_by_expiry (Dict[str, np.ndarray]): Expiry to int64 tick array with columns
+                (date, time, price, volume), as returned by RptReader.read_ticks().
+
+        Returns:
+            int: Number of ticks written.
+        """
+        expiries = sorted(expiry for expiry, ticks in ticks_by_expiry.items() if len(ticks))
+        if len(expiries) > np.iinfo(np.uint8).max:
+            raise ValueError(f"Too many expiries for {symbol} on {day}: {len(expiries)}")
+
+        offsets = {}
+        parts = []
+        start = 0
+        for code, expiry in enumerate(expiries):
+            ticks = ticks_by_expiry[expiry]
+            # Night session ticks carry the calendar date, so (date, time) orders the whole day
+            ticks = ticks[np.lexsort((ticks[:, 1], ticks[:, 0]))]
+            parts.append((code, ticks))
+            offsets[expiry] = (start, start + len(ticks))
+            start += len(ticks)
+
+        target = self.day_path(symbol, day)
+        staging = target.with_name(f".{target.name}.tmp")
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir(parents=True)
+
+        columns = {
+            "time": [to_epoch_seconds(ticks[:, 0], ticks[:, 1]) for _, ticks in parts],
+            "price": [ticks[:, 2] for _, ticks in parts],
+            "volume": [ticks[:, 3] for _, ticks in parts],
+            "expiry": [np.full(len(ticks), code) for code, ticks in parts],
+        }
+        for name, dtype in TICK_DTYPES.items():
+            data = np.concatenate(columns[name]) if parts else np.empty(0)
+            data.astype(dtype).tofile(staging / f"{name}.bin")
+
+        index = {"symbol": symbol, "day": target.name, "rows": start, "columns": TICK_DTYPES}
+        index.update({"expiries": expiries, "offsets": offsets})
+        with open(staging / INDEX_NAME, "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=1)
+
+        # Swap the finished day into place
+        retired = target.with_name(f".{target.name}.old")
+        shutil.rmtree(retired, ignore_errors=True)
+        if target.exists():
+            target.rename(retired)
+        staging.rename(target)
+        shutil.rmtree(retired, ignore_errors=True)
+
+        self.logger.info(f"Stored {start} ticks of [{symbol}] for {target.name} in {target}")
+        return start
+
+    def has_day(self, symbol: str, day: str) -> bool:
+        """
+        Check whether a day has been stored
+
+        Args:
+            symbol (str): Futures symbol (e.g., 'TX').
+            day (str): Trading day as 'YYYY_MM_DD' or 'YYYY/MM/DD'.
+
+        Returns:
+            bool: True if the day index exists.
+        """
+        return (self.day_path(symbol, day) / INDEX_NAME).exists()
+
+    def days(self, symbol: str) -> List[str]:
+        """
+        Stored trading days of a symbol
+
+        Args:
+            symbol (str): Futures symbol (e.g., 'TX').
+
+        Returns:
+            List[str]: Days as 'YYYY_MM_DD', in ascending order.
+        """
+        paths = (self.root / symbol).glob(f"*/*/{INDEX_NAME}")
+        return sorted(path.parent.name for path in paths if not path.parent.name.startswith("."))
+
+    def open(self, symbol: str, day: str) -> TickDay:
+        """
+        Memory-map one stored day
+
+        Args:
+            symbol (str): Futures symbol (e.g., 'TX').
+            day (str): Trading day as 'YYYY_MM_DD' or 'YYYY/MM/DD'.
+
+        Returns:
+            TickDay: Read-only column views.
+
+        Raises:
+            FileNotFoundError: If the day has not been stored.
+        """
+        path = self.day_path(symbol, day)
+        if not (path / INDEX_NAME).exists():
+            raise FileNotFoundError(f"No ticks stored for [{symbol}] on {path.name}")
+        return TickDay(path)
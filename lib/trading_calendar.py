@@ -0,0 +1,239 @@
+#!/usr/bin/python3
+import csv
+import sqlite3
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from lib.candle_builder import CandleBuilder
+from lib.log_util import LoggerUtil
+
+DateLike = Union[date, datetime, str]
+
+# Night sessions open at 15:00 and close at 05:00 on the next calendar day
+NIGHT_OPEN = "15:00:00"
+NIGHT_CLOSE = "05:00:00"
+
+# Day session candles of the compact tables: minutes of the day after 05:00 and before 15:00
+DAY_MINUTES = (5 * 60 + 1, 15 * 60 - 1)
+
+EPOCH = date(1970, 1, 1)
+
+
+def to_date(day: DateLike) -> date:
+    """
+    Normalize a date given as date, datetime or 'YYYY/MM/DD', 'YYYY_MM_DD', 'YYYY-MM-DD' or 'YYYYMMDD'.
+
+    Args:
+        day (DateLike): Date to normalize.
+
+    Returns:
+        date: Calendar date.
+    """
+    if isinstance(day, datetime):
+        return day.date()
+    if isinstance(day, date):
+        return day
+    digits = day.strip().replace("/", "").replace("_", "").replace("-", "")
+    return datetime.strptime(digits, "%Y%m%d").date()
+
+
+class TradingCalendar:
+    """
+    Tells which calendar days TAIFEX trades on.
+
+    Days with day session candles in tw{symbol} are known trading days. The
+    holiday file lists closures (and the occasional special trading day) as
+    'date,description[,open]' lines, and mark_closed() adds the dates a
+    backfill found without a day session. Any other weekday is assumed to
+    trade, so a day missing from the stored candles, e.g. after a failed
+    ingest, is never skipped.
+
+    The night session opening at 15:00 belongs to the next trading day and
+    runs past midnight; session_date() and night_session() map between
+    calendar time and trading days.
+    """
+
+    def __init__(self, holidays_path: Optional[Path] = None):
+        """
+        Initialize the calendar
+
+        Args:
+            holidays_path (Path, optional): TAIFEX holiday file; ignored if it does not exist.
+        """
+        self.logger = LoggerUtil(name=__name__).get_logger()
+        self.open_days: Set[date] = set()
+        self.closed_days: Set[date] = set()
+        self.holidays: Dict[date, bool] = {}
+        if holidays_path is not None and Path(holidays_path).exists():
+            self.load_holidays(Path(holidays_path))
+
+    def load_holidays(self, path: Path) -> int:
+        """
+        Read a holiday file
+
+        Args:
+            path (Path): CSV of 'date,description[,open]' lines; '#' starts a comment line.
+                A day is closed unless the third field is 'open'.
+
+        Returns:
+            int: Number of days read.
+        """
+        count = 0
+        with open(path, "r", encoding="utf-8") as f:
+            for row in csv.reader(line for line in f if line.strip() and not line.lstrip().startswith("#")):
+                try:
+                    day = to_date(row[0])
+                except ValueError:
+                    self.logger.warning(f"Skipping holiday line of {path.name}: {row}")
+                    continue
+                self.holidays[day] = len(row) > 2 and row[2].strip().lower() == "open"
+                count += 1
+        self.logger.debug(f"Loaded {count} holidays from {path}")
+        return count
+
+    def mark_closed(self, days: Iterable[DateLike]) -> int:
+        """
+        Take dates as closed, e.g. those --fill-gaps recorded in coverage_closed
+
+        Args:
+            days (Iterable[DateLike]): Dates without a day session.
+
+        Returns:
+            int: Number of dates marked.
+        """
+        closed = {to_date(day) for day in days}
+        self.closed_days.update(closed)
+        return len(closed)
+
+    def seed(self, cursor: sqlite3.Cursor, symbol: str = "TX", start: DateLike = None, end: DateLike = None) -> int:
+        """
+        Learn the trading days of a range from the stored day session candles
+
+        Only open days are learned: a weekday without candles may be a failed
+        ingest, so closures come from the holiday file and mark_closed().
+        Partitioned candles must be attached for the range (CandlePartitions.attach()).
+
+        Args:
+            cursor (sqlite3.Cursor): Cursor of a connection reading FCT_DB.db.
+            symbol (str, optional): Futures symbol whose candles are read. Defaults to 'TX'.
+            start (DateLike, optional): First date. Defaults to the first stored date.
+            end (DateLike, optional): Last date. Defaults to the last stored date.
+
+        Returns:
+            int: Number of trading days found.
+        """
+        # Partition views live in the temp schema
+        query = """
+            SELECT name FROM sqlite_master WHERE name GLOB :pattern
+            UNION SELECT name FROM temp.sqlite_master WHERE name GLOB :pattern;
+        """
+        names = {row[0] for row in cursor.execute(query, {"pattern": f"tw{symbol}*"}).fetchall()}
+        first = to_date(start) if start else date(1990, 1, 1)
+        last = to_date(end) if end else date(2999, 12, 31)
+
+        if f"tw{symbol}_m" in names:
+            # Epoch-minute keys: whole days are minute // 1440, and the range filter uses the primary key
+            rows = cursor.execute(
+                f"""
+                SELECT DISTINCT Minute / 1440 FROM tw{symbol}_m
+                WHERE Minute BETWEEN ? AND ? AND Minute % 1440 BETWEEN ? AND ?;
+                """,
+                ((first - EPOCH).days * 1440, (last - EPOCH).days * 1440 + 1439, *DAY_MINUTES),
+            ).fetchall()
+            days = {EPOCH + timedelta(days=row[0]) for row in rows}
+        elif f"tw{symbol}" in names:
+            rows = cursor.execute(
+                f"SELECT DISTINCT Date FROM tw{symbol} WHERE Date BETWEEN ? AND ? AND Time > ? AND Time < ?;",
+                (first.strftime("%Y/%m/%d"), last.strftime("%Y/%m/%d"), NIGHT_CLOSE, NIGHT_OPEN),
+            ).fetchall()
+            days = {to_date(row[0]) for row in rows}
+        else:
+            return 0
+
+        self.open_days.update(days)
+        self.logger.debug(f"Seeded {len(days)} trading days from tw{symbol}")
+        return len(days)
+
+    def is_trading_day(self, day: DateLike) -> bool:
+        """
+        Check whether TAIFEX has a day session on a date
+
+        Args:
+            day (DateLike): Calendar date.
+
+        Returns:
+            bool: True for trading days.
+        """
+        day = to_date(day)
+        # Stored candles prove the market opened, whatever the holiday file says
+        if day in self.open_days:
+            return True
+        if day in self.holidays:
+            return self.holidays[day]
+        return day.weekday() < 5 and day not in self.closed_days
+
+    def trading_days(self, start: DateLike, end: DateLike) -> List[datetime]:
+        """
+        Trading days of a range, ends included
+
+        Args:
+            start (DateLike): First date.
+            end (DateLike): Last date.
+
+        Returns:
+            List[datetime]: Trading days at midnight, in ascending order.
+        """
+        first, last = to_date(start), to_date(end)
+        days = (first + timedelta(days=offset) for offset in range((last - first).days + 1))
+        return [datetime(day.year, day.month, day.day) for day in days if self.is_trading_day(day)]
+
+    def next_trading_day(self, day: DateLike) -> date:
+        """First trading day after a date"""
+        day = to_date(day) + timedelta(days=1)
+        while not self.is_trading_day(day):
+            day += timedelta(days=1)
+        return day
+
+    def previous_trading_day(self, day: DateLike) -> date:
+        """Last trading day before a date"""
+        day = to_date(day) - timedelta(days=1)
+        while not self.is_trading_day(day):
+            day -= timedelta(days=1)
+        return day
+
+    def session_date(self, day: DateLike, time: str) -> Tuple[date, str]:
+        """
+        Trading day and session of a candle or tick
+
+        Evening minutes belong to the next trading day; minutes after midnight
+        to the trading day following the evening they continue.
+
+        Args:
+            day (DateLike): Calendar date of the candle.
+            time (str): Candle time as 'HH:MM:SS'.
+
+        Returns:
+            Tuple[date, str]: Trading day and 'day' or 'night'.
+        """
+        day = to_date(day)
+        if CandleBuilder.is_day_candle(time):
+            return day, "day"
+        if time >= NIGHT_OPEN:
+            return self.next_trading_day(day), "night"
+        return self.next_trading_day(day - timedelta(days=1)), "night"
+
+    def night_session(self, day: DateLike) -> Tuple[datetime, datetime]:
+        """
+        Calendar span of the night session reported with a trading day
+
+        Args:
+            day (DateLike): Trading day.
+
+        Returns:
+            Tuple[datetime, datetime]: Opening at 15:00 of the previous trading day and
+                closing at 05:00 of the calendar day after it.
+        """
+        previous = self.previous_trading_day(day)
+        opening = datetime(previous.year, previous.month, previous.day, 15)
+        return opening, opening + timedelta(hours=14)
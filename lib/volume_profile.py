@@ -0,0 +1,134 @@
+#!/usr/bin/python3
+import sqlite3
+from typing import List, NamedTuple, Tuple
+
+import numpy as np
+from lib.log_util import LoggerUtil
+
+
+class SessionProfile(NamedTuple):
+    """Volume profile of one trading session"""
+
+    date: str  # 'YYYY/MM/DD' of the last tick of the session
+    session: str  # 'night' or 'day'
+    volume: int
+    vwap: float
+    poc: int  # Point of control: price level with the most volume
+    vah: int  # Value area high
+    val: int  # Value area low
+    price_min: int  # Price of the first histogram bin
+    histogram: bytes  # Volume per price level from price_min, little-endian int32
+
+    def levels(self) -> np.ndarray:
+        """Decode the histogram into a volume array indexed by price - price_min"""
+        return np.frombuffer(self.histogram, dtype="<i4")
+
+
+class VolumeProfiler:
+    """
+    Computes session volume profiles, VWAP and value area from tick arrays.
+
+    The histogram is built with one np.bincount over integer price offsets, so
+    each session costs a single pass over its ticks regardless of the range.
+    Histograms are stored as compact int32 blobs, one row per day and session.
+    """
+
+    TABLE_SQL = """
+        CREATE TABLE IF NOT EXISTS tw{symbol}_profile(
+            Date TEXT NOT NULL,
+            Session TEXT NOT NULL,
+            Volume INT,
+            VWAP REAL,
+            POC INT,
+            VAH INT,
+            VAL INT,
+            PriceMin INT,
+            Histogram BLOB,
+            PRIMARY KEY (Date, Session)
+        );
+    """
+
+    def __init__(self, value_area: float = 0.7, volume_divisor: int = 2):
+        """
+        Initialize the profiler
+
+        Args:
+            value_area (float, optional): Share of session volume inside the value area. Defaults to 0.7.
+            volume_divisor (int, optional): Divisor applied to tick volumes. Defaults to 2 (B+S records).
+        """
+        self.logger = LoggerUtil(name=__name__).get_logger()
+        self.value_area = value_area
+        self.volume_divisor = volume_divisor
+
+    def value_area_bounds(self, histogram: np.ndarray, poc_index: int) -> Tuple[int, int]:
+        """
+        Grow the value area from the point of control towards the heavier neighbour.
+
+        Args:
+            histogram (np.ndarray): Volume per price level.
+            poc_index (int): Index of the point of control.
+
+        Returns:
+            Tuple of (low index, high index) of the value area, inclusive.
+        """
+        target = histogram.sum() * self.value_area
+        low = high = poc_index
+        covered = histogram[poc_index]
+        while covered < target and (low > 0 or high < len(histogram) - 1):
+            below = histogram[low - 1] if low > 0 else -1
+            above = histogram[high + 1] if high < len(histogram) - 1 else -1
+            if above >= below:
+                high += 1
+                covered += above
+            else:
+                low -= 1
+                covered += below
+        return low, high
+
+    def compute(self, date: str, session: str, prices: np.ndarray, volumes: np.ndarray) -> SessionProfile:
+        """
+        Compute the profile of one session.
+
+        Args:
+            date (str): Session date in 'YYYY/MM/DD' format.
+            session (str): Session name ('night' or 'day').
+            prices (np.ndarray): Integer tick prices.
+            volumes (np.ndarray): Tick volumes.
+
+        Returns:
+            SessionProfile: Profile of the session.
+        """
+        prices = np.asarray(prices, dtype=np.int64)
+        volumes = np.asarray(volumes, dtype=np.int64)
+
+        price_min = int(prices.min())
+        histogram = np.bincount(prices - price_min, weights=volumes).astype(np.int64) // self.volume_divisor
+        vwap = float(np.dot(prices, volumes) / volumes.sum()) if volumes.sum() else float("nan")
+
+        poc_index = int(np.argmax(histogram))
+        low, high = self.value_area_bounds(histogram, poc_index)
+
+        return SessionProfile(
+            date,
+            session,
+            int(histogram.sum()),
+            round(vwap, 2),
+            price_min + poc_index,
+            price_min + high,
+            price_min + low,
+            price_min,
+            histogram.astype("<i4").tobytes(),
+        )
+
+    def store(self, cursor: sqlite3.Cursor, symbol: str, profiles: List[SessionProfile]):
+        """
+        Replace the profiles of the given sessions
+
+        Args:
+            cursor (sqlite3.Cursor): Database cursor, committed by the caller.
+            symbol (str): Symbol (e.g., 'TX').
+            profiles (List[SessionProfile]): Session profiles from compute().
+        """
+        cursor.execute(self.TABLE_SQL.format(symbol=symbol))
+        cursor.executemany(f"INSERT OR REPLACE INTO tw{symbol}_profile VALUES (?,?,?,?,?,?,?,?,?);", profiles)
+        self.logger.info(f"Stored {len(profiles)} session profiles for [{symbol}]")
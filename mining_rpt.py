@@ -15,7 +15,12 @@ exported to various formats for analysis.
 Usage:
     python mining_rpt.py -d 20230101-20230131 # Process data for January 2023
     python mining_rpt.py -e TX 300 -d 20230101-20230131 # Export TX data with 300-min intervals
+    python mining_rpt.py -e TX --bar volume:1000 -d 20230101-20230131 # Export TX 1000-contract volume bars
     python mining_rpt.py --upload-recover # Force redownload and reupload
+    python mining_rpt.py --fill-gaps -d 20200101-20241231 # Process only the dates without candles
+    python mining_rpt.py -d 20230101-20230131 --workers 8 # Build candles, bars and profiles on 8 cores
+    python mining_rpt.py --greeks -d 20230101-20230131 --workers 4 # Option IV/greeks for January 2023
+    python mining_rpt.py --backfill-ticks -d 20230101-20231231 # Fill the tick store from the 2023 reports
 
 Requirement:
     sudo pip3 install --no-cache-dir numpy PyDrive selenium
@@ -28,12 +33,15 @@ Author: Optimized version by Luke Tseng with help from Claude 3.7 Sonnet.
 import sys
 import os
 import argparse
-import subprocess
 import sqlite3
 import json
 import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import resource_tracker
+from functools import partial
 from datetime import datetime, timedelta
-from typing import Tuple, List, Dict, Any, Optional
+from typing import Tuple, List, Dict, Any, Optional, Iterator, Callable
 from pathlib import Path
 
 # === Third-Party Libraries ===
@@ -42,12 +50,41 @@ import numpy as np
 # Import Local Module: log_util and Google Drive utility
 from lib.log_util import LoggerUtil
 from lib.report_downloader import ReportDownloader
+from lib.candle_builder import CandleBuilder
+from lib.rpt_reader import OptionsRptReader
+from lib.report_archive import ReportArchive
+from lib.options_analytics import OptionsAnalytics, OptionsDailyStats
+from lib.option_greeks import OptionGreeksEngine
+from lib.bar_builders import BarBuilder, parse_bar_spec
+from lib.volume_profile import VolumeProfiler, SessionProfile
+from lib.report_parser import ReportParser
+from lib.ingest_ledger import IngestLedger
+from lib.db_schema import (
+    EXPIRY_UPSERT_SQL,
+    OPTION_TABLE_SQL,
+    BAR_TABLE_SQL,
+    ensure_expiry_table,
+    execute_statements,
+)
+from lib.candle_store import upsert_candles, select_candles
+from lib.db_manager import get_connection_manager
+from lib.candle_partitions import CandlePartitions
+from lib.tick_store import TickStore
+from lib.rollups import ROLLUP_PERIODS, SESSION_END, SESSION_START, RollupBuilder, rollup_rows
+from lib.coverage import CoverageIndex
+from lib.trading_calendar import TradingCalendar
+from lib.job_queue import DEFAULT_TIMEOUT, JobQueue
+from lib.snapshot import DEFAULT_SNAPSHOT_NAME, SnapshotPublisher
 from devices.gdrive2 import gdrive
 
 # Set up module-level constants
 DEFAULT_DB_NAME = "FCT_DB.db"
 ITEMS = ("fut_rpt", "opt_rpt")
 
+# Bump whenever parsing or anything ingest writes changes, so ledgered reports are ingested again
+# (2: rollups, coverage, tick store, keyed per-expiry candles, ledger symbols from written rows)
+PARSER_VERSION = 2
+
 
 class TaifexReportMiner:
     """
@@ -73,6 +110,15 @@ class TaifexReportMiner:
         # Load configuration
         self.config = self._load_config(config_path)
 
+        # Connections are shared by every miner of the process
+        self.db = get_connection_manager(self.config.get("db"))
+        self.partitions = CandlePartitions(self.base_path)
+        self.rollups = RollupBuilder()
+        self.coverage = CoverageIndex(self.config.get("fut_rpt", {}).get("symbol", ["TX"]))
+        self.calendar = TradingCalendar(
+            self.base_path / self.config.get("calendar", {}).get("holidays", "db/taifex_holidays.csv")
+        )
+
         # Set date and item
         today_str = datetime.today().replace(minute=0, hour=0, second=0, microsecond=0).strftime("%Y_%m_%d")
         self.date = date if date else today_str
@@ -87,6 +133,38 @@ class TaifexReportMiner:
         # Initialize downloader
         self.downloader = ReportDownloader(self.report_info)
 
+        # Initialize candle builders; options reports count one side of each trade
+        self.candle_builder = CandleBuilder()
+        self.option_candle_builder = CandleBuilder(volume_divisor=1)
+        self.options_analytics = OptionsAnalytics()
+
+        # Initialize the bar builders configured for this report type
+        self.bar_builders: List[BarBuilder] = [parse_bar_spec(spec) for spec in self.report_info.get("bars", [])]
+        self.volume_profiler = VolumeProfiler(value_area=float(self.report_info.get("value_area", 0.7)))
+        self.parser = ReportParser(self.candle_builder, self.bar_builders, self.volume_profiler)
+
+        # Parsed ticks are kept as memory-mappable column files when a tick store directory is configured
+        tick_store = self.report_info.get("tick_store")
+        self.tick_store: Optional[TickStore] = TickStore(self.base_path / tick_store) if tick_store else None
+
+        # Rows written per symbol by the last successful store, recorded in the ingest ledger
+        self.row_counts: Dict[str, int] = {}
+
+        # Ledger entry of the report being ingested, written by the transaction that stores its rows
+        self.ledger_entry: Optional[Tuple[IngestLedger, Path, str, int]] = None
+
+        # Monthly archive the report is read from once its daily ZIP has been pruned (see _locate_report())
+        self.archive_path: Optional[Path] = None
+
+        # Connection of a multi-day write batch, committed by its owner (see main())
+        self.batch_conn: Optional[sqlite3.Connection] = None
+
+        # Tick store writes of the batch, run by its owner once the batch is committed
+        self.pending_ticks: Optional[List[Callable[[], None]]] = None
+
+        # Worker processes of the run that build candles, bars and profiles from shared memory (see main())
+        self.pool: Optional[ProcessPoolExecutor] = None
+
         LOGGER.info(f"Mining initialized: date='{self.date}', item='{self.item}'")
 
     def _load_config(self, config_path: str = None) -> Dict[str, Any]:
@@ -221,316 +299,442 @@ class TaifexReportMiner:
             LOGGER.error(f"Failed to upload to Google Drive: {e}")
             return False
 
-    def parse_report_to_db(self, symbol: str = "TX") -> bool:
+    def parse_report_to_db(self, symbols: Optional[List[str]] = None) -> bool:
         """
-        Parse report data and store in database
+        Parse report data for all symbols in one pass and store in database
 
         Args:
-            symbol: Futures symbol to parse (e.g., 'TX', 'MTX')
+            symbols: Symbols to parse (e.g., ['TX', 'MTX'] or ['TXO']). Defaults to configured symbols.
 
         Returns:
             True if parsing was successful
         """
-        # Validate symbol
-        if self.item == "fut_rpt" and symbol not in self.report_info.get("symbol", ["TX"]):
-            LOGGER.warning(f"Symbol '{symbol}' not in configured symbols. Using default 'TX'")
-            symbol = "TX"
+        # Validate symbols
+        configured = self.report_info.get("symbol", ["TX"])
+        if symbols is None:
+            symbols = configured
+        unknown = [symbol for symbol in symbols if symbol not in configured]
+        if unknown:
+            LOGGER.warning(f"Symbols {unknown} not in configured symbols, skipping them")
+        symbols = [symbol for symbol in symbols if symbol in configured]
+        if not symbols:
+            LOGGER.warning("No configured symbols to parse")
+            return False
 
-        # Paths to ZIP and extracted report
-        zip_path = Path(self.report_info["rptdirpath"]) / self.report_info["filename"]
-        rpt_path = Path(self.report_info["rptdirpath"]) / "tmp" / self.report_info["filename"].replace(".zip", ".rpt")
+        # Path to ZIP report, read directly without extracting
+        zip_path = self._locate_report()
+        if zip_path is None:
+            return False
 
-        # Ensure the report file exists, extract if not
-        if not rpt_path.exists() or args.recover:
-            if not zip_path.exists():
-                LOGGER.info(f"ZIP file not found locally: {zip_path}")
-                try:
-                    gdevice.GetContentFile(self.report_info["filename"], str(zip_path))
-                except Exception as e:
-                    LOGGER.error(f"Failed to retrieve file from Google Drive: {e}")
-                    return False
-            self.extract_report(zip_path)
+        # Skip reports already ingested unchanged by this parser version; a --fill-gaps date lacks candles whatever
+        # the ledger says, so its report is parsed again
+        args = globals().get("args", None)
+        force = getattr(args, "force", False) or getattr(args, "fill_gaps", False)
+        ledger = IngestLedger(self.base_path / DEFAULT_DB_NAME)
+        if self.archive_path is not None:
+            with ReportArchive(self.archive_path) as archive:
+                size, digest = archive.source_digest(zip_path.name)
+        else:
+            size, digest = zip_path.stat().st_size, ledger.file_digest(zip_path)
+        if not force and ledger.is_current(zip_path, digest, PARSER_VERSION, symbols, size):
+            LOGGER.info(f"{zip_path.name} already ingested with parser v{PARSER_VERSION}, skipping (use --force)")
+            return True
 
         # Process the report file
-        return self._process_report_data(rpt_path, symbol)
+        self.row_counts = {}
+        self.ledger_entry = (ledger, zip_path, digest, size)
+        try:
+            if self.item == "opt_rpt":
+                return self._process_options_data(zip_path, symbols)
+            return self._process_report_data(zip_path, symbols)
+        finally:
+            self.ledger_entry = None
 
-    def _process_report_data(self, rpt_path: Path, symbol: str) -> bool:
+    def _locate_report(self) -> Optional[Path]:
         """
-        Process the report data and store in database
+        Find the report ZIP of the date, falling back to its monthly archive and then to Google Drive
 
-        Args:
-            rpt_path: Path to the report file
-            symbol: Symbol to process
+        A report read from an archive sets self.archive_path; the returned ZIP path then does not exist.
 
         Returns:
-            True if processing was successful
+            Path to the ZIP file, or None if it cannot be retrieved
         """
-        # Extract date from the report file name
-        proc_date = datetime.strptime(self.date, "%Y_%m_%d")
+        zip_path = Path(self.report_info["rptdirpath"]) / self.report_info["filename"]
+        self.archive_path = None
+
+        # Reports pruned after archive_rpt.py packed them are read from the archive
+        if not zip_path.exists():
+            archive_dir = self.base_path / self.report_info.get("archive", f"{self.item}_archive")
+            self.archive_path = ReportArchive.locate(archive_dir, zip_path.name)
+            if self.archive_path is not None:
+                LOGGER.info(f"Reading {zip_path.name} from {self.archive_path}")
+                return zip_path
+
+        # Ensure the report file exists, fetch from Google Drive if not
+        if not zip_path.exists():
+            LOGGER.info(f"ZIP file not found locally: {zip_path}")
+            try:
+                gdevice.GetContentFile(self.report_info["filename"], str(zip_path))
+            except Exception as e:
+                LOGGER.error(f"Failed to retrieve file from Google Drive: {e}")
+                return None
+        return zip_path
 
-        # Extract data using grep for the specified symbol and month
-        current_month = proc_date.strftime("%Y%m")
-        grep_cmd = f"cat {rpt_path} | grep ,{symbol} | grep -P '{current_month}\\s+'"
-        LOGGER.debug(f"Running grep command: {grep_cmd}")
+    def backfill_ticks(self, overwrite: bool = False) -> int:
+        """
+        Write the tick store of the report date from its report, leaving the database untouched
 
-        tick_result = subprocess.run(grep_cmd, shell=True, capture_output=True, text=True).stdout
+        Args:
+            overwrite: Replace days already in the tick store
 
-        # If no data for current month, try next month (for end-of-month reports)
-        if not tick_result.strip():
-            next_month = (proc_date + timedelta(weeks=4)).strftime("%Y%m")
-            grep_cmd = f"cat {rpt_path} | grep ,{symbol} | grep -P '{next_month}\\s+'"
-            LOGGER.debug(f"No data for current month, trying next month: {grep_cmd}")
-            tick_result = subprocess.run(grep_cmd, shell=True, capture_output=True, text=True).stdout
+        Returns:
+            Number of symbols written
+        """
+        if self.tick_store is None:
+            LOGGER.warning(f"No tick store configured for {self.item}")
+            return 0
+
+        symbols = self.report_info.get("symbol", ["TX"])
+        if not overwrite:
+            symbols = [symbol for symbol in symbols if not self.tick_store.has_day(symbol, self.date)]
+        if not symbols:
+            LOGGER.info(f"Ticks of {self.date} already stored, skipping (use --force)")
+            return 0
+
+        zip_path = self._locate_report()
+        if zip_path is None:
+            return 0
+        ticks_by_symbol = self.parser.read_expiry_ticks(zip_path, symbols, self.archive_path)
+        self._store_ticks(ticks_by_symbol)
+        return len(ticks_by_symbol)
+
+    def _process_report_data(self, zip_path: Path, symbols: List[str]) -> bool:
+        """
+        Process the report data for several symbols and store in database
 
-        # Clean up the data
-        tick_result = tick_result.strip().replace(",", " ").replace("*", " ")
-        if not tick_result:
-            LOGGER.warning(f"No data found for symbol {symbol} in {rpt_path}")
-            return False
+        Args:
+            zip_path: Path to the report ZIP file
+            symbols: Symbols to process
 
-        # Convert to numpy array for processing
-        raw_data = tick_result.split()
-        num_ticks = len(tick_result.splitlines())
-        if num_ticks == 0:
-            LOGGER.warning(f"No ticks found in the data")
+        Returns:
+            True if processing was successful
+        """
+        # Build candles for every expiry of every symbol in a single pass over the report
+        chunk_size = self._get_chunk_size()
+        if chunk_size and (self.bar_builders or self.tick_store is not None):
+            LOGGER.warning(
+                "Bars, volume profiles and the tick store are only built when the report is parsed in one piece"
+            )
+        parsed = self.parser.parse(zip_path, symbols, self.archive_path, chunk_size, self.pool)
+        if not parsed.candles:
             return False
 
-        # Determine the number of columns in each tick
-        tick_cols = len(tick_result.splitlines()[0].split())
-        LOGGER.info(f"Found {num_ticks} ticks with {tick_cols} columns each")
+        # Store the processed data of all symbols in one transaction
+        stored = self._store_candles_in_db(parsed.candles, parsed.expiry_candles, parsed.bars, parsed.profiles)
+        if stored and self.tick_store is not None:
+            if self.pending_ticks is not None:
+                # The batch may still roll back, so its ticks wait for the commit
+                self.pending_ticks.append(partial(self._store_ticks, parsed.ticks))
+            else:
+                self._store_ticks(parsed.ticks)
+        return stored
 
-        # Validate the data shape
-        if len(raw_data) / tick_cols != num_ticks:
-            LOGGER.error(f"Data shape mismatch: {len(raw_data)} elements, {tick_cols} columns, {num_ticks} rows")
-            return False
+    def _store_ticks(self, ticks_by_symbol: Dict[str, Dict[str, np.ndarray]]):
+        """
+        Keep the parsed ticks of the report in the tick store; failures do not fail the ingest
 
-        # Reshape the data into a 2D array
-        tick_array = np.array(raw_data).reshape(num_ticks, -1)
+        Args:
+            ticks_by_symbol: Mapping of symbol to expiry to tick array with columns (date, time, price, volume)
+        """
+        for symbol, ticks_by_expiry in ticks_by_symbol.items():
+            try:
+                self.tick_store.write(symbol, self.date, ticks_by_expiry)
+            except (OSError, ValueError) as e:
+                LOGGER.error(f"Failed to store ticks of {symbol} for {self.date}: {e}")
 
-        # Process the ticks into one-minute candles
-        candles = self._process_ticks_to_candles(tick_array)
-        if not candles:
-            LOGGER.warning(f"No candles generated from the tick data")
-            return False
+    def _get_chunk_size(self) -> int:
+        """
+        Get the tick block size for chunked parsing from arguments or configuration
 
-        # Store the processed data in the database
-        return self._store_candles_in_db(candles, symbol)
+        Returns:
+            Number of ticks per block, 0 to parse the report in one piece
+        """
+        args = globals().get("args", None)
+        if args is not None and getattr(args, "chunk_size", None) is not None:
+            return max(0, args.chunk_size)
+        return max(0, int(self.report_info.get("chunk_size", 0)))
 
-    def _process_ticks_to_candles(self, tick_array: np.ndarray) -> List[Tuple]:
+    def _process_options_data(self, zip_path: Path, symbols: List[str]) -> bool:
         """
-        Convert tick data into one-minute OHLCV candles.
+        Process options report data into per-series one-minute candles and store in database
 
         Args:
-            tick_array (np.ndarray): Array of tick data.
+            zip_path: Path to the options report ZIP file
+            symbols: Option symbols to process (e.g., ['TXO'])
 
         Returns:
-            List[Tuple]: List of candle data tuples (Date, Time, Open, High, Low, Close, Volume).
+            True if processing was successful
         """
-        if tick_array.size == 0:
-            LOGGER.warning("Tick array is empty. No candles to process.")
-            return []
-
-        # Determine the starting time based on the first tick
-        start_time = self._get_start_time(tick_array[0])
-
-        candles = []
-        temp_ticks = []
-        total_ticks = len(tick_array)
-
-        # Progress bar setup
-        progress_step = max(1, total_ticks // 32)
+        reader = OptionsRptReader(zip_path, self.archive_path)
+        columns_by_symbol = reader.read_columns(symbols)
+
+        trade_date = datetime.strptime(self.date, "%Y_%m_%d").strftime("%Y/%m/%d")
+        candles_by_symbol = {}
+        stats_by_symbol = {}
+        for symbol, columns in columns_by_symbol.items():
+            if len(columns["date"]) == 0:
+                LOGGER.warning(f"No data found for symbol {symbol} in {zip_path}")
+                continue
+
+            # Integer series key per (expiry, strike, call/put)
+            strikes, strike_index = np.unique(columns["strike"], return_inverse=True)
+            series_ids = (columns["expiry"] * len(strikes) + strike_index.reshape(-1)) * 2 + columns["cp"]
+            LOGGER.info(f"Found {len(series_ids)} trades for {symbol} in {len(np.unique(series_ids))} series")
+
+            candles = self.option_candle_builder.build_series(
+                series_ids, columns["date"], columns["time"], columns["price"], columns["volume"]
+            )
 
-        for i, tick in enumerate(tick_array, 1):
-            tick_time = self._parse_tick_time(tick)
+            # Decode series ids back to (Expiry, Strike, CP)
+            cp_names = {code: name for name, code in OptionsRptReader.CP_CODES.items()}
+            series_info = {}
+            for series_id in {candle[0] for candle in candles}:
+                series_info[series_id] = (
+                    reader.expiries[series_id // 2 // len(strikes)],
+                    float(strikes[series_id // 2 % len(strikes)]),
+                    cp_names[series_id % 2],
+                )
+            candles_by_symbol[symbol] = [candle[1:3] + series_info[candle[0]] + candle[3:] for candle in candles]
+
+            # Daily strike-level analytics from the same columns
+            stats_by_symbol[symbol] = self.options_analytics.compute(trade_date, columns, reader.expiries)
+
+        if not candles_by_symbol:
+            return False
 
-            # Check if the tick belongs to the current minute or special times
-            if self._is_tick_in_current_minute(tick_time, start_time):
-                temp_ticks.append(tuple(tick))
-                if i < total_ticks:
-                    continue
+        return self._store_option_candles_in_db(candles_by_symbol, stats_by_symbol)
 
-            # Process the accumulated ticks into a candle
-            if temp_ticks:
-                candle = self._generate_candle(temp_ticks, start_time)
-                candles.append(candle)
-                temp_ticks = []
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Cursor]:
+        """
+        Open an atomic write scope on the candle database
 
-            # Adjust start_time to the next minute
-            start_time = self._adjust_start_time(tick, start_time)
+        Standalone writes get their own connection and transaction. Inside a
+        multi-day batch the scope is a savepoint of the batch connection, so a
+        failing day is rolled back without losing the other days of the batch.
 
-            # Update progress bar
-            self._update_progress_bar(i, total_ticks, progress_step)
+        Returns:
+            Iterator yielding the database cursor
+        """
+        if self.batch_conn is not None:
+            cursor = self.batch_conn.cursor()
+            cursor.execute("SAVEPOINT store;")
+            try:
+                yield cursor
+            except Exception:
+                cursor.execute("ROLLBACK TO store;")
+                cursor.execute("RELEASE store;")
+                raise
+            cursor.execute("RELEASE store;")
+            return
 
-        LOGGER.info(f"Generated {len(candles)} candles from {total_ticks} ticks.")
-        return candles
+        db_path = self.base_path / DEFAULT_DB_NAME
+        LOGGER.debug(f"Connecting to database: {db_path}")
+        with self.db.connect(db_path) as conn:
+            yield conn.cursor()
 
-    def _get_start_time(self, first_tick: np.ndarray) -> datetime:
+    def _store_candles_in_db(
+        self,
+        candles_by_symbol: Dict[str, List[Tuple]],
+        expiry_candles_by_symbol: Optional[Dict[str, Dict[str, List[Tuple]]]] = None,
+        bars_by_symbol: Optional[Dict[str, Dict[str, List[Tuple]]]] = None,
+        profiles_by_symbol: Optional[Dict[str, List[SessionProfile]]] = None,
+    ) -> bool:
         """
-        Determine the starting time based on the first tick.
+        Store candle data of several symbols in the database within one transaction
 
         Args:
-            first_tick (np.ndarray): The first tick in the array.
+            candles_by_symbol: Mapping of symbol to list of front month candle data tuples
+            expiry_candles_by_symbol: Mapping of symbol to expiry to list of candle data tuples
+            bars_by_symbol: Mapping of symbol to bar type name to list of bar data tuples
+            profiles_by_symbol: Mapping of symbol to list of session volume profiles
 
         Returns:
-            datetime: The starting time for candle generation.
+            True if storage was successful
         """
-        first_tick_time = datetime.strptime(first_tick[3], "%H%M%S")
-        if first_tick_time.hour == 15:
-            # Night session starts at 15:00
-            return datetime.strptime(f"{first_tick[0]}150000", "%Y%m%d%H%M%S") + timedelta(minutes=1)
-        else:
-            # Day session starts at 08:45
-            return datetime.strptime(f"{first_tick[0]}084500", "%Y%m%d%H%M%S") + timedelta(minutes=1)
+        candles_by_symbol = {symbol: candles for symbol, candles in candles_by_symbol.items() if candles}
+        if not candles_by_symbol:
+            LOGGER.warning("No candles to store in database")
+            return False
+
+        partitioned = self.partitions.enabled
+        try:
+            with self._transaction() as cursor:
+                if partitioned:
+                    # Nothing is written yet, so the year partitions can still be attached
+                    years = {int(candle[0][:4]) for candles in candles_by_symbol.values() for candle in candles}
+                    self.partitions.prepare(cursor.connection, years)
+
+                for symbol, candles in candles_by_symbol.items():
+                    # Upsert on the unique (Date, Time) key, so re-ingesting never duplicates a minute
+                    if partitioned:
+                        self.partitions.store(cursor, symbol, candles)
+                    else:
+                        removed = upsert_candles(cursor, symbol, candles)
+                        if removed:
+                            LOGGER.warning(f"Removed {removed} duplicated candles from tw{symbol}")
+                    self._update_rollups(cursor, symbol, candles, partitioned)
+                    self.coverage.record_candles(cursor, self.date.replace("_", "/"), symbol, candles)
+
+                for symbol, expiry_candles in (expiry_candles_by_symbol or {}).items():
+                    self._store_expiry_candles(cursor, symbol, expiry_candles)
+
+                for symbol, bars in (bars_by_symbol or {}).items():
+                    self._store_bars(cursor, symbol, bars)
+
+                for symbol, profiles in (profiles_by_symbol or {}).items():
+                    self.volume_profiler.store(cursor, symbol, profiles)
+
+                for symbol, candles in candles_by_symbol.items():
+                    self.row_counts[symbol] = len(candles)
+                self._record_ingest(cursor)
+
+            for symbol, candles in candles_by_symbol.items():
+                LOGGER.info(f"Successfully stored {len(candles)} candles in database for [{symbol}]")
+            return True
+
+        except (sqlite3.Error, PermissionError) as e:
+            LOGGER.error(f"Database error: {e}")
+            return False
 
-    def _parse_tick_time(self, tick: np.ndarray) -> datetime:
+    def _record_ingest(self, cursor: sqlite3.Cursor):
         """
-        Parse the tick time from the tick data.
+        Record the report being ingested in the ledger, in the transaction that stored its rows
 
         Args:
-            tick (np.ndarray): A single tick.
-
-        Returns:
-            datetime: The parsed tick time.
+            cursor: Database cursor of the store transaction
         """
-        return datetime.strptime(f"{tick[0]}{tick[3]}", "%Y%m%d%H%M%S")
+        if self.ledger_entry is not None:
+            ledger, zip_path, digest, size = self.ledger_entry
+            ledger.record(cursor, zip_path, digest, PARSER_VERSION, self.row_counts, size)
 
-    def _is_tick_in_current_minute(self, tick_time: datetime, start_time: datetime) -> bool:
+    def _update_rollups(self, cursor: sqlite3.Cursor, symbol: str, candles: List[Tuple], partitioned: bool):
         """
-        Check if the tick belongs to the current minute or special times.
+        Rebuild the rollup buckets of the day sessions touched by a store
 
         Args:
-            tick_time (datetime): The time of the tick.
-            start_time (datetime): The current candle's start time.
-
-        Returns:
-            bool: True if the tick belongs to the current minute, False otherwise.
+            cursor: Database cursor of the store transaction
+            symbol: Symbol the candles belong to
+            candles: Candle tuples just written
+            partitioned: Whether the candles went to year partitions
         """
-        return start_time - timedelta(minutes=1) <= tick_time < start_time or tick_time.time() in [
-            datetime.strptime("05:00:00", "%H:%M:%S").time(),
-            datetime.strptime("13:45:00", "%H:%M:%S").time(),
-        ]
-
-    def _generate_candle(self, ticks: List[Tuple], start_time: datetime) -> Tuple:
+        # Night session minutes are never exported, so they leave the rollups unchanged
+        dates = sorted({candle[0] for candle in candles if SESSION_START < candle[1] <= SESSION_END})
+        if not partitioned:
+            self.rollups.update(cursor, symbol, dates)
+            return
+        for year in sorted({int(date[:4]) for date in dates}):
+            year_dates = [date for date in dates if int(date[:4]) == year]
+            self.rollups.update(cursor, symbol, year_dates, self.partitions.schema(year))
+
+    def _store_option_candles_in_db(
+        self,
+        candles_by_symbol: Dict[str, List[Tuple]],
+        stats_by_symbol: Optional[Dict[str, OptionsDailyStats]] = None,
+    ) -> bool:
         """
-        Generate a single OHLCV candle from tick data.
+        Store option candles and daily analytics of several symbols in the database within one transaction
 
         Args:
-            ticks (List[Tuple]): List of ticks for the current minute.
-            start_time (datetime): The start time of the candle.
+            candles_by_symbol: Mapping of symbol to list of option candle tuples
+                (Date, Time, Expiry, Strike, CP, Open, High, Low, Close, Volume)
+            stats_by_symbol: Mapping of symbol to daily options analytics
 
         Returns:
-            Tuple: A tuple representing the candle (Date, Time, Open, High, Low, Close, Volume).
-        """
-        temp_array = np.array(ticks)
-        date_str = start_time.strftime("%Y/%m/%d")
-        time_str = start_time.strftime("%H:%M:%S")
-        open_price = int(temp_array[0, 4])
-        high_price = int(temp_array[:, 4].astype("int").max())
-        low_price = int(temp_array[:, 4].astype("int").min())
-        close_price = int(temp_array[-1, 4])
-        volume = int(temp_array[:, 5].astype("int").sum() // 2)  # Divide by 2 for buy/sell records
-
-        LOGGER.debug(
-            f"Generated candle: {date_str}, {time_str}, {open_price}, {high_price}, {low_price}, {close_price}, {volume}"
-        )
-        return (
-            date_str,
-            time_str,
-            open_price,
-            high_price,
-            low_price,
-            close_price,
-            volume,
-        )
+            True if storage was successful
+        """
+        try:
+            with self._transaction() as cursor:
+                for symbol, candles in candles_by_symbol.items():
+                    execute_statements(cursor, OPTION_TABLE_SQL.format(symbol=symbol))
+
+                    # Replace every minute of the report for this symbol
+                    minutes = sorted({candle[:2] for candle in candles})
+                    cursor.executemany(f"DELETE FROM tw{symbol} WHERE Date=? AND Time=?;", minutes)
+                    cursor.executemany(f"INSERT INTO tw{symbol} VALUES (?,?,?,?,?,?,?,?,?,?);", candles)
+                    LOGGER.info(f"Successfully stored {len(candles)} option candles in database for [{symbol}]")
+                    self.row_counts[symbol] = len(candles)
+
+                for symbol, stats in (stats_by_symbol or {}).items():
+                    self.options_analytics.store(cursor, symbol, stats)
+                self._record_ingest(cursor)
+            return True
+
+        except sqlite3.Error as e:
+            LOGGER.error(f"Database error: {e}")
+            return False
 
-    def _adjust_start_time(self, tick: np.ndarray, start_time: datetime) -> datetime:
+    def _store_expiry_candles(self, cursor: sqlite3.Cursor, symbol: str, expiry_candles: Dict[str, List[Tuple]]):
         """
-        Adjust the start time to the next minute.
+        Replace candles of every expiry in the per-expiry table
 
         Args:
-            tick (np.ndarray): The current tick.
-            start_time (datetime): The current start time.
-
-        Returns:
-            datetime: The adjusted start time.
+            cursor: Database cursor
+            symbol: Symbol to store data for
+            expiry_candles: Mapping of expiry to list of candle data tuples
         """
-        return datetime.strptime(f"{tick[0]}{tick[3][:4]}00", "%Y%m%d%H%M%S") + timedelta(minutes=1)
+        removed = ensure_expiry_table(cursor, symbol)
+        if removed:
+            LOGGER.warning(f"Removed {removed} duplicated candles from tw{symbol}_exp")
+
+        for expiry, candles in expiry_candles.items():
+            # Upsert on the unique (Date, Time, Expiry) key, one index search per candle
+            rows = [(candle[0], candle[1], expiry) + tuple(candle[2:]) for candle in candles]
+            cursor.executemany(EXPIRY_UPSERT_SQL.format(symbol=symbol), rows)
+            LOGGER.info(f"Stored {len(rows)} candles in database for [{symbol}] expiry {expiry}")
 
-    def _update_progress_bar(self, current_tick: int, total_ticks: int, progress_step: int):
+    def _store_bars(self, cursor: sqlite3.Cursor, symbol: str, bars: Dict[str, List[Tuple]]):
         """
-        Update the progress bar in the console.
+        Replace bars of every bar type over the time range of the report
 
         Args:
-            current_tick (int): The current tick index.
-            total_ticks (int): The total number of ticks.
-            progress_step (int): The step size for updating the progress bar.
+            cursor: Database cursor
+            symbol: Symbol to store data for
+            bars: Mapping of bar type name to list of bar data tuples in time order
         """
-        progress = (current_tick / total_ticks) * 100
-        progress_bar = "=" * (current_tick // progress_step) + ">" + " " * (32 - (current_tick // progress_step))
-        sys.stdout.write(f"\r[{progress_bar}][{progress:.1f}%]")
-        sys.stdout.flush()
+        for name, rows in bars.items():
+            if not rows:
+                continue
+            execute_statements(cursor, BAR_TABLE_SQL.format(symbol=symbol, name=name))
+
+            # Bar labels are irregular, so replace the whole span covered by the report; row values use the index
+            cursor.execute(
+                f"DELETE FROM tw{symbol}_{name} WHERE (Date, Time) >= (?, ?) AND (Date, Time) <= (?, ?);",
+                (rows[0][0], rows[0][1], rows[-1][0], rows[-1][1]),
+            )
+            cursor.executemany(f"INSERT INTO tw{symbol}_{name} VALUES (?,?,?,?,?,?,?);", rows)
+            LOGGER.info(f"Stored {len(rows)} {name} bars in database for [{symbol}]")
 
-    def _store_candles_in_db(self, candles: List[Tuple], symbol: str) -> bool:
+    def compute_option_greeks(self, start_date: datetime, end_date: datetime, workers: int = 1) -> int:
         """
-        Store candle data in the database
+        Compute per-minute implied volatility and greeks of option candles for a date range
 
         Args:
-            candles: List of candle data tuples
-            symbol: Symbol to store data for
+            start_date: Start date
+            end_date: End date
+            workers: Number of worker processes to fan out days
 
         Returns:
-            True if storage was successful
+            Number of rows stored
         """
-        if not candles:
-            LOGGER.warning("No candles to store in database")
-            return False
+        dates = [day.strftime("%Y/%m/%d") for day in self.calendar.trading_days(start_date, end_date)]
 
-        # Connect to database
-        db_path = self.base_path / DEFAULT_DB_NAME
-        LOGGER.debug(f"Connecting to database: {db_path}")
-
-        try:
-            conn = sqlite3.connect(str(db_path))
-            cursor = conn.cursor()
-
-            # Use TX as default symbol if not in configured symbols
-            if symbol not in self.report_info.get("symbol", ["TX"]):
-                LOGGER.warning(f"Symbol '{symbol}' not in configuration, using 'TX'")
-                symbol = "TX"
-
-            # Delete existing data for the same date
-            # This ensures we don't have duplicate data
-            delete_query = f"DELETE FROM tw{symbol} WHERE Date=? AND Time<=?;"
-            cursor.execute(delete_query, (candles[-1][0], candles[-1][1]))
-
-            # Special handling for session transitions
-            if candles[0][1] == "15:01:00":
-                # Handle night session data
-                delete_query1 = f"DELETE FROM tw{symbol} WHERE Date=? AND Time>=?;"
-                delete_query2 = f"DELETE FROM tw{symbol} WHERE Date=? AND Time<=?;"
-                cursor.execute(delete_query1, (candles[0][0], candles[0][1]))
-                if len(candles) > 839:  # Specific index from original code
-                    cursor.execute(delete_query2, (candles[839][0], candles[839][1]))
-
-            # Commit the deletes
-            conn.commit()
-
-            # Insert new data
-            insert_query = f"INSERT INTO tw{symbol} VALUES (?,?,?,?,?,?,?);"
-            for candle in candles:
-                LOGGER.debug(f"Inserting candle: {candle}")
-                cursor.execute(insert_query, candle)
-
-            # Commit the inserts
-            conn.commit()
-            LOGGER.info(f"Successfully stored {len(candles)} candles in database for [{symbol}]")
-
-        except sqlite3.Error as e:
-            LOGGER.error(f"Database error: {e}")
-            return False
-        finally:
-            if "conn" in locals():
-                conn.close()
+        rate = float(self.config.get("opt_rpt", {}).get("risk_free_rate", 0.015))
+        total = 0
+        for symbol in self.config.get("opt_rpt", {}).get("symbol", ["TXO"]):
+            engine = OptionGreeksEngine(self.base_path / DEFAULT_DB_NAME, symbol=symbol, rate=rate)
+            total += engine.run(dates, workers=workers)
+        return total
 
     def export_data_to_txt(
         self,
@@ -538,36 +742,46 @@ class TaifexReportMiner:
         interval: int = None,
         start_date: datetime = None,
         end_date: datetime = None,
+        bar: str = None,
     ) -> str:
         """
         Export data from database to text file
 
         Args:
             symbol: Symbol to export (e.g., 'TX', 'MTX')
-            interval: Time interval in minutes (1, 5, 15, 30, 60, 300)
+            interval: Time interval in minutes (1, 5, 15, 30, 60, 300) or calendar period ('day', 'week', 'month')
             start_date: Start date
             end_date: End date
+            bar: Bar type to export instead of minute candles (e.g., 'tick:500', 'second:30')
 
         Returns:
             Path to the exported file
         """
         # Get global args if available
         args = globals().get("args", None)
+        if bar is None and args is not None:
+            bar = getattr(args, "bar", None)
+        bar_builder = parse_bar_spec(bar) if bar else None
 
-        # Validate arguments
+        # Validate arguments; bars are exported as stored and need no interval
         if symbol is None or interval is None:
-            if args is None or not hasattr(args, "export") or args.export is None or len(args.export) != 2:
+            if args is None or not hasattr(args, "export") or args.export is None:
+                LOGGER.error("Invalid export arguments")
+                raise ValueError("Export requires symbol and interval")
+            if len(args.export) != 2 and not (bar_builder and len(args.export) == 1):
                 LOGGER.error("Invalid export arguments")
                 raise ValueError("Export requires symbol and interval")
             symbol = args.export[0]
-            interval = int(args.export[1])
+            interval = args.export[1] if len(args.export) == 2 else 1
+            interval = interval if interval in ROLLUP_PERIODS else int(interval)
 
         # Validate symbol
         symbol = "TX" if symbol not in self.report_info.get("symbol", ["TX"]) else symbol
 
         # Validate interval
         valid_intervals = [1, 5, 15, 30, 60, 300]
-        interval = 300 if interval not in valid_intervals else interval
+        interval = 300 if interval not in valid_intervals and interval not in ROLLUP_PERIODS else interval
+        period = interval if interval in ROLLUP_PERIODS else None
 
         # Use date range from arguments if not provided
         if start_date is None or end_date is None:
@@ -582,13 +796,13 @@ class TaifexReportMiner:
                 end_date = date_range[1]
 
         LOGGER.info(
-            f"Exporting data: symbol={symbol}, interval={interval}, "
+            f"Exporting data: symbol={symbol}, interval={bar_builder.name if bar_builder else interval}, "
             f"date_range={start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}"
         )
 
-        # Connect to database
+        # Exports only read, so they never wait on a running ingest
         db_path = self.base_path / DEFAULT_DB_NAME
-        conn = sqlite3.connect(str(db_path))
+        conn = self.db.connect(db_path, readonly=True)
         cursor = conn.cursor()
 
         # Format date string for output file
@@ -599,36 +813,53 @@ class TaifexReportMiner:
         )
 
         # Output file path
-        output_path = f"{symbol}_{date_string}"
+        if bar_builder or period:
+            output_path = f"{symbol}_{bar_builder.name if bar_builder else period}_{date_string}"
+        else:
+            output_path = f"{symbol}_{date_string}"
 
         # Write header to file
         header = "Date,Time,Open,High,Low,Close,Volume"
         with open(output_path, "w") as f:
             f.write(f"{header}\n")
 
-        # Process each day
-        current_date = start_date
-        while current_date <= end_date:
-            formatted_date = current_date.strftime("%Y/%m/%d")
-            LOGGER.debug(f"Processing date: {formatted_date}")
-
-            # Get data for the day
-            day_data = self._get_data_for_day(cursor, symbol, interval, formatted_date)
-
-            # Write data to file if not empty
-            if day_data.strip():
-                LOGGER.info(f"Writing data for {formatted_date}")
-                with open(output_path, "a") as f:
-                    f.write(day_data)
-
-            # Move to next day
-            current_date += timedelta(days=1)
-
-        conn.close()
+        # Calendar bars come from their rollup table in one query
+        if period:
+            rows = self.rollups.read_periods(
+                cursor, symbol, period, start_date.strftime("%Y/%m/%d"), end_date.strftime("%Y/%m/%d")
+            )
+            with open(output_path, "a") as f:
+                f.writelines(f"{','.join(str(x) for x in row)}\n" for row in rows)
+            LOGGER.info(f"Data exported to: {output_path} with {len(rows)} {period} bars")
+            cursor.close()
+            return output_path
+
+        # Process each trading day, with only the partitions of a batch of years attached at a time;
+        # closed days are known without querying them
+        for first, last in self.partitions.attach_batches(conn, start_date, end_date):
+            self.calendar.seed(cursor, symbol, first, last)
+            for current_date in self.calendar.trading_days(first, last):
+                formatted_date = current_date.strftime("%Y/%m/%d")
+                LOGGER.debug(f"Processing date: {formatted_date}")
+
+                # Get data for the day
+                if bar_builder:
+                    day_data = self._get_bars_for_day(cursor, symbol, bar_builder.name, formatted_date)
+                else:
+                    day_data = self._get_data_for_day(cursor, symbol, interval, formatted_date)
+
+                # Write data to file if not empty
+                if day_data.strip():
+                    LOGGER.info(f"Writing data for {formatted_date}")
+                    with open(output_path, "a") as f:
+                        f.write(day_data)
+
+        cursor.close()
         LOGGER.info(f"Data exported to: {output_path}")
 
-        # Generate JSON data for the last 1.5 years
-        self._export_json_data(symbol, start_date)
+        # Generate JSON data for the last 1.5 years; the chart is built from minute candles only
+        if bar_builder is None:
+            self._export_json_data(symbol, start_date)
 
         return output_path
 
@@ -645,49 +876,94 @@ class TaifexReportMiner:
         Returns:
             Formatted data as string
         """
-        result = ""
+        # Materialized rollups first; dates stored before they existed are aggregated from the 1-minute rows
+        rows = self.rollups.read(cursor, symbol, interval, date) if interval != 1 else None
+        if rows is None:
+            # Query for time range (8:45 AM to 1:45 PM), on the compact table when migrated
+            rows = select_candles(cursor, symbol, date, SESSION_START, SESSION_END).fetchall()
+            if interval != 1:
+                rows = rollup_rows(rows, interval)
+
+        result = "".join(f"{','.join(str(x) for x in row)}\n" for row in rows)
 
-        # SQL query for time range (8:45 AM to 1:45 PM)
-        query = f"""
-            SELECT * FROM tw{symbol}
-            WHERE Date='{date}'
-            AND Time>'08:45:00'
-            AND Time<='13:45:00'
-            ORDER BY Date, Time;
+        LOGGER.debug(f"Data for {date}: {len(result.splitlines())} rows")
+        return result
+
+    def _get_bars_for_day(self, cursor, symbol: str, name: str, date: str) -> str:
         """
-        cursor.execute(query)
+        Get day session bars of one bar type for a specific day
 
-        if interval == 1:
-            # Return raw 1-minute data
-            rows = cursor.fetchall()
-            for row in rows:
-                result += f"{','.join(str(x) for x in row)}\n"
-        else:
-            # Aggregate data by interval
-            # aggr_rows = []
-            while True:
-                rows = cursor.fetchmany(interval)
-                if not rows:
-                    break
-
-                # Convert to numpy array for easier processing
-                data_array = np.array(rows)
-
-                # Calculate OHLCV
-                date_val = data_array[-1, 0]  # Use last row's date
-                time_val = data_array[-1, 1]  # Use last row's time
-                open_val = int(data_array[0, 2])  # First row's open
-                high_val = int(np.max(data_array[:, 3].astype("int")))  # Max high
-                low_val = int(np.min(data_array[:, 4].astype("int")))  # Min low
-                close_val = int(data_array[-1, 5])  # Last row's close
-                volume_val = int(np.sum(data_array[:, 6].astype("int")))  # Sum of volume
-
-                # Format as CSV row
-                result += f"{date_val},{time_val},{open_val},{high_val},{low_val},{close_val},{volume_val}\n"
+        Args:
+            cursor: Database cursor
+            symbol: Symbol to get data for
+            name: Bar type name (e.g., 'tick500')
+            date: Date to get data for
 
-        LOGGER.debug(f"Data for {date}: {len(result.splitlines())} rows")
+        Returns:
+            Formatted data as string
+        """
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?;", (f"tw{symbol}_{name}",))
+        if cursor.fetchone() is None:
+            LOGGER.warning(f"No {name} bars stored for [{symbol}]")
+            return ""
+
+        # Insertion order keeps tick bars sharing the same label in sequence
+        cursor.execute(
+            f"""
+            SELECT * FROM tw{symbol}_{name}
+            WHERE Date=?
+            AND Time>'05:00:00'
+            AND Time<'15:00:00'
+            ORDER BY Date, Time, rowid;
+            """,
+            (date,),
+        )
+        result = "".join(f"{','.join(str(x) for x in row)}\n" for row in cursor.fetchall())
+
+        LOGGER.debug(f"Bars for {date}: {len(result.splitlines())} rows")
         return result
 
+    def _get_json_entries(
+        self, cursor: sqlite3.Cursor, conn: sqlite3.Connection, symbol: str, start_date: datetime, end_date: datetime
+    ) -> List[List[int]]:
+        """
+        Get the 300-minute day session bars of a date range as JSON chart entries
+
+        Args:
+            cursor: Database cursor
+            conn: Connection of the cursor, for attaching the partitions of the range
+            symbol: Symbol to export
+            start_date: First date
+            end_date: Last date
+
+        Returns:
+            Entries [timestamp (ms, 23:00 local time of the date), Open, High, Low, Close, Volume] in time order
+        """
+        # The whole range in one query on the materialized bars
+        rows = self.rollups.read_range(
+            cursor, symbol, 300, start_date.strftime("%Y/%m/%d"), end_date.strftime("%Y/%m/%d")
+        )
+
+        # Dates stored before the rollups existed are aggregated from their 1-minute candles, reading a batch of
+        # partition years at a time
+        rolled = {row[0] for row in rows}
+        for first, last in self.partitions.attach_batches(conn, start_date, end_date):
+            self.calendar.seed(cursor, symbol, first, last)
+            for day in sorted(self.calendar.open_days):
+                date = day.strftime("%Y/%m/%d")
+                if first.date() <= day <= last.date() and date not in rolled:
+                    rows.extend(
+                        rollup_rows(select_candles(cursor, symbol, date, SESSION_START, SESSION_END).fetchall(), 300)
+                    )
+        rows.sort(key=lambda row: (row[0], row[1]))
+
+        # Convert to timestamp (milliseconds)
+        timestamps = {
+            date: int(time.mktime((datetime.strptime(date, "%Y/%m/%d") + timedelta(hours=23)).timetuple()) * 1000)
+            for date in {row[0] for row in rows}
+        }
+        return [[timestamps[row[0]]] + [int(x) for x in row[2:]] for row in rows]
+
     def _export_json_data(self, symbol: str, start_date: str) -> str:
         """
         Export data to JSON format for charting
@@ -711,7 +987,7 @@ class TaifexReportMiner:
 
         # Connect to database
         db_path = self.base_path / DEFAULT_DB_NAME
-        conn = sqlite3.connect(str(db_path))
+        conn = self.db.connect(db_path, readonly=True)
         cursor = conn.cursor()
 
         try:
@@ -719,62 +995,22 @@ class TaifexReportMiner:
             if Path(json_path).exists():
                 with open(json_path, "r") as f:
                     data = json.load(f)
-
-                # current_date = datetime.strptime('2025/05/06', '%Y/%m/%d')  # Default start date
-                # current_date = end_date
-                current_date = start_date
-                # assert False, (current_date, type(current_date))
-                while current_date <= end_date:
-                    # Get only the last day's data to append
-                    day_data = self._get_data_for_day(cursor, symbol, 300, current_date.strftime("%Y/%m/%d"))
-
-                    # Process and append if not empty and not already in the file
-                    if day_data.strip():
-                        LOGGER.info(f"Processing JSON data for {current_date.strftime('%Y-%m-%d')} to append")
-                        for line in day_data.strip().splitlines():
-                            fields = line.split(",")
-                            date_str = fields[0]
-
-                            # Convert to timestamp (milliseconds)
-                            timestamp = int(
-                                time.mktime((datetime.strptime(date_str, "%Y/%m/%d") + timedelta(hours=23)).timetuple())
-                                * 1000
-                            )
-
-                            # Check if data for this timestamp already exists
-                            if not any(str(timestamp) in str(entry) for entry in data):
-                                # Add the entry
-                                data.append([timestamp] + [int(x) for x in fields[2:]])
-                    # Move to next day
-                    current_date += timedelta(days=1)
             else:
                 # Generate full data set
                 start_date = datetime.strptime("2020/01/01", "%Y/%m/%d")  # Default start date
-                current_date = start_date
-                while current_date <= end_date:
-                    day_data = self._get_data_for_day(cursor, symbol, 300, current_date.strftime("%Y/%m/%d"))
-
-                    # Process if not empty
-                    if day_data.strip():
-                        LOGGER.info(f"Processing JSON data for {current_date.strftime('%Y-%m-%d')}")
-                        for line in day_data.strip().splitlines():
-                            fields = line.split(",")
-                            date_str = fields[0]
-
-                            # Convert to timestamp (milliseconds)
-                            timestamp = int(
-                                time.mktime((datetime.strptime(date_str, "%Y/%m/%d") + timedelta(hours=23)).timetuple())
-                                * 1000
-                            )
-
-                            # Add the entry
-                            data.append([timestamp] + [int(x) for x in fields[2:]])
-
-                    # Move to next day
-                    current_date += timedelta(days=1)
-
-            with open(json_path, "w") as f:
+
+            # Entries already in the file are kept as they are
+            known = {entry[0] for entry in data}
+            entries = self._get_json_entries(cursor, conn, symbol, start_date, end_date)
+            added = [entry for entry in entries if entry[0] not in known]
+            data.extend(added)
+            LOGGER.info(f"Adding {len(added)} JSON entries from {start_date:%Y-%m-%d} on")
+
+            # Replace the file in one step so the web frontend never reads a partial JSON
+            staging = Path(f"{json_path}.tmp")
+            with open(staging, "w") as f:
                 json.dump(data, f, indent=4)
+            os.replace(staging, json_path)
 
             LOGGER.info(f"JSON data exported to: {json_path} with {len(data)} entries")
             return json_path
@@ -783,7 +1019,7 @@ class TaifexReportMiner:
             LOGGER.error(f"Error exporting JSON data: {e}")
             raise
         finally:
-            conn.close()
+            cursor.close()
 
 
 # Utility functions
@@ -810,7 +1046,13 @@ def parse_arguments():
         nargs="+",
         type=str,
         default=None,
-        help="Export data in format: SYMBOL INTERVAL (e.g., TX 300). Use with -d for date range.",
+        help="Export data in format: SYMBOL INTERVAL (e.g., TX 300, TX week). Use with -d for date range.",
+    )
+    parser.add_argument(
+        "--bar",
+        type=str,
+        default=None,
+        help="Export bars instead of minute candles: tick:N, volume:N or second:N (e.g., -e TX --bar tick:500)",
     )
     parser.add_argument(
         "--upload-recover",
@@ -819,6 +1061,50 @@ def parse_arguments():
         action="store_true",
         help="Force redownload and replace existing files in Google Drive",
     )
+    parser.add_argument(
+        "--force",
+        default=False,
+        action="store_true",
+        help="Re-parse reports even if the ingest ledger shows them unchanged; with --fill-gaps, retry closed dates",
+    )
+    parser.add_argument(
+        "--fill-gaps",
+        default=False,
+        action="store_true",
+        help="Re-parse only the dates of the -d range whose candles are missing from the coverage table; dates "
+        "without any day session afterwards are recorded as closed",
+    )
+    parser.add_argument(
+        "--backfill-ticks",
+        default=False,
+        action="store_true",
+        help="Write the tick store of the -d range from the reports without touching the database "
+        "(days already stored are skipped unless --force)",
+    )
+    parser.add_argument(
+        "--batch-days",
+        type=int,
+        default=1,
+        help="Commit ingested data every N days instead of once per report (for backfills)",
+    )
+    parser.add_argument(
+        "--greeks",
+        default=False,
+        action="store_true",
+        help="Compute implied volatility and greeks of option candles for the date range (use with -d)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes; ingest builds the series of each futures report in them, --greeks fans out days",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=None,
+        help="Parse reports in blocks of N ticks to bound memory (0 disables, default from config.json)",
+    )
     parser.add_argument(
         "--log-level",
         choices=["DEBUG", "INFO", "WARNING", "ERROR"],
@@ -851,30 +1137,132 @@ def main():
     # Init TaifexReportMiner()
 
     # Validate date range
-    start_date, end_date = TaifexReportMiner()._validate_date_range(args.date)
+    miner = TaifexReportMiner()
+    start_date, end_date = miner._validate_date_range(args.date)
     LOGGER.info(f"Arguments: {args}")
 
+    # Queue behind the other cron jobs using the same database, report directories or output JSON
+    lock_config = miner.config.get("locks", {})
+    queue = JobQueue(miner.base_path / lock_config.get("dir", "locks"), lock_config.get("timeout", DEFAULT_TIMEOUT))
+    job_name = " ".join(["mining_rpt"] + sys.argv[1:])
+    snapshot_config = miner.config.get("snapshot", {})
+    snapshot_path = miner.base_path / snapshot_config.get("name", DEFAULT_SNAPSHOT_NAME)
+    try:
+        if args.export is not None:
+            # Exports only read the candles; the JSON is written to the working directory
+            job = queue.acquire(job_name, exclusive=[Path.cwd() / f"FUT_{args.export[0]}.json"], shared=[miner.db_path])
+        elif args.greeks:
+            job = queue.acquire(job_name, exclusive=[miner.db_path])
+        elif args.backfill_ticks:
+            # Reports may be fetched into fut_rpt/; the database is not read
+            tick_store = miner.base_path / miner.report_info.get("tick_store", "tick_store")
+            job = queue.acquire(job_name, exclusive=[tick_store, miner.base_path / "fut_rpt"])
+        else:
+            job = queue.acquire(
+                job_name, exclusive=[miner.db_path, snapshot_path] + [miner.base_path / item for item in ITEMS]
+            )
+    except TimeoutError as e:
+        LOGGER.error(e)
+        sys.exit(1)
+    if job is None:
+        sys.exit(0)
+
     # Handle export operation if requested
     if args.export is not None:
-        miner = TaifexReportMiner()
         try:
             output_path = miner.export_data_to_txt()
             LOGGER.info(f"Export completed successfully to: {output_path}")
         except Exception as e:
             LOGGER.error(f"Export failed: {e}")
+        job.release()
+        sys.exit(0)
+
+    # Handle tick store backfill if requested
+    if args.backfill_ticks:
+        written = 0
+        for current_date in miner.calendar.trading_days(start_date, end_date):
+            try:
+                day_miner = TaifexReportMiner(date=current_date.strftime("%Y_%m_%d"))
+                written += day_miner.backfill_ticks(overwrite=args.force)
+            except Exception as e:
+                LOGGER.error(f"Failed to backfill ticks of {current_date:%Y_%m_%d}: {e}")
+        LOGGER.info(f"Tick backfill completed with {written} symbol days written")
+        job.release()
+        sys.exit(0)
+
+    # Handle option greeks batch if requested
+    if args.greeks:
+        miner = TaifexReportMiner(item="opt_rpt")
+        try:
+            rows = miner.compute_option_greeks(start_date, end_date, workers=args.workers)
+            LOGGER.info(f"Option greeks completed with {rows} rows")
+        except Exception as e:
+            LOGGER.error(f"Option greeks failed: {e}")
+        job.release()
         sys.exit(0)
 
-    # Process each date in the range
-    current_date = start_date
-    while current_date <= end_date:
+    # Process each trading day of the range, or only those with missing candles; closed days cost no download.
+    # Dates --fill-gaps recorded as closed are skipped too, but --fill-gaps itself rechecks them under --force
+    if not args.fill_gaps and miner.db_path.exists():
+        conn = miner.db.connect(miner.db_path, readonly=True)
+        for batch_start, batch_end in miner.partitions.attach_batches(conn, start_date, end_date):
+            miner.calendar.seed(conn.cursor(), miner.report_info.get("symbol", ["TX"])[0], batch_start, batch_end)
+        miner.calendar.mark_closed(miner.coverage.closed_dates(conn.cursor()))
+    dates = miner.calendar.trading_days(start_date, end_date)
+    LOGGER.info(
+        f"{len(dates)} trading days in range, skipping {(end_date - start_date).days + 1 - len(dates)} closed days"
+    )
+    if args.fill_gaps:
+        conn = miner.db.connect(miner.db_path)
+        gaps = miner.coverage.missing(
+            conn.cursor(), start_date, end_date, ["Candles"], miner.calendar, recheck_closed=args.force
+        )
+        dates = [datetime.strptime(gap, "%Y/%m/%d") for gap in gaps]
+        LOGGER.info(f"Filling {len(dates)} dates with missing candles: {sorted(gaps)}")
+
+    # One pool serves every report of the run; the parent parses each report once into shared memory for it
+    pool = None
+    if args.workers > 1:
+        # Workers attach to the shared blocks, so they must share this process's resource tracker
+        resource_tracker.ensure_running()
+        pool = ProcessPoolExecutor(max_workers=args.workers)
+
+    # Backfills may write several days per commit on one connection
+    batch_conn = None
+    pending_ticks: List[Callable[[], None]] = []
+    partitions = CandlePartitions(Path(os.path.dirname(__file__)))
+    if args.batch_days > 1:
+        batch_conn = get_connection_manager().connect(Path(os.path.dirname(__file__)) / DEFAULT_DB_NAME)
+    batched_days = 0
+
+    for number, current_date in enumerate(dates):
         date_str = current_date.strftime("%Y_%m_%d")
         LOGGER.info(f"Processing date: {date_str}")
 
+        # ATTACH is refused inside the batch transaction, so it starts with the partitions of its days attached;
+        # the previous year receives early January night sessions
+        if batch_conn is not None and batched_days == 0:
+            if partitions.enabled:
+                batch_years = {day.year for day in dates[number : number + args.batch_days]}
+                years = {year for day_year in batch_years for year in (day_year - 1, day_year)}
+                partitions.prepare(
+                    batch_conn,
+                    [
+                        year
+                        for year in years
+                        if not partitions.is_frozen(year) and (year in batch_years or year in partitions.years())
+                    ],
+                )
+            batch_conn.execute("BEGIN;")
+
         # Process each report type
         for item in ITEMS:
             try:
                 # Initialize miner for this date and report type
                 miner = TaifexReportMiner(date=date_str, item=item)
+                miner.batch_conn = batch_conn
+                miner.pending_ticks = pending_ticks if batch_conn is not None else None
+                miner.pool = pool
 
                 # Download the report
                 miner.download_report(recover=args.recover)
@@ -882,18 +1270,48 @@ def main():
                 # Upload to Google Drive
                 miner.upload_to_gdrive(recover=args.recover)
 
-                # For futures reports, process data for each symbol
-                if item == "fut_rpt":
-                    for symbol in miner.report_info.get("symbol", ["TX"]):
-                        try:
-                            miner.parse_report_to_db(symbol)
-                        except Exception as e:
-                            LOGGER.error(f"Failed to process {symbol} data: {e}")
+                # Process all symbols of the report in a single pass
+                try:
+                    miner.parse_report_to_db()
+                except Exception as e:
+                    LOGGER.error(f"Failed to process {item} data: {e}")
             except Exception as e:
                 LOGGER.error(f"Failed to process {item} for {date_str}: {e}")
 
-        # Move to next date
-        current_date += timedelta(days=1)
+        # A gap the reports cannot fill is a closure missing from the holiday file; stop retrying it
+        if args.fill_gaps:
+            with miner._transaction() as cursor:
+                if not miner.coverage.has_day_session(cursor, current_date.strftime("%Y/%m/%d")):
+                    miner.coverage.record_closed(
+                        cursor, [current_date.strftime("%Y/%m/%d")], "no day session candles after --fill-gaps"
+                    )
+
+        # Commit the batch once it holds enough days
+        batched_days += 1
+        last = number == len(dates) - 1
+        if batch_conn is not None and (batched_days >= args.batch_days or last):
+            batch_conn.commit()
+            LOGGER.info(f"Committed {batched_days} days up to {date_str}")
+            batched_days = 0
+
+            # Ticks of the committed days follow their candles into the tick store
+            for store_ticks in pending_ticks:
+                store_ticks()
+            pending_ticks.clear()
+    if pool is not None:
+        pool.shutdown()
+
+    get_connection_manager().close_all()
+
+    # Publish the read-only snapshot of the web frontend once the new candles are committed
+    if dates and snapshot_config.get("publish", True):
+        try:
+            SnapshotPublisher(
+                miner.base_path, miner.config.get("fut_rpt", {}).get("symbol", ["TX"]), snapshot_path.name
+            ).publish()
+        except (sqlite3.Error, OSError, ValueError) as e:
+            LOGGER.error(f"Snapshot publish failed: {e}")
+    job.release()
 
     LOGGER.info("TAIFEX data mining completed successfully")
 